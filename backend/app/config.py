@@ -1,7 +1,9 @@
 import os
+import atexit
+import queue
 from dotenv import load_dotenv
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # Load environment variables from .env
 load_dotenv()
@@ -9,28 +11,162 @@ load_dotenv()
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# Contract scraping
+DEFENSE_GOV_BASE_URL = os.getenv("DEFENSE_GOV_BASE_URL", "https://www.defense.gov")
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "8"))  # Concurrent article fetches
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "3"))
+FETCH_BACKOFF_SECONDS = float(os.getenv("FETCH_BACKOFF_SECONDS", "0.5"))  # Doubled after each retry
+FETCH_MIN_HOST_INTERVAL = float(os.getenv("FETCH_MIN_HOST_INTERVAL", "0.2"))  # Seconds between requests to one host
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "30"))
+SCRAPER_HTML_PARSER = os.getenv("SCRAPER_HTML_PARSER", "auto")  # "lxml", "html.parser", or "auto" (lxml if installed)
+
+# Threads available for blocking client calls (Pinecone, scraping, SQLite) made from async code
+BLOCKING_EXECUTOR_WORKERS = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "32"))
+
+# Client-side Gemini quota and concurrency control (0 disables a per-minute limit)
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "1500"))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))  # AIMD upper bound
+GEMINI_MIN_CONCURRENCY = int(os.getenv("GEMINI_MIN_CONCURRENCY", "1"))   # AIMD lower bound
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_BACKOFF_SECONDS = float(os.getenv("GEMINI_BACKOFF_SECONDS", "1.0"))  # Doubled per retry, with jitter
+
+# Vector store backend: "pinecone" (remote) or "local" (in-process NumPy index, needs numpy)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", "data/vectors")
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32")  # "float16" halves memory
+
+# Hybrid retrieval: BM25 keyword index fused with vector results
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "data/bm25.pkl")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # Candidates taken from each retriever before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Date, agency and amount constraints read from the query and pushed down as metadata filters
+QUERY_FILTERS_ENABLED = os.getenv("QUERY_FILTERS_ENABLED", "true").lower() == "true"
+
+# Long-lived vector index connection
+VECTOR_INDEX_HEALTH_INTERVAL = float(os.getenv("VECTOR_INDEX_HEALTH_INTERVAL", "30"))  # Seconds between health checks
+VECTOR_INDEX_HEALTH_TIMEOUT = float(os.getenv("VECTOR_INDEX_HEALTH_TIMEOUT", "10"))
+
+# Persistent embedding cache
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# In-memory cache of search query embeddings, optionally backed by the persistent embedding cache
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))  # 0 disables the cache
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))  # Seconds; 0 = no expiry
+QUERY_EMBEDDING_CACHE_DISK = os.getenv("QUERY_EMBEDDING_CACHE_DISK", "false").lower() == "true"
+
+# Generated answers reused for near-duplicate queries that retrieve the same matches
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "900"))  # Seconds; 0 = no expiry
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))  # Minimum query cosine similarity
+ANSWER_CACHE_SCORE_TOLERANCE = float(os.getenv("ANSWER_CACHE_SCORE_TOLERANCE", "0.01"))  # Max drift of each match's vector similarity
+
+# Prompt context: a wider candidate set, near-duplicates dropped, passages picked for relevance and diversity (MMR) within a token budget
+CONTEXT_BUILDER_ENABLED = os.getenv("CONTEXT_BUILDER_ENABLED", "true").lower() == "true"  # false joins the top_k previews as before
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "20"))  # Matches retrieved to choose passages from
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))  # Estimated tokens of passages per prompt; about five full 1,000-character previews
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.6"))  # Word-shingle Jaccard similarity treated as a duplicate
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))  # 1 ranks by relevance only, lower values favour diversity
+CONTEXT_MIN_PASSAGE_TOKENS = int(os.getenv("CONTEXT_MIN_PASSAGE_TOKENS", "60"))  # Smallest trimmed passage worth including
+VECTOR_TEXT_MAX_CHARS = int(os.getenv("VECTOR_TEXT_MAX_CHARS", "4000"))  # Text stored with each vector; Pinecone allows 40 KB of metadata
+
+# Batch search: queries embedded together, retrieved concurrently and answered with bounded parallelism
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "50"))
+SEARCH_BATCH_CONCURRENCY = int(os.getenv("SEARCH_BATCH_CONCURRENCY", "8"))  # Searches of a batch in flight at once
+SEARCH_BATCH_GENERATION_CONCURRENCY = int(os.getenv("SEARCH_BATCH_GENERATION_CONCURRENCY", "4"))  # Answers generated at once
+
+# Streaming ingest pipeline: bounded queues between the scrape, embed and upsert stages
+INGEST_ARTICLE_QUEUE_SIZE = int(os.getenv("INGEST_ARTICLE_QUEUE_SIZE", "16"))  # Parsed articles waiting for the embed stage
+INGEST_BATCH_QUEUE_SIZE = int(os.getenv("INGEST_BATCH_QUEUE_SIZE", "4"))  # Batches waiting for each of the embed and upsert stages
+INGEST_UPSERT_WORKERS = int(os.getenv("INGEST_UPSERT_WORKERS", "2"))
+INGEST_MAX_PENDING_ARTICLES = int(os.getenv("INGEST_MAX_PENDING_ARTICLES", "32"))  # Articles parsed but not yet fully stored
+
+# Incremental ingestion state (article validators, content hashes, stored vector IDs)
+INGEST_STATE_PATH = os.getenv("INGEST_STATE_PATH", "state/ingest.sqlite3")
+
+# Near-duplicate sections, found with MinHash/LSH over sections already stored (kept in the ingest state database)
+NEAR_DUPLICATE_MODE = os.getenv("NEAR_DUPLICATE_MODE", "link").lower()  # "link" records copies against the stored vector, "skip" just drops them, "off" embeds everything
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))  # Estimated word-shingle Jaccard similarity; dollar amounts must also match
+NEAR_DUPLICATE_SEARCH_CANDIDATES = int(os.getenv("NEAR_DUPLICATE_SEARCH_CANDIDATES", "200"))  # Linked copies scored per search filtered on date or agency
+
+# Raw HTML archive of every fetched page, for re-parsing without network I/O
+HTML_ARCHIVE_ENABLED = os.getenv("HTML_ARCHIVE_ENABLED", "true").lower() == "true"
+HTML_ARCHIVE_PATH = os.getenv("HTML_ARCHIVE_PATH", "archive/html")
+HTML_ARCHIVE_PARSE_WORKERS = int(os.getenv("HTML_ARCHIVE_PARSE_WORKERS", str(os.cpu_count() or 1)))  # Processes re-parsing archived pages
+
+# Historical backfill: date-range shards run across worker processes, checkpointed per article
+BACKFILL_STATE_PATH = os.getenv("BACKFILL_STATE_PATH", "state/backfill.sqlite3")
+BACKFILL_SHARD_DAYS = int(os.getenv("BACKFILL_SHARD_DAYS", "30"))
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))  # Worker processes
+BACKFILL_MAX_PAGES = int(os.getenv("BACKFILL_MAX_PAGES", "200"))  # Listing pages followed per shard
+
+# Background jobs: ingest runs off the request path, optionally on a schedule, with history kept on disk
+JOB_STORE_ENABLED = os.getenv("JOB_STORE_ENABLED", "true").lower() == "true"  # false keeps jobs in memory only
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "state/jobs.sqlite3")
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "100"))  # Finished jobs kept
+JOB_EXECUTOR_WORKERS = int(os.getenv("JOB_EXECUTOR_WORKERS", "16"))  # Threads for jobs' blocking calls, separate from searches
+JOB_LOCK_TTL = float(os.getenv("JOB_LOCK_TTL", "300"))  # Seconds before another process may take over a dead process's job lock
+INGEST_SCHEDULE_HOURS = float(os.getenv("INGEST_SCHEDULE_HOURS", "0"))  # Run the incremental ingest this often; 0 disables
+
+# Tracing: every search, stream and ingest logs the time spent in each stage; slow ones are logged as warnings
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "5"))  # 0 logs every trace at info level
+
 # Create logs directory if it doesn't exist
 os.makedirs("logs", exist_ok=True)
 
+_log_listener = None
+
 # Configure logging
 def setup_logging():
+    """
+    Log to the console and a rotating file without blocking the caller
+    
+    Records are put on a queue and written by a background thread, so request
+    handlers and the event loop never wait on console or disk I/O. Every
+    record carries the trace ID of the request or job that logged it.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    
+    # Imported here because the tracing module reads this config
+    from app.services.tracing import TraceIdFilter
+    
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] - %(message)s")
+    handlers = [
+        # Console handler
+        logging.StreamHandler(),
+        # File handler with rotation
+        RotatingFileHandler(
+            "logs/app.log",
+            maxBytes=10485760,  # 10MB
+            backupCount=5,
+            encoding="utf-8"
+        )
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # Only the message is rendered here; the writer thread's handlers add the timestamp, level and trace ID
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    # The trace ID is read where the record is created, not in the writer thread
+    queue_handler.addFilter(TraceIdFilter())
+    
     # Configure root logger
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            # Console handler
-            logging.StreamHandler(),
-            # File handler with rotation
-            RotatingFileHandler(
-                "logs/app.log",
-                maxBytes=10485760,  # 10MB
-                backupCount=5,
-                encoding="utf-8"
-            )
-        ]
-    )
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    # Write out whatever is still queued when the process exits
+    atexit.register(_log_listener.stop)
     
     # Set level for specific loggers if needed
     logging.getLogger("uvicorn").setLevel(logging.WARNING)
-    logging.getLogger("fastapi").setLevel(logging.WARNING)
\ No newline at end of file
+    logging.getLogger("fastapi").setLevel(logging.WARNING)
@@ -1,11 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import contracts
 from app.config import setup_logging
+from app.services.embeddings import index_manager
+from app.services.executor import shutdown_executor
+from app.services.jobs import get_job_scheduler, start_job_scheduler
+from app.services.metrics import render_metrics
+from app.services.tracing import TraceMiddleware
 import uvicorn
 import os
 
-app = FastAPI(title="Government Watch API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connect and warm up the vector index once instead of on every request
+    await index_manager.start()
+    # Ingest jobs (manual and scheduled) run in the background, off the request path
+    await start_job_scheduler()
+    yield
+    await get_job_scheduler().stop()
+    await index_manager.stop()
+    # Let in-flight blocking client calls finish before the worker exits
+    shutdown_executor()
+
+app = FastAPI(title="Government Watch API", lifespan=lifespan)
 
 # Get allowed origins from environment or use defaults
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://govwatch.xyz")
@@ -24,6 +43,9 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization"],
 )
 
+# Added last so it is outermost: trace IDs and latencies cover everything, including CORS preflights
+app.add_middleware(TraceMiddleware)
+
 app.include_router(contracts.router)
 
 setup_logging()
@@ -32,5 +54,20 @@ setup_logging()
 def read_root():
     return {"message": "Welcome to the Government Watch API"}
 
+@app.get("/ready")
+def readiness():
+    """
+    Readiness probe: 200 once the vector index is connected and healthy, 503 otherwise
+    """
+    status = index_manager.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint: stage latency histograms and token, cache, retry and failure counters
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 def run():
     uvicorn.run(app, host="0.0.0.0", port=8000)
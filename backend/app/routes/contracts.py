@@ -1,12 +1,32 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
-import requests
-import re
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Body, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
+from datetime import date, datetime, timedelta
 from bs4 import BeautifulSoup
+import asyncio
+import json
 import logging
-from app.services.scraper import ContractScraper
-from app.services.embeddings import generate_embeddings, search_with_gemini
+import time
+from app.config import (
+    DEFENSE_GOV_BASE_URL,
+    SEARCH_BATCH_MAX_QUERIES,
+    SEARCH_BATCH_CONCURRENCY,
+    SEARCH_BATCH_GENERATION_CONCURRENCY,
+)
+from app.services.executor import run_blocking
+from app.services.fetcher import ContractFetcher
+from app.services.html_archive import ARTICLE, ArchiveFetcher, default_archive, get_html_archive
+from app.services.ingest_state import get_ingest_state
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.jobs import get_job_scheduler
+from app.services.scraper import extract_contract_links
+from app.services.embeddings import embed_queries, search_sources, search_with_gemini, search_with_gemini_stream
+from app.services.answer_cache import get_answer_cache
+from app.services.query_cache import get_query_embedding_cache, normalize_query
+from app.services.single_flight import search_flights
+from app.services.rate_limiter import get_rate_limiter
+from app.services.tracing import trace
+from app.services.query_filters import QueryFilters, normalize_section
 
 # Optional: Import your vector embedding service
 # from app.services.embeddings import generate_embeddings
@@ -18,13 +38,28 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
-async def process_contract_embeddings():
+async def process_contract_embeddings(
+    full: bool = False,
+    on_pipeline: Optional[Callable[[IngestPipeline], None]] = None,
+    replay: bool = False,
+    end: Optional[date] = None
+):
     """
     Process contracts and generate embeddings
+    
+    Articles already ingested are requested conditionally and skipped when
+    unchanged, and only changed sections are re-embedded. Fetched pages are
+    kept in the HTML archive.
+    
+    Args:
+        full: Ignore the ingest state and re-fetch, re-embed and re-upsert everything
+        on_pipeline: Called with the ingest pipeline before it starts, e.g. to follow its progress
+        replay: Re-parse the listing and articles from the HTML archive instead of fetching them
+        end: Last day of the week to process (defaults to yesterday)
     """
     try:
         # Get date range (yesterday to 7 days ago)
-        end_date = datetime.now() - timedelta(days=1)
+        end_date = datetime.combine(end, datetime.min.time()) if end else datetime.now() - timedelta(days=1)
         start_date = end_date - timedelta(days=6)
         
         # Format dates for URL
@@ -32,56 +67,32 @@ async def process_contract_embeddings():
         end_date_str = end_date.strftime("%Y-%m-%d")
 
         # Construct URL
-        url = f"https://www.defense.gov/News/Contracts/StartDate/{start_date_str}/EndDate/{end_date_str}/"
+        url = f"{DEFENSE_GOV_BASE_URL}/News/Contracts/StartDate/{start_date_str}/EndDate/{end_date_str}/"
 
         print(url)
         
         logger.info(f"Processing contracts from {url} for embeddings")
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Mobile Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
+        # A replay reads the same pages from the archive, with no network I/O
+        fetcher = ArchiveFetcher(get_html_archive()) if replay else ContractFetcher(archive=default_archive())
         
         # Fetch the contracts listing page
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            logger.error(f"Failed to retrieve contracts listing. Status code: {response.status_code}")
-            return {"status": "error", "message": f"Failed to retrieve contracts listing. Status code: {response.status_code}"}
+        listing_html = await run_blocking(fetcher.fetch, url)
+        if listing_html is None:
+            fetcher.close()
+            message = "Contracts listing is not in the archive" if replay else "Failed to retrieve contracts listing"
+            logger.error(message)
+            return {"status": "error", "message": message}
         
         # Parse the page to find contract links
-        soup = BeautifulSoup(response.text, 'html.parser')
-        contract_links = []
-
-        for elem in soup.find_all("listing-titles-only"):
-            # Try to get the absolute URL attribute first
-            url = elem.get("article-url-or-link-absolute")
-            # Fallback to relative URL if needed
-            if not url:
-                url = elem.get("article-url-or-link")
-                if url and not url.startswith("http"):
-                    url = f"https://www.defense.gov{url}"
-            
-            # Extract the publish date for constructing the title if needed
-            publish_date = elem.get("publish-date-ap", "").strip()
-            # Sometimes article-title may be empty for contracts, so we build a title
-            title = elem.get("article-title", "").strip()
-            if not title and publish_date:
-                title = f"Contracts For {publish_date}"
-            
-            if url:
-                print(f"Found contract: {title} at {url}")
-                contract_links.append(url)
-
+        contract_links = extract_contract_links(listing_html, DEFENSE_GOV_BASE_URL)
 
         logger.info(f"Processing {len(contract_links)} contracts for embeddings")
 
         # Debug output if no contracts found
         if not contract_links:
             logger.error("No contracts found. HTML structure:")
+            soup = BeautifulSoup(listing_html, 'html.parser')
             html_sample = soup.prettify()  # Print the whole HTML (or part of it)
             with open("debug_html_sample.html", "w", encoding="utf-8") as f:
                 f.write(html_sample)
@@ -94,43 +105,33 @@ async def process_contract_embeddings():
             for link in contract_related[:5]:
                 print(f"  - {link.get('href')}: {link.get_text(strip=True)}")
         
-        # Initialize scraper
-        scraper = ContractScraper()
+        # Previously ingested articles are only downloaded again if they changed
+        ingest_state = None
+        try:
+            ingest_state = await run_blocking(get_ingest_state)
+        except Exception as e:
+            logger.warning(f"Ingest state unavailable, processing every article: {str(e)}")
         
-        # Process each contract
-        contract_data = []
-        processed_count = 0
+        # Fetch, parse, embed and store articles as a pipeline: each article is
+        # embedded as soon as it is parsed, while the next ones are still downloading
         error_count = 0
-        
-        for url in contract_links:
+        with fetcher:
             try:
-                # Scrape the contract
-                contract_info = scraper.scrape(url)
-                
-                # Add to our collection
-                contract_data.append({
-                    "url": url,
-                    "date": contract_info["date"],
-                    "sections": contract_info["sections"]
-                })
-                
-                logger.info(f"Successfully processed contract: {url}")
-                processed_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing contract {url}: {str(e)}")
-                error_count += 1
-        
-        # Generate and store embeddings
-        if contract_data:
-            try:
-                embedding_stats = await generate_embeddings(contract_data)
-                logger.info(f"Embedding stats: {embedding_stats}")
+                pipeline = IngestPipeline(ingest_state=ingest_state, full=full)
+                if on_pipeline:
+                    on_pipeline(pipeline)
+                stats = await pipeline.run_urls(contract_links, fetcher)
+                logger.info(f"Embedding stats: {stats}")
             except Exception as e:
                 logger.error(f"Error generating embeddings: {str(e)}")
+                stats = {}
                 error_count += 1
         
-        logger.info(f"Completed processing {len(contract_data)} contracts for embeddings")
+        error_count += stats.get("fetch_errors", 0)
+        processed_count = stats.get("total_contracts", 0)
+        unchanged_count = stats.get("unchanged_articles", 0)
+        
+        logger.info(f"Completed processing {processed_count} contracts for embeddings")
         
         return {
             "status": "success",
@@ -141,6 +142,7 @@ async def process_contract_embeddings():
             "stats": {
                 "total_links_found": len(contract_links),
                 "successfully_processed": processed_count,
+                "unchanged_skipped": unchanged_count,
                 "errors": error_count
             }
         }
@@ -150,33 +152,426 @@ async def process_contract_embeddings():
         logger.error(error_msg)
         return {"status": "error", "message": error_msg}
 
-@router.get("/test/process-embeddings")
-async def test_process_embeddings():
+async def replay_archived_articles(full: bool = False, since: Optional[float] = None, until: Optional[float] = None):
+    """
+    Re-parse every archived article and store what changed, with no network I/O
+    
+    Used after changing extraction logic: every article is parsed again and
+    compared record by record, and only records that changed are embedded
+    again, unless full is set.
+    
+    Args:
+        full: Re-embed and re-upsert every archived article
+        since: Only articles fetched at or after this Unix time
+        until: Only articles fetched at or before this Unix time
+        
+    Returns:
+        Dict: Status and ingest statistics
+    """
+    archive = get_html_archive()
+    urls = await run_blocking(archive.urls, ARTICLE, since, until)
+    logger.info(f"Replaying {len(urls)} archived articles")
+    
+    ingest_state = None
+    try:
+        ingest_state = await run_blocking(get_ingest_state)
+    except Exception as e:
+        logger.warning(f"Ingest state unavailable, processing every article: {str(e)}")
+    
+    with ArchiveFetcher(archive) as fetcher:
+        stats = await IngestPipeline(ingest_state=ingest_state, full=full).run_urls(urls, fetcher)
+    
+    return {
+        "status": "success",
+        "stats": {
+            "archived_articles": len(urls),
+            "successfully_processed": stats["total_contracts"],
+            "unchanged_skipped": stats["unchanged_articles"],
+            "vectors_upserted": stats["successful_embeddings"],
+            "vectors_deleted": stats["deleted_vectors"],
+            "errors": stats["fetch_errors"] + stats["failed_articles"]
+        }
+    }
+
+@router.get("/test/process-embeddings", status_code=202)
+async def test_process_embeddings(full: bool = False):
     """
     Test endpoint for the process_contract_embeddings function
     Remove this in production
+    
+    The ingest runs as a background job, as with POST /jobs/ingest.
+    
+    Args:
+        full: Force a complete refresh instead of an incremental run
     """
-    result = await process_contract_embeddings()
-    return result
+    return get_job_scheduler().submit("ingest", {"full": full})
+
+@router.post("/jobs/ingest", status_code=202)
+async def start_ingest_job(full: bool = False):
+    """
+    Start a background ingest of the last week's contracts
+    
+    If an identical ingest is already queued or running, that job is returned
+    instead ("deduplicated": true).
+    
+    Args:
+        full: Force a complete refresh instead of an incremental run
+        
+    Returns:
+        Dict: The job, including its ID for GET /jobs/{job_id}
+    """
+    return get_job_scheduler().submit("ingest", {"full": full})
+
+@router.get("/jobs")
+async def list_jobs(limit: int = Query(20, ge=1, le=100)):
+    """
+    List the most recent background jobs, newest first
+    
+    Args:
+        limit: Maximum number of jobs
+    """
+    return {"jobs": await get_job_scheduler().list(limit)}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Report a background job's status and progress
+    
+    Args:
+        job_id: The job ID
+        
+    Returns:
+        Dict: Status, timestamps, progress (articles fetched, sections embedded,
+            vectors upserted), and the result or error once finished
+    """
+    job = await get_job_scheduler().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running background job
+    
+    Args:
+        job_id: The job ID
+    """
+    scheduler = get_job_scheduler()
+    job = scheduler.cancel(job_id)
+    if job is None:
+        # Not started by this process; it may be in the shared job store
+        job = await scheduler.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job["status"] in ("queued", "running"):
+            raise HTTPException(status_code=409, detail="Job is running in another worker process")
+    return job
+
+def validate_search_request(
+    query: str,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    agency: Optional[List[str]],
+    min_amount: Optional[float],
+    max_amount: Optional[float]
+) -> QueryFilters:
+    """
+    Validate search parameters and build the explicit filters
+    
+    Raises:
+        HTTPException: 400 if the query is too short or a range is inverted
+    
+    Returns:
+        QueryFilters: The explicitly requested filters (possibly empty)
+    """
+    if not query or len(query.strip()) < 3:
+        raise HTTPException(status_code=400, detail="Query must be at least 3 characters long")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        raise HTTPException(status_code=400, detail="min_amount must not be greater than max_amount")
+    
+    return QueryFilters(
+        date_from=date_from,
+        date_to=date_to,
+        sections=[normalize_section(name) for name in agency or []],
+        min_amount=min_amount,
+        max_amount=max_amount
+    )
+
+def search_key(query: str, filters: QueryFilters) -> str:
+    """
+    Key under which identical concurrent searches are coalesced
+    """
+    return f"{normalize_query(query)}|{json.dumps(filters.describe(), sort_keys=True)}"
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    Encode one server-sent event
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.post("/search")
-async def search_contracts(query: str):
+async def search_contracts(
+    query: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    agency: Optional[List[str]] = Query(None),
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None
+):
     """
     Search for contracts using a natural language query
     
+    Dates, agencies and dollar thresholds in the query are applied as filters
+    automatically; the optional parameters set them explicitly and take
+    precedence over what is read from the query.
+    
     Args:
         query: The search query
+        date_from: Only contracts announced on or after this date (YYYY-MM-DD)
+        date_to: Only contracts announced on or before this date (YYYY-MM-DD)
+        agency: Agency sections to search, e.g. ?agency=navy&agency=DLA
+        min_amount: Minimum award amount in dollars
+        max_amount: Maximum award amount in dollars
         
     Returns:
-        Dict: Response containing the answer and sources
+        Dict: Response containing the answer, sources and the filters applied
     """
     try:
-        if not query or len(query.strip()) < 3:
-            raise HTTPException(status_code=400, detail="Query must be at least 3 characters long")
+        filters = validate_search_request(query, date_from, date_to, agency, min_amount, max_amount)
         
-        result = await search_with_gemini(query)
+        # Identical searches already in flight share one embed/retrieve/generate run
+        result = await search_flights.do(
+            search_key(query, filters),
+            lambda: search_with_gemini(query, filters=filters)
+        )
         return result
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching contracts: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/search/stats")
+async def search_stats():
+    """
+    Report search cache and request coalescing metrics
+    
+    Returns:
+        Dict: Hit/miss counters and sizes of the search caches, and how many
+            searches were coalesced into shared executions, and the Gemini
+            rate limiter's concurrency limit, queue and per-lane waits
+    """
+    return {
+        "query_embedding_cache": get_query_embedding_cache().stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "single_flight": search_flights.stats(),
+        "rate_limiter": get_rate_limiter().stats()
+    }
+
+@router.get("/search/stream")
+async def search_contracts_stream(
+    request: Request,
+    query: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    agency: Optional[List[str]] = Query(None),
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None
+):
+    """
+    Search for contracts and stream the answer as server-sent events
+    
+    A "sources" event is sent as soon as retrieval finishes, followed by one
+    "token" event per generated chunk and a final "done" (or "error") event.
+    Identical concurrent streams share one generation, which stops once every
+    subscribed client has disconnected.
+    
+    Args:
+        request: The incoming request, used to detect client disconnects
+        query: The search query
+        date_from, date_to, agency, min_amount, max_amount: Optional filters, as for POST /search
+        
+    Returns:
+        StreamingResponse: A text/event-stream response
+    """
+    filters = validate_search_request(query, date_from, date_to, agency, min_amount, max_amount)
+    
+    async def event_stream():
+        # Identical streams already in flight are shared; late subscribers replay earlier events
+        events = search_flights.stream(
+            search_key(query, filters),
+            lambda: search_with_gemini_stream(query, filters=filters)
+        )
+        try:
+            async for event in events:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, stopping search stream")
+                    break
+                yield format_sse(event["event"], {key: value for key, value in event.items() if key != "event"})
+        except asyncio.CancelledError:
+            logger.info("Search stream cancelled")
+            raise
+        finally:
+            # Closing the generator closes the upstream Gemini stream
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Don't let proxies buffer the stream
+        }
+    )
+
+BATCH_FILTER_FIELDS = ("date_from", "date_to", "agency", "min_amount", "max_amount")
+
+def parse_batch_query(item: Union[str, Dict[str, Any]]) -> Tuple[str, QueryFilters]:
+    """
+    Validate one entry of a batch search: a query string, or an object with
+    "query" and any of the filters POST /search takes
+    
+    Raises:
+        HTTPException: 400 if the entry is malformed or fails search validation
+    
+    Returns:
+        Tuple[str, QueryFilters]: The query and its explicit filters
+    """
+    if isinstance(item, str):
+        return item, validate_search_request(item, None, None, None, None, None)
+    
+    unknown = set(item) - {"query", *BATCH_FILTER_FIELDS}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields in batch query: {', '.join(sorted(unknown))}")
+    try:
+        query = item.get("query") or ""
+        date_from = date.fromisoformat(item["date_from"]) if item.get("date_from") else None
+        date_to = date.fromisoformat(item["date_to"]) if item.get("date_to") else None
+        agency = item.get("agency")
+        agency = [agency] if isinstance(agency, str) else agency
+        min_amount = float(item["min_amount"]) if item.get("min_amount") is not None else None
+        max_amount = float(item["max_amount"]) if item.get("max_amount") is not None else None
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch query {item.get('query')!r}: {str(e)}")
+    return query, validate_search_request(query, date_from, date_to, agency, min_amount, max_amount)
+
+async def search_batch_events(searches: List[Tuple[str, QueryFilters]], generate: bool):
+    """
+    Run a batch of searches and yield one event per search as it finishes
+    
+    All queries are embedded together first. Then up to SEARCH_BATCH_CONCURRENCY
+    searches run at once, of which up to SEARCH_BATCH_GENERATION_CONCURRENCY
+    generate answers at once, so later searches retrieve while earlier ones
+    are being answered.
+    
+    Args:
+        searches: The validated queries and their explicit filters
+        generate: Generate answers; otherwise only the sources are returned
+        
+    Yields:
+        Dict: A "result" or "error" event per search, tagged with its position
+            in the batch, then a "done" event
+    """
+    started = time.perf_counter()
+    with trace("search_batch"):
+        embeddings = await embed_queries([query for query, _ in searches])
+    
+    search_slots = asyncio.Semaphore(SEARCH_BATCH_CONCURRENCY)
+    generation_slots = asyncio.Semaphore(SEARCH_BATCH_GENERATION_CONCURRENCY)
+    
+    async def run(index: int, query: str, filters: QueryFilters, embedding: Optional[List[float]]) -> Dict[str, Any]:
+        try:
+            async with search_slots:
+                if generate:
+                    # Shares one run with an identical search already in flight, from this batch or elsewhere
+                    result = await search_flights.do(
+                        search_key(query, filters),
+                        lambda: search_with_gemini(query, filters=filters, query_embedding=embedding, generation_slots=generation_slots)
+                    )
+                else:
+                    result = await search_sources(query, filters=filters, query_embedding=embedding)
+            return {"event": "result", "index": index, "query": query, **result}
+        except Exception as e:
+            logger.error(f"Error in batch search for {query!r}: {str(e)}")
+            return {"event": "error", "index": index, "query": query, "detail": str(e)}
+    
+    tasks = [
+        asyncio.create_task(run(index, query, filters, embedding))
+        for index, ((query, filters), embedding) in enumerate(zip(searches, embeddings))
+    ]
+    errors = 0
+    try:
+        for finished in asyncio.as_completed(tasks):
+            event = await finished
+            errors += event["event"] == "error"
+            yield event
+    finally:
+        # The client went away: stop the searches that haven't finished
+        for task in tasks:
+            task.cancel()
+    
+    yield {
+        "event": "done",
+        "queries": len(searches),
+        "errors": errors,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    }
+
+@router.post("/search/batch")
+async def search_contracts_batch(
+    request: Request,
+    queries: List[Union[str, Dict[str, Any]]] = Body(..., embed=True),
+    generate: bool = Body(True, embed=True)
+):
+    """
+    Run many searches in one request and stream each result as server-sent events as soon as it is ready
+    
+    The queries are embedded with one batched request, retrieved concurrently
+    (SEARCH_BATCH_CONCURRENCY) and, unless `generate` is false, answered with
+    bounded parallelism (SEARCH_BATCH_GENERATION_CONCURRENCY). Each search sends a "result" event
+    with its "index" in the batch, its query, and the answer (if generated),
+    sources and filters, as POST /search returns them; a failed search sends
+    an "error" event instead. A final "done" event closes the stream.
+    
+    Args:
+        request: The incoming request, used to detect client disconnects
+        queries: Up to SEARCH_BATCH_MAX_QUERIES queries, each a string or an
+            object with "query" and optional "date_from", "date_to", "agency",
+            "min_amount" and "max_amount", as for POST /search
+        generate: Generate an answer for each query; false returns only the sources
+        
+    Returns:
+        StreamingResponse: A text/event-stream response
+    """
+    if not queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if len(queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch")
+    searches = [parse_batch_query(item) for item in queries]
+    
+    async def event_stream():
+        events = search_batch_events(searches, generate)
+        try:
+            async for event in events:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, stopping batch search")
+                    break
+                yield format_sse(event["event"], {key: value for key, value in event.items() if key != "event"})
+        except asyncio.CancelledError:
+            logger.info("Batch search cancelled")
+            raise
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Don't let proxies buffer the stream
+        }
+    )
@@ -0,0 +1,254 @@
+import math
+import operator
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.config import (
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_SCORE_TOLERANCE,
+)
+from app.services.query_cache import normalize_query
+
+@dataclass
+class CachedAnswer:
+    """
+    A generated answer with the query and retrieval results it was generated from
+    """
+    query: str
+    embedding: List[float]      # L2-normalized query embedding
+    match_ids: Tuple[str, ...]
+    match_scores: Tuple[Optional[float], ...]    # Vector similarity of each match (None for keyword-only hits)
+    filters: Dict[str, Any]
+    answer: str
+    sources: List[Dict[str, Any]]
+    stored_at: float
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    # Both vectors are already unit length
+    return sum(map(operator.mul, a, b))
+
+def _vector_scores(matches: Sequence[Any]) -> Tuple[Optional[float], ...]:
+    # Fused hybrid matches carry their vector similarity; rank-fusion scores barely move
+    # between queries (adjacent ranks differ by ~0.0003), so they are never compared
+    scores = []
+    for match in matches:
+        score = getattr(match, "vector_score", match.score)
+        scores.append(None if score is None else float(score))
+    return tuple(scores)
+
+class AnswerCache:
+    """
+    Cache of generated answers, matched by query similarity and retrieved set
+
+    A cached answer is reused for a new query when the two query embeddings
+    are at least `similarity` similar in cosine terms AND retrieval returned
+    the same vector IDs in the same order with vector similarity scores
+    within `score_tolerance` (with hybrid search, the matches' vector scores
+    are compared rather than their fused ranks).
+    The second condition keeps answers correct after an ingest changes what
+    a query retrieves. Entries expire after ttl_seconds, the least recently
+    used are evicted beyond max_entries, and the whole cache is invalidated
+    when new vectors are stored.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl_seconds: float = ANSWER_CACHE_TTL,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+        score_tolerance: float = ANSWER_CACHE_SCORE_TOLERANCE,
+    ):
+        """
+        Args:
+            max_entries: Maximum number of answers kept
+            ttl_seconds: Seconds an answer stays valid (0 = no expiry)
+            similarity: Minimum cosine similarity between query embeddings
+            score_tolerance: Maximum difference allowed between corresponding vector similarity scores
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.score_tolerance = score_tolerance
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.retrieval_mismatches = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def lookup(
+        self,
+        query: str,
+        embedding: Sequence[float],
+        matches: Sequence[Any],
+        filters: Dict[str, Any]
+    ) -> Optional[CachedAnswer]:
+        """
+        Find a cached answer for a query and its retrieval results
+
+        Args:
+            query: The search query
+            embedding: The query embedding
+            matches: The matches retrieval returned (with id and score)
+            filters: The filters retrieval applied
+
+        Returns:
+            Optional[CachedAnswer]: The best matching answer, or None
+        """
+        if self.max_entries <= 0:
+            return None
+
+        match_ids = tuple(match.id for match in matches)
+        match_scores = _vector_scores(matches)
+        key = normalize_query(query)
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+
+            # The same query text is the common case; skip the similarity scan
+            candidates = []
+            exact = self._entries.get(key)
+            if exact is not None:
+                candidates.append((1.0, key, exact))
+            else:
+                unit = _normalize(embedding)
+                for entry_key, entry in self._entries.items():
+                    score = _cosine(unit, entry.embedding)
+                    if score >= self.similarity:
+                        candidates.append((score, entry_key, entry))
+                candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+            for _, entry_key, entry in candidates:
+                if self._same_retrieval(entry, match_ids, match_scores, filters):
+                    self._entries.move_to_end(entry_key)
+                    self.hits += 1
+                    return entry
+
+            if candidates:
+                # A similar question was answered, but retrieval has changed since
+                self.retrieval_mismatches += 1
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        query: str,
+        embedding: Sequence[float],
+        matches: Sequence[Any],
+        filters: Dict[str, Any],
+        answer: str,
+        sources: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Cache a generated answer
+
+        Args:
+            query: The search query
+            embedding: The query embedding
+            matches: The matches the answer was generated from
+            filters: The filters retrieval applied
+            answer: The generated answer
+            sources: The sources returned with it
+        """
+        if self.max_entries <= 0:
+            return
+
+        entry = CachedAnswer(
+            query=query,
+            embedding=_normalize(embedding),
+            match_ids=tuple(match.id for match in matches),
+            match_scores=_vector_scores(matches),
+            filters=dict(filters),
+            answer=answer,
+            sources=sources,
+            stored_at=time.monotonic(),
+        )
+        key = normalize_query(query)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """
+        Drop every cached answer, e.g. after new vectors were stored
+        """
+        with self._lock:
+            if self._entries:
+                self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Describe the cache size and hit/miss counters
+
+        Returns:
+            Dict: Entries, limits, counters and the hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "retrieval_mismatches": self.retrieval_mismatches,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _same_retrieval(
+        self,
+        entry: CachedAnswer,
+        match_ids: Tuple[str, ...],
+        match_scores: Tuple[Optional[float], ...],
+        filters: Dict[str, Any]
+    ) -> bool:
+        if entry.match_ids != match_ids or entry.filters != filters:
+            return False
+        return all(
+            a == b if a is None or b is None else abs(a - b) <= self.score_tolerance
+            for a, b in zip(entry.match_scores, match_scores)
+        )
+
+    def _expire(self, now: float) -> None:
+        # Caller holds the lock; entries are in recency order, not age order, so scan them all
+        if not self.ttl_seconds:
+            return
+        expired = [key for key, entry in self._entries.items() if now - entry.stored_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+
+_cache: Optional[AnswerCache] = None
+
+def get_answer_cache() -> AnswerCache:
+    """
+    Return the process-wide answer cache
+
+    Returns:
+        AnswerCache: The shared cache instance
+    """
+    global _cache
+    if _cache is None:
+        _cache = AnswerCache()
+    return _cache
@@ -0,0 +1,196 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Verb phrases that separate the awardee from the rest of an award paragraph
+AWARD_VERB = re.compile(
+    r",?\s+(?:was|is|has been|is being|were|are|have been|are being|has|have)\s+"
+    r"(?:awarded|issued|selected|modified|received)\b"
+)
+
+# First dollar figure in the paragraph, e.g. "$245,118,000" or "$1.2 billion"
+AMOUNT = re.compile(r"\$\s?(\d[\d,]*(?:\.\d+)?)(?:\s+(million|billion))?", re.IGNORECASE)
+
+# DoD contract numbers (PIIDs) such as W31P4Q-23-C-0045, N00024-22-C-2114 or SPE2DE-25-D-0007
+CONTRACT_NUMBER = re.compile(r"\b([A-Z0-9]{6})-?(\d{2})-?([A-Z])-?([A-Z0-9]{4})\b")
+
+COMPLETION_DATE = re.compile(
+    r"(?:completion date (?:of|is)|(?:completed|complete) (?:by|in|on)|end date (?:of|is)|through)\s+"
+    r"(?P<date>(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?\s+(?:\d{1,2},\s+)?\d{4})"
+)
+
+CONTRACTING_ACTIVITY = re.compile(r",?\s+(?:is|are) the contracting (?:activity|activities)\b")
+
+# Abbreviations whose trailing period does not end a sentence
+ABBREVIATIONS = (
+    "U.S.", "D.C.", "Inc.", "Corp.", "Co.", "Ltd.", "Jr.", "Sr.", "St.", "Ft.", "Mt.", "No.",
+    "Jan.", "Feb.", "Aug.", "Sept.", "Sep.", "Oct.", "Nov.", "Dec.",
+)
+
+DATE_FORMATS = (
+    ("%b. %d, %Y", "%Y-%m-%d"),
+    ("%B %d, %Y", "%Y-%m-%d"),
+    ("%b %d, %Y", "%Y-%m-%d"),
+    ("%b. %Y", "%Y-%m"),
+    ("%B %Y", "%Y-%m"),
+    ("%b %Y", "%Y-%m"),
+)
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split an award paragraph into sentences without breaking on abbreviations
+
+    Args:
+        text: The paragraph text
+
+    Returns:
+        List[str]: The sentences in order
+    """
+    sentences: List[str] = []
+    for piece in re.split(r"(?<=[.!?])\s+(?=[A-Z(])", text):
+        if sentences and sentences[-1].endswith(ABBREVIATIONS):
+            sentences[-1] = f"{sentences[-1]} {piece}"
+        else:
+            sentences.append(piece)
+    return sentences
+
+def parse_amount(text: str) -> Optional[float]:
+    """
+    Parse the first dollar amount in an award paragraph
+
+    Args:
+        text: The paragraph text
+
+    Returns:
+        Optional[float]: The amount in dollars, or None if there is none
+    """
+    match = AMOUNT.search(text)
+    if not match:
+        return None
+
+    value = float(match.group(1).replace(",", ""))
+    scale = (match.group(2) or "").lower()
+    if scale == "million":
+        value *= 1_000_000
+    elif scale == "billion":
+        value *= 1_000_000_000
+    return value
+
+def parse_completion_date(text: str) -> Optional[str]:
+    """
+    Parse the completion (or ordering-period end) date of an award
+
+    Args:
+        text: The paragraph text
+
+    Returns:
+        Optional[str]: YYYY-MM-DD, YYYY-MM when only a month is given, or None
+    """
+    match = COMPLETION_DATE.search(text)
+    if not match:
+        return None
+
+    raw = re.sub(r"\s+", " ", match.group("date")).replace("Sept.", "Sep.")
+    for input_format, output_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(raw, input_format).strftime(output_format)
+        except ValueError:
+            continue
+    return raw
+
+def parse_awardee(text: str) -> Dict[str, Any]:
+    """
+    Parse the awardee name, location and small-business flag from the start of a paragraph
+
+    Args:
+        text: The paragraph text
+
+    Returns:
+        Dict: company, location and small_business (any of which may be missing)
+    """
+    match = AWARD_VERB.search(text)
+    if not match:
+        return {}
+
+    head = text[:match.start()].strip().rstrip(",")
+    small_business = "*" in head
+    parts = [part.strip().strip("*").strip() for part in head.replace("*", "").split(",")]
+    parts = [part for part in parts if part]
+
+    # "Company, City, State": the last two parts are the location
+    if len(parts) >= 3 and " and " not in head:
+        company, location = ", ".join(parts[:-2]), ", ".join(parts[-2:])
+    elif len(parts) == 2:
+        company, location = parts[0], parts[1]
+    else:
+        company, location = ", ".join(parts), None
+
+    awardee = {"company": company, "small_business": small_business}
+    if location:
+        awardee["location"] = location
+    return awardee
+
+def parse_contracting_activity(text: str) -> Optional[str]:
+    """
+    Parse the contracting activity named in an award paragraph
+
+    Args:
+        text: The paragraph text
+
+    Returns:
+        Optional[str]: The contracting activity, e.g. "Naval Sea Systems Command, Washington, D.C."
+    """
+    for sentence in split_sentences(text):
+        match = CONTRACTING_ACTIVITY.search(sentence)
+        if match:
+            activity = sentence[:match.start()].strip()
+            return re.sub(r"^The\s+", "", activity) or None
+    return None
+
+def parse_award(text: str, section: str) -> Dict[str, Any]:
+    """
+    Extract a structured award record from one award paragraph
+
+    Fields that cannot be found are left out rather than set to None, since
+    vector-store metadata cannot hold nulls.
+
+    Args:
+        text: The paragraph text
+        section: The agency section the paragraph belongs to (e.g. "NAVY")
+
+    Returns:
+        Dict: section and text plus company, location, small_business, amount,
+            contract_number, completion_date and contracting_activity when found
+    """
+    award: Dict[str, Any] = {"section": section, "text": text}
+    award.update(parse_awardee(text))
+
+    amount = parse_amount(text)
+    if amount is not None:
+        award["amount"] = amount
+
+    contract_number = CONTRACT_NUMBER.search(text)
+    if contract_number:
+        award["contract_number"] = "-".join(contract_number.groups())
+
+    completion_date = parse_completion_date(text)
+    if completion_date:
+        award["completion_date"] = completion_date
+
+    activity = parse_contracting_activity(text)
+    if activity:
+        award["contracting_activity"] = activity
+
+    return award
+
+def is_award_paragraph(text: str) -> bool:
+    """
+    Whether a paragraph starts a new award rather than continuing the previous one
+
+    Args:
+        text: The paragraph text
+
+    Returns:
+        bool: True if the paragraph names an awardee and a dollar amount
+    """
+    return bool(AWARD_VERB.search(text)) and bool(AMOUNT.search(text))
@@ -0,0 +1,558 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, AsyncGenerator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import (
+    BACKFILL_STATE_PATH,
+    BACKFILL_SHARD_DAYS,
+    BACKFILL_WORKERS,
+    BACKFILL_MAX_PAGES,
+    DEFENSE_GOV_BASE_URL,
+    HYBRID_SEARCH_ENABLED,
+    VECTOR_BACKEND,
+)
+from app.services.executor import run_blocking
+from app.services.fetcher import ContractFetcher
+from app.services.html_archive import default_archive
+from app.services.ingest_state import get_ingest_state
+from app.services.rate_limiter import share_quota
+from app.services.scraper import contracts_listing_url, extract_contract_links, extract_next_page_url
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    A contiguous range of days backfilled as one unit of work
+    """
+    start: date
+    end: date
+
+    @property
+    def shard_id(self) -> str:
+        return f"{self.start.isoformat()}_{self.end.isoformat()}"
+
+def split_date_range(start: date, end: date, shard_days: int = BACKFILL_SHARD_DAYS) -> List[Shard]:
+    """
+    Split an inclusive date range into shards of at most shard_days days
+
+    Args:
+        start: First day
+        end: Last day
+        shard_days: Days per shard
+
+    Returns:
+        List[Shard]: Shards covering the range, oldest first
+    """
+    shards = []
+    shard_start = start
+    while shard_start <= end:
+        shard_end = min(end, shard_start + timedelta(days=max(1, shard_days) - 1))
+        shards.append(Shard(shard_start, shard_end))
+        shard_start = shard_end + timedelta(days=1)
+    return shards
+
+class BackfillCheckpoint:
+    """
+    Progress of a backfill, so a crashed or interrupted run resumes where it stopped
+
+    Keeps the status and final counts of every shard, and every article a
+    shard has fully stored (or found unchanged). Worker processes write
+    article checkpoints to the same database concurrently.
+    """
+
+    def __init__(self, path: str = BACKFILL_STATE_PATH):
+        """
+        Open (or create) the checkpoint database
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS shards (
+                shard_id TEXT PRIMARY KEY,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stats TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                shard_id TEXT NOT NULL,
+                completed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_articles_shard ON articles(shard_id);
+            """
+        )
+        self._conn.commit()
+
+    def add_shards(self, shards: Iterable[Shard]) -> None:
+        """
+        Register shards as pending, keeping the status of ones already known
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO shards (shard_id, start_date, end_date, status, updated_at) VALUES (?, ?, ?, 'pending', ?)",
+                [(shard.shard_id, shard.start.isoformat(), shard.end.isoformat(), time.time()) for shard in shards]
+            )
+            self._conn.commit()
+
+    def shard_status(self, shard_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM shards WHERE shard_id = ?", (shard_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_shard_status(self, shard_id: str, status: str, stats: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record a shard's status ("pending", "running", "done" or "incomplete") and its last stats
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE shards SET status = ?, stats = COALESCE(?, stats), updated_at = ? WHERE shard_id = ?",
+                (status, json.dumps(stats) if stats is not None else None, time.time(), shard_id)
+            )
+            self._conn.commit()
+
+    def shards(self) -> List[Dict[str, Any]]:
+        """
+        Describe every known shard
+
+        Returns:
+            List[Dict]: shard_id, dates, status, completed article count and last stats, oldest first
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT s.shard_id, s.start_date, s.end_date, s.status, s.stats, COUNT(a.url)
+                FROM shards s LEFT JOIN articles a ON a.shard_id = s.shard_id
+                GROUP BY s.shard_id ORDER BY s.start_date
+                """
+            ).fetchall()
+        return [
+            {
+                "shard_id": shard_id,
+                "start_date": start_date,
+                "end_date": end_date,
+                "status": status,
+                "completed_articles": completed,
+                "stats": json.loads(stats) if stats else None,
+            }
+            for shard_id, start_date, end_date, status, stats, completed in rows
+        ]
+
+    def completed_urls(self, shard_id: str) -> Set[str]:
+        """
+        Return the article URLs a shard has already finished
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT url FROM articles WHERE shard_id = ?", (shard_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def mark_article_done(self, shard_id: str, url: str) -> None:
+        """
+        Checkpoint one finished article
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles (url, shard_id, completed_at) VALUES (?, ?, ?)",
+                (url, shard_id, time.time())
+            )
+            self._conn.commit()
+
+    def reset(self) -> None:
+        """
+        Forget all progress so the next run starts over
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM articles")
+            self._conn.execute("DELETE FROM shards")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class KeywordSpool:
+    """
+    Append-only log of keyword index updates made by a backfill worker process
+
+    The BM25 index is a single pickle file, so worker processes can't update
+    it directly without overwriting each other. They log their updates here
+    instead, and the parent process replays them into the shared index.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def add_many(self, documents: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        self._write([{"op": "add", "id": doc_id, "text": text, "metadata": metadata} for doc_id, text, metadata in documents])
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        self._write([{"op": "remove", "ids": list(doc_ids)}])
+
+    def save(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        # Flushed before the article is checkpointed, so a crash never loses a checkpointed update
+        with self._lock:
+            for entry in entries:
+                self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+def replay_keyword_spool(path: str, keyword_index) -> int:
+    """
+    Apply a worker's logged keyword updates to the shared index and delete the log
+
+    Args:
+        path: The spool file
+        keyword_index: The BM25 index to update
+
+    Returns:
+        int: Number of updates applied
+    """
+    applied = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A worker killed mid-write leaves a partial last line
+                continue
+            if entry["op"] == "add":
+                keyword_index.add(entry["id"], entry["text"], entry["metadata"])
+            else:
+                keyword_index.remove(entry["ids"])
+            applied += 1
+    os.remove(path)
+    return applied
+
+def spool_path(shard: Shard) -> str:
+    return os.path.join(os.path.dirname(BACKFILL_STATE_PATH) or ".", "backfill_keywords", f"{shard.shard_id}.jsonl")
+
+async def listing_pages(
+    fetcher: ContractFetcher,
+    shard: Shard,
+    max_pages: int = BACKFILL_MAX_PAGES
+) -> AsyncGenerator[Tuple[int, List[str]], None]:
+    """
+    Walk every listing page for a shard's date range
+
+    Follows the page's "next" link when it has one, otherwise asks for the
+    following ?Page=N. Stops at an empty page, a page with nothing new, or
+    after max_pages.
+
+    Args:
+        fetcher: Fetcher for the listing pages
+        shard: The date range to list
+        max_pages: Safety limit on pages followed
+
+    Yields:
+        Tuple[int, List[str]]: Page number and the new article URLs on it
+
+    Raises:
+        RuntimeError: If a listing page can't be fetched, so the shard isn't marked done
+    """
+    start, end = shard.start.isoformat(), shard.end.isoformat()
+    url = contracts_listing_url(start, end, base_url=DEFENSE_GOV_BASE_URL)
+    seen: Set[str] = set()
+
+    for page in range(1, max_pages + 1):
+        html = await run_blocking(fetcher.fetch, url)
+        if html is None:
+            raise RuntimeError(f"Failed to retrieve listing page {url}")
+
+        links = [link for link in extract_contract_links(html, DEFENSE_GOV_BASE_URL) if link not in seen]
+        if not links:
+            return
+        seen.update(links)
+        yield page, links
+
+        url = extract_next_page_url(html, url) or contracts_listing_url(start, end, page + 1, DEFENSE_GOV_BASE_URL)
+
+    logger.warning(f"Shard {shard.shard_id} still had listing pages after {max_pages}, stopping")
+
+async def run_shard(
+    shard: Shard,
+    full: bool = False,
+    keyword_index=None,
+    checkpoint: Optional[BackfillCheckpoint] = None
+) -> Dict[str, Any]:
+    """
+    Backfill one shard, skipping the articles an earlier attempt already finished
+
+    Args:
+        shard: The date range to backfill
+        full: Re-process articles even if the ingest state says they are unchanged
+        keyword_index: Keyword index to update instead of the shared one (e.g. a KeywordSpool)
+        checkpoint: Checkpoint store; opened from BACKFILL_STATE_PATH if not given
+
+    Returns:
+        Dict[str, Any]: The shard's status, counts and throughput
+    """
+    # Imported here so worker processes only load the embedding clients when they run a shard
+    from app.services.ingest_pipeline import IngestPipeline
+
+    checkpoint = checkpoint or BackfillCheckpoint()
+    completed = await run_blocking(checkpoint.completed_urls, shard.shard_id)
+
+    ingest_state = None
+    try:
+        ingest_state = await run_blocking(get_ingest_state)
+    except Exception as e:
+        logger.warning(f"Ingest state unavailable, processing every article: {str(e)}")
+
+    async def checkpoint_article(url: str) -> None:
+        await run_blocking(checkpoint.mark_article_done, shard.shard_id, url)
+
+    pipeline = IngestPipeline(
+        ingest_state=ingest_state,
+        full=full,
+        keyword_index=keyword_index,
+        on_article_done=checkpoint_article,
+    )
+    progress = {"pages": 0, "listed": 0, "resumed": 0, "listing_error": None}
+    started = time.monotonic()
+
+    async def article_urls(fetcher: ContractFetcher):
+        try:
+            async for page, links in listing_pages(fetcher, shard):
+                progress["pages"] = page
+                progress["listed"] += len(links)
+                elapsed = time.monotonic() - started
+                print(
+                    f"[{shard.shard_id}] page {page}: {progress['listed']} articles listed, "
+                    f"{pipeline.stats['total_contracts']} ingested, {pipeline.stats['successful_embeddings']} vectors "
+                    f"({pipeline.stats['total_contracts'] / elapsed if elapsed else 0.0:.1f} articles/s)"
+                )
+                for url in links:
+                    if url in completed:
+                        progress["resumed"] += 1
+                        continue
+                    yield url
+        except Exception as e:
+            logger.error(f"Listing failed for shard {shard.shard_id}: {str(e)}")
+            progress["listing_error"] = str(e)
+
+    with ContractFetcher(archive=default_archive()) as fetcher:
+        stats = await pipeline.run_urls(article_urls(fetcher), fetcher)
+
+    elapsed = time.monotonic() - started
+    complete = not progress["listing_error"] and not stats["fetch_errors"] and not stats["failed_articles"]
+    return {
+        "shard_id": shard.shard_id,
+        "status": "done" if complete else "incomplete",
+        "pages": progress["pages"],
+        "listed": progress["listed"],
+        "resumed": progress["resumed"],
+        "ingested": stats["total_contracts"],
+        "unchanged": stats["unchanged_articles"],
+        "vectors": stats["successful_embeddings"],
+        "failed_embeddings": stats["failed_embeddings"],
+        "errors": stats["fetch_errors"] + stats["failed_articles"] + (1 if progress["listing_error"] else 0),
+        "elapsed_seconds": elapsed,
+        "articles_per_second": (stats["total_contracts"] + stats["unchanged_articles"]) / elapsed if elapsed else 0.0,
+        "vectors_per_second": stats["successful_embeddings"] / elapsed if elapsed else 0.0,
+    }
+
+def _init_worker_process(workers: int, initializer: Optional[Callable[..., None]], initargs: Tuple) -> None:
+    # The workers share one Gemini quota, so each limits itself to its share
+    share_quota(workers)
+    if initializer:
+        initializer(*initargs)
+
+def _run_shard_process(start: str, end: str, full: bool) -> Dict[str, Any]:
+    # Entry point in a worker process: keyword updates are spooled for the parent to apply
+    shard = Shard(date.fromisoformat(start), date.fromisoformat(end))
+    spool = KeywordSpool(spool_path(shard)) if HYBRID_SEARCH_ENABLED else None
+    try:
+        return asyncio.run(run_shard(shard, full=full, keyword_index=spool))
+    finally:
+        if spool:
+            spool.close()
+
+def _apply_spool(shard: Shard) -> None:
+    path = spool_path(shard)
+    if not os.path.exists(path):
+        return
+    from app.services.bm25 import get_keyword_index
+
+    keyword_index = get_keyword_index()
+    applied = replay_keyword_spool(path, keyword_index)
+    keyword_index.save()
+    logger.info(f"Applied {applied} keyword index updates from shard {shard.shard_id}")
+
+def run_backfill(
+    start: date,
+    end: date,
+    shard_days: int = BACKFILL_SHARD_DAYS,
+    workers: int = BACKFILL_WORKERS,
+    full: bool = False,
+    restart: bool = False,
+    initializer: Optional[Callable[..., None]] = None,
+    initargs: Tuple = (),
+) -> Dict[str, Any]:
+    """
+    Backfill every contract article published between two dates
+
+    The range is split into shards that run in parallel worker processes.
+    Each finished article is checkpointed, so after a crash the next run
+    skips completed shards and, within the others, completed articles.
+
+    Args:
+        start: First day
+        end: Last day
+        shard_days: Days per shard
+        workers: Worker processes (1 runs the shards in this process)
+        full: Re-process articles even if the ingest state says they are unchanged
+        restart: Discard the checkpoints of earlier runs first
+        initializer: Optional function run in each worker process before its first shard
+        initargs: Arguments for initializer
+
+    Returns:
+        Dict[str, Any]: Per-shard results and overall totals and throughput
+    """
+    checkpoint = BackfillCheckpoint()
+    if restart:
+        checkpoint.reset()
+
+    shards = split_date_range(start, end, shard_days)
+    checkpoint.add_shards(shards)
+    pending = [shard for shard in shards if checkpoint.shard_status(shard.shard_id) != "done"]
+    print(f"Backfilling {start} to {end}: {len(shards)} shards, {len(shards) - len(pending)} already done")
+
+    # Keyword updates a crashed earlier run didn't get to apply
+    for shard in shards:
+        _apply_spool(shard)
+
+    if VECTOR_BACKEND == "local" and workers > 1:
+        # Each process would persist its own copy of the local index over the others'
+        logger.warning("The local vector backend is single-process, running shards one at a time")
+        workers = 1
+
+    started = time.monotonic()
+    results: List[Dict[str, Any]] = []
+
+    def finish(shard: Shard, result: Dict[str, Any]) -> None:
+        checkpoint.set_shard_status(shard.shard_id, result["status"], result)
+        results.append(result)
+        print(
+            f"[{len(results)}/{len(pending)}] shard {shard.shard_id} {result['status']}: "
+            f"{result.get('ingested', 0)} ingested, {result.get('unchanged', 0)} unchanged, "
+            f"{result.get('resumed', 0)} resumed, {result.get('vectors', 0)} vectors, {result.get('errors', 0)} errors "
+            f"in {result.get('elapsed_seconds', 0.0):.1f}s ({result.get('articles_per_second', 0.0):.1f} articles/s, "
+            f"{result.get('vectors_per_second', 0.0):.1f} vectors/s)"
+        )
+
+    if workers <= 1:
+        if initializer:
+            initializer(*initargs)
+
+        async def run_inline():
+            for shard in pending:
+                checkpoint.set_shard_status(shard.shard_id, "running")
+                finish(shard, await run_shard(shard, full=full, checkpoint=checkpoint))
+
+        asyncio.run(run_inline())
+    else:
+        # Spawned (not forked) so no client threads or gRPC channels are inherited
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker_process,
+            initargs=(workers, initializer, initargs)
+        ) as pool:
+            futures = {}
+            for shard in pending:
+                checkpoint.set_shard_status(shard.shard_id, "running")
+                futures[pool.submit(_run_shard_process, shard.start.isoformat(), shard.end.isoformat(), full)] = shard
+
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Shard {shard.shard_id} failed: {str(e)}")
+                    result = {"shard_id": shard.shard_id, "status": "incomplete", "error": str(e)}
+                # The parent is the only process writing the keyword index
+                _apply_spool(shard)
+                finish(shard, result)
+
+    elapsed = time.monotonic() - started
+    articles = sum(result.get("ingested", 0) + result.get("unchanged", 0) for result in results)
+    vectors = sum(result.get("vectors", 0) for result in results)
+    summary = {
+        "shards": len(shards),
+        "completed_shards": sum(1 for shard in checkpoint.shards() if shard["status"] == "done"),
+        "articles": articles,
+        "vectors": vectors,
+        "elapsed_seconds": elapsed,
+        "articles_per_second": articles / elapsed if elapsed else 0.0,
+        "vectors_per_second": vectors / elapsed if elapsed else 0.0,
+        "results": results,
+    }
+    print(
+        f"Backfill finished: {summary['completed_shards']}/{len(shards)} shards done, {articles} articles, "
+        f"{vectors} vectors in {elapsed:.1f}s ({summary['articles_per_second']:.1f} articles/s)"
+    )
+    checkpoint.close()
+    return summary
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backfill contract articles for a date range across worker processes")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day (YYYY-MM-DD), default yesterday")
+    parser.add_argument("--shard-days", type=int, default=BACKFILL_SHARD_DAYS, help="Days per shard")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="Worker processes")
+    parser.add_argument("--full", action="store_true", help="Re-process articles even if unchanged since the last ingest")
+    parser.add_argument("--restart", action="store_true", help="Discard checkpoints from earlier runs")
+    parser.add_argument("--status", action="store_true", help="Show shard progress and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        for shard in BackfillCheckpoint().shards():
+            print(f"{shard['shard_id']}: {shard['status']}, {shard['completed_articles']} articles checkpointed")
+        return 0
+
+    if args.start is None:
+        parser.error("--start is required")
+    end = args.end or date.today() - timedelta(days=1)
+
+    summary = run_backfill(args.start, end, args.shard_days, args.workers, full=args.full, restart=args.restart)
+    return 0 if summary["completed_shards"] == summary["shards"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import BM25_INDEX_PATH
+from app.services.metadata_filters import matches_filter
+
+logger = logging.getLogger(__name__)
+
+# Words that carry no signal in contract announcements
+STOPWORDS = frozenset("""
+a an and are as at be been by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+# Keep identifiers such as FA8650-25-C-1234 or N00024.22 together as one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search tokens
+
+    Compound identifiers are kept whole and also split into their parts, so
+    "FA8650-25-C-1234" matches both the exact contract number and "FA8650".
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        List[str]: Tokens in order, with stopwords removed
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if len(token) > 1 and any(separator in token for separator in "-./"):
+            tokens.extend(part for part in re.split(r"[-./]", token) if part and part not in STOPWORDS)
+    return tokens
+
+class BM25Index:
+    """
+    Incrementally updatable inverted index with BM25 scoring
+
+    Postings are stored as compact typed arrays (document numbers and term
+    frequencies) rather than Python objects. Documents can be added, replaced
+    and removed one at a time, and the index is persisted with pickle.
+    """
+
+    def __init__(self, path: Optional[str] = BM25_INDEX_PATH, k1: float = 1.2, b: float = 0.75):
+        """
+        Open the index, loading it from disk if it exists
+
+        Args:
+            path: File to persist to, or None for a memory-only index
+            k1: BM25 term-frequency saturation
+            b: BM25 document-length normalization
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._loaded_mtime: Optional[float] = None
+        self._reset()
+
+        if path and os.path.exists(path):
+            self._load()
+
+    def _reset(self) -> None:
+        self._terms: Dict[str, int] = {}
+        self._postings: List[array] = []       # per term: document numbers
+        self._frequencies: List[array] = []    # per term: term frequency in each document
+        self._doc_ids: List[Optional[str]] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._doc_lengths = array("I")
+        self._doc_terms: List[Optional[array]] = []
+        self._doc_metadata: List[Optional[Dict[str, Any]]] = []
+        self._free: List[int] = []
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Index a document, replacing any earlier version with the same ID
+
+        Args:
+            doc_id: Document ID (the vector ID)
+            text: Full document text
+            metadata: Small metadata dict used for filtering and sources
+        """
+        counts: Dict[str, int] = {}
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+
+        with self._lock:
+            self._remove(doc_id)
+
+            # Reuse slots freed by removed documents
+            if self._free:
+                number = self._free.pop()
+            else:
+                number = len(self._doc_ids)
+                self._doc_ids.append(None)
+                self._doc_lengths.append(0)
+                self._doc_terms.append(None)
+                self._doc_metadata.append(None)
+
+            term_numbers = array("I")
+            for token, count in counts.items():
+                term = self._terms.get(token)
+                if term is None:
+                    term = self._terms[token] = len(self._postings)
+                    self._postings.append(array("I"))
+                    self._frequencies.append(array("H"))
+                self._postings[term].append(number)
+                self._frequencies[term].append(min(count, 65535))
+                term_numbers.append(term)
+
+            length = sum(counts.values())
+            self._doc_ids[number] = doc_id
+            self._doc_numbers[doc_id] = number
+            self._doc_lengths[number] = length
+            self._doc_terms[number] = term_numbers
+            self._doc_metadata[number] = metadata or {}
+            self._total_length += length
+            self._dirty = True
+
+    def add_many(self, documents: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        """
+        Index several (doc_id, text, metadata) documents
+        """
+        for doc_id, text, metadata in documents:
+            self.add(doc_id, text, metadata)
+
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        """
+        Remove documents from the index
+
+        Args:
+            doc_ids: IDs of the documents to remove
+
+        Returns:
+            int: Number of documents removed
+        """
+        with self._lock:
+            removed = sum(1 for doc_id in doc_ids if self._remove(doc_id))
+            if removed:
+                self._dirty = True
+        return removed
+
+    def _remove(self, doc_id: str) -> bool:
+        number = self._doc_numbers.pop(doc_id, None)
+        if number is None:
+            return False
+
+        for term in self._doc_terms[number]:
+            postings = self._postings[term]
+            position = postings.index(number)
+            postings.pop(position)
+            self._frequencies[term].pop(position)
+
+        self._total_length -= self._doc_lengths[number]
+        self._doc_ids[number] = None
+        self._doc_lengths[number] = 0
+        self._doc_terms[number] = None
+        self._doc_metadata[number] = None
+        self._free.append(number)
+        return True
+
+    def search(self, query: str, top_k: int = 10, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Rank documents against a query with BM25
+
+        Args:
+            query: The search query
+            top_k: Number of results to return
+            filter: Optional Pinecone-style filter applied to document metadata
+
+        Returns:
+            List[Tuple[str, float, Dict]]: (doc_id, score, metadata) ordered by descending score
+        """
+        self._reload_if_changed()
+
+        with self._lock:
+            doc_count = len(self._doc_numbers)
+            if doc_count == 0:
+                return []
+
+            average_length = self._total_length / doc_count
+            scores: Dict[int, float] = {}
+
+            for token in set(tokenize(query)):
+                term = self._terms.get(token)
+                if term is None:
+                    continue
+
+                postings = self._postings[term]
+                document_frequency = len(postings)
+                if document_frequency == 0:
+                    continue
+
+                idf = math.log(1 + (doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+                for number, frequency in zip(postings, self._frequencies[term]):
+                    length_norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[number] / average_length)
+                    scores[number] = scores.get(number, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + length_norm)
+
+            if filter:
+                scores = {number: score for number, score in scores.items() if matches_filter(self._doc_metadata[number], filter)}
+
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [(self._doc_ids[number], score, dict(self._doc_metadata[number])) for number, score in best]
+
+    def save(self) -> None:
+        """
+        Persist the index if it changed since it was loaded or last saved
+        """
+        if not self.path:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            state = {
+                "terms": self._terms,
+                "postings": self._postings,
+                "frequencies": self._frequencies,
+                "doc_ids": self._doc_ids,
+                "doc_lengths": self._doc_lengths,
+                "doc_terms": self._doc_terms,
+                "doc_metadata": self._doc_metadata,
+                "free": self._free,
+                "total_length": self._total_length,
+            }
+            # Write then rename so a reader never sees a partial file
+            with open(self.path + ".tmp", "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(self.path + ".tmp", self.path)
+
+            self._loaded_mtime = os.path.getmtime(self.path)
+            self._dirty = False
+
+        logger.info(f"Saved keyword index with {len(self)} documents to {self.path}")
+
+    def _load(self) -> None:
+        with open(self.path, "rb") as f:
+            state = pickle.load(f)
+
+        self._terms = state["terms"]
+        self._postings = state["postings"]
+        self._frequencies = state["frequencies"]
+        self._doc_ids = state["doc_ids"]
+        self._doc_lengths = state["doc_lengths"]
+        self._doc_terms = state["doc_terms"]
+        self._doc_metadata = state["doc_metadata"]
+        self._free = state["free"]
+        self._total_length = state["total_length"]
+        self._doc_numbers = {doc_id: number for number, doc_id in enumerate(self._doc_ids) if doc_id is not None}
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+    def _reload_if_changed(self) -> None:
+        # Pick up documents indexed by another process (e.g. a CLI ingest)
+        if not self.path or not os.path.exists(self.path):
+            return
+        if os.path.getmtime(self.path) == self._loaded_mtime:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                self._load()
+                logger.info("Reloaded keyword index after an external update")
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Merge several ranked ID lists with reciprocal-rank fusion
+
+    Each ID scores sum(1 / (k + rank)) over the lists it appears in, so items
+    ranked well by either retriever rise to the top without having to
+    calibrate BM25 scores against cosine similarities.
+
+    Args:
+        rankings: Ranked lists of IDs, best first
+        k: Damping constant; larger values flatten the contribution of top ranks
+
+    Returns:
+        List[Tuple[str, float]]: (id, fused score) ordered by descending score
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+_index: Optional[BM25Index] = None
+
+def get_keyword_index() -> BM25Index:
+    """
+    Return the process-wide keyword index, loading it on first use
+
+    Returns:
+        BM25Index: The shared index instance
+    """
+    global _index
+    if _index is None:
+        _index = BM25Index()
+    return _index
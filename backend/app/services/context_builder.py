@@ -0,0 +1,243 @@
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence
+
+from app.config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_DEDUP_THRESHOLD,
+    CONTEXT_MMR_LAMBDA,
+    CONTEXT_MIN_PASSAGE_TOKENS,
+)
+from app.services.bm25 import tokenize
+from app.services.metrics import CONTEXT_TOKENS
+from app.services.rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Words per shingle when comparing passages for near-duplicates
+SHINGLE_SIZE = 3
+
+# Sentence boundaries in award announcements ("... Fort Worth, Texas. This contract ...")
+SENTENCE_END = re.compile(r"(?<=[a-z0-9)][.;])\s+(?=[A-Z(])")
+
+@dataclass
+class Passage:
+    """
+    One retrieved match considered for the prompt context
+    """
+    match: Any
+    text: str
+    relevance: float            # Retrieval score relative to the best candidate, 0-1
+    tokens: int
+    shingles: FrozenSet[str]
+    terms: Dict[str, float]     # L2-normalized term frequencies
+
+@dataclass
+class Context:
+    """
+    Passages chosen for a prompt, best first, with the matches they came from
+    """
+    matches: List[Any] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+    tokens: int = 0
+    candidates: int = 0
+    duplicates: int = 0
+    trimmed: int = 0
+
+    def combined(self) -> str:
+        return "\n\n".join(self.texts)
+
+def shingles(tokens: Sequence[str], size: int = SHINGLE_SIZE) -> FrozenSet[str]:
+    """
+    Overlapping runs of `size` tokens; short texts yield a single shingle of all their tokens
+    """
+    if len(tokens) <= size:
+        return frozenset([" ".join(tokens)]) if tokens else frozenset()
+    return frozenset(" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def term_vector(tokens: Sequence[str]) -> Dict[str, float]:
+    counts: Dict[str, float] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0.0) + 1.0
+    norm = math.sqrt(sum(count * count for count in counts.values())) or 1.0
+    return {token: count / norm for token, count in counts.items()}
+
+def cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(token, 0.0) for token, weight in a.items())
+
+def trim_passage(text: str, query_terms: FrozenSet[str], max_tokens: int) -> str:
+    """
+    Shorten a passage to about `max_tokens`, keeping the sentences that mention the query
+
+    Sentences are ranked by how many query terms they contain, then by how
+    closely they follow a sentence that does (the rest of the same award),
+    and as many as fit are kept, in their original order; sentences before
+    the first match are left out. Without any match the leading sentences
+    are kept. Omitted stretches are marked with "...". A passage without a
+    sentence that fits is cut at a word boundary.
+
+    Args:
+        text: The passage
+        query_terms: Tokens of the search query
+        max_tokens: Estimated token limit for the result
+
+    Returns:
+        str: The passage, or a shortened version of it
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    sentences = SENTENCE_END.split(text)
+    overlap = [len(query_terms.intersection(tokenize(sentence))) for sentence in sentences]
+    matching = [i for i, count in enumerate(overlap) if count]
+    if matching:
+        ranked = sorted(
+            range(matching[0], len(sentences)),
+            key=lambda i: (-overlap[i], min(i - j for j in matching if j <= i), i)
+        )
+    else:
+        ranked = list(range(len(sentences)))
+    kept = []
+    # Room for the "..." closing the passage
+    used = 1
+    for i in ranked:
+        # Allow for the separator and a "..." before the sentence
+        cost = estimate_tokens(sentences[i]) + 2
+        if used + cost <= max_tokens:
+            kept.append(i)
+            used += cost
+
+    if not kept:
+        cut = text[:(max_tokens - 1) * 4]
+        return cut.rsplit(" ", 1)[0] + " ..."
+
+    kept.sort()
+    parts = []
+    for position, i in enumerate(kept):
+        if i > (kept[position - 1] + 1 if position else 0):
+            parts.append("...")
+        parts.append(sentences[i])
+    if kept[-1] < len(sentences) - 1:
+        parts.append("...")
+    return " ".join(parts)
+
+def _passages(matches: Sequence[Any]) -> List[Passage]:
+    scores = [float(match.score or 0.0) for match in matches]
+    best = max(scores, default=0.0)
+    passages = []
+    for match, score in zip(matches, scores):
+        text = (match.metadata or {}).get("text", "")
+        if not text:
+            continue
+        tokens = tokenize(text)
+        passages.append(Passage(
+            match=match,
+            text=text,
+            relevance=score / best if best > 0 else 0.0,
+            tokens=estimate_tokens(text),
+            shingles=shingles(tokens),
+            terms=term_vector(tokens),
+        ))
+    return passages
+
+def build_context(
+    query: str,
+    matches: Sequence[Any],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+    mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+    min_passage_tokens: int = CONTEXT_MIN_PASSAGE_TOKENS,
+    max_passages: Optional[int] = None,
+) -> Context:
+    """
+    Choose the passages to put in the prompt from a wide set of retrieved matches
+
+    Matches are taken best first; any whose text is a near-duplicate of a
+    better one (word-shingle Jaccard similarity of at least
+    `dedup_threshold`, e.g. the same award re-announced as a modification)
+    is dropped. The rest are picked by maximal marginal relevance: each step
+    takes the passage with the best trade-off between its retrieval score
+    and its term similarity to the passages already picked, until the token
+    budget is spent or `max_passages` are picked. A passage too long for what is left of the budget is
+    trimmed to its sentences that mention the query, if at least
+    `min_passage_tokens` remain.
+
+    Args:
+        query: The search query
+        matches: Retrieved matches with score and metadata["text"], best first
+        token_budget: Estimated tokens of passage text allowed in the prompt
+        dedup_threshold: Similarity at which a passage counts as a duplicate
+        mmr_lambda: Weight of relevance against diversity, 0-1
+        min_passage_tokens: Smallest trimmed passage worth including
+        max_passages: Most passages to pick (None for as many as the budget allows)
+
+    Returns:
+        Context: The chosen passages and matches, in the order they were picked
+    """
+    context = Context(candidates=len(matches))
+
+    unique: List[Passage] = []
+    for passage in _passages(matches):
+        if any(jaccard(passage.shingles, kept.shingles) >= dedup_threshold for kept in unique):
+            context.duplicates += 1
+            continue
+        unique.append(passage)
+
+    query_terms = frozenset(tokenize(query))
+    chosen: List[Passage] = []
+    remaining = unique
+    while remaining and context.tokens < token_budget and (max_passages is None or len(chosen) < max_passages):
+        best = max(
+            remaining,
+            key=lambda p: mmr_lambda * p.relevance - (1 - mmr_lambda) * max((cosine(p.terms, c.terms) for c in chosen), default=0.0)
+        )
+        remaining = [p for p in remaining if p is not best]
+
+        available = token_budget - context.tokens
+        text = best.text
+        if best.tokens > available:
+            # A shorter passage further down may still fit whole
+            if available < min_passage_tokens:
+                continue
+            text = trim_passage(best.text, query_terms, available)
+            context.trimmed += 1
+
+        chosen.append(best)
+        context.matches.append(best.match)
+        context.texts.append(text)
+        context.tokens += estimate_tokens(text)
+
+    return context
+
+def passthrough_context(matches: Sequence[Any]) -> Context:
+    """
+    Every match's stored text in retrieval order, without a budget
+    """
+    context = Context(candidates=len(matches))
+    for match in matches:
+        text = (match.metadata or {}).get("text", "")
+        if text:
+            context.texts.append(text)
+            context.tokens += estimate_tokens(text)
+    context.matches = list(matches)
+    return context
+
+def log_context_usage(context: Context, token_budget: Optional[int] = CONTEXT_TOKEN_BUDGET) -> None:
+    """
+    Log and record how many context tokens a prompt used
+    """
+    CONTEXT_TOKENS.observe(context.tokens)
+    logger.info(
+        f"Context: {len(context.texts)} passages from {context.candidates} candidates, "
+        f"{context.duplicates} near-duplicates dropped, {context.trimmed} trimmed, "
+        f"{context.tokens}{f' of {token_budget}' if token_budget else ''} tokens"
+    )
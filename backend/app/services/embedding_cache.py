@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from app.config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text before hashing so whitespace-only differences share a cache entry
+
+    Args:
+        text: The text to normalize
+
+    Returns:
+        str: The text with runs of whitespace collapsed to single spaces
+    """
+    return " ".join(text.split())
+
+def cache_key(model: str, text: str) -> str:
+    """
+    Build the cache key for a text embedded with a given model
+
+    Args:
+        model: The embedding model name
+        text: The text that was embedded
+
+    Returns:
+        str: Hex SHA-256 of the model name and normalized text
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent SQLite cache of embeddings keyed by model and content hash
+
+    Entries are evicted least-recently-used first once the cache holds more
+    than max_entries embeddings.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        """
+        Open (or create) the cache database
+
+        Args:
+            path: Path of the SQLite database file
+            max_entries: Maximum number of embeddings kept on disk
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings for several texts
+
+        Args:
+            model: The embedding model name
+            texts: The texts to look up
+
+        Returns:
+            List[Optional[List[float]]]: One embedding per text, in order, or None on a miss
+        """
+        keys = [cache_key(model, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i+500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        """
+        Store embeddings and evict the least recently used entries if the cache is full
+
+        Args:
+            model: The embedding model name
+            texts: The texts that were embedded
+            embeddings: The embedding for each text, in the same order
+        """
+        if not texts:
+            return
+
+        now = time.time()
+        rows = [
+            (cache_key(model, text), model, array("f", embedding).tobytes(), now, now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict(self.max_entries)
+            self._conn.commit()
+
+    def _evict(self, max_entries: int) -> int:
+        # Caller holds the lock and commits
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - max_entries
+        if excess <= 0:
+            return 0
+
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        logger.info(f"Evicted {excess} embeddings from cache")
+        return excess
+
+    def prune(self, max_entries: Optional[int] = None, older_than_days: Optional[float] = None) -> int:
+        """
+        Remove entries from the cache
+
+        Args:
+            max_entries: Keep at most this many of the most recently used entries
+            older_than_days: Remove entries not used within this many days
+
+        Returns:
+            int: Number of entries removed
+        """
+        removed = 0
+
+        with self._lock:
+            if older_than_days is not None:
+                cutoff = time.time() - older_than_days * 86400
+                removed += self._conn.execute("DELETE FROM embeddings WHERE last_used < ?", (cutoff,)).rowcount
+            if max_entries is not None:
+                removed += self._evict(max_entries)
+            self._conn.commit()
+
+        return removed
+
+    def clear(self) -> int:
+        """
+        Remove every entry from the cache
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM embeddings").rowcount
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+        return removed
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Describe the cache contents and this process's hit/miss counters
+
+        Returns:
+            Dict: Entry counts per model, database size and hit/miss counters
+        """
+        with self._lock:
+            models = dict(self._conn.execute("SELECT model, COUNT(*) FROM embeddings GROUP BY model").fetchall())
+            oldest, newest = self._conn.execute("SELECT MIN(last_used), MAX(last_used) FROM embeddings").fetchone()
+
+        return {
+            "path": self.path,
+            "entries": sum(models.values()),
+            "max_entries": self.max_entries,
+            "models": models,
+            "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "oldest_use": oldest,
+            "newest_use": newest,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self) -> None:
+        """
+        Close the database connection
+        """
+        with self._lock:
+            self._conn.close()
+
+_cache: Optional[EmbeddingCache] = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Return the process-wide embedding cache, opening it on first use
+
+    Returns:
+        EmbeddingCache: The shared cache instance
+    """
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or prune the persistent embedding cache")
+    parser.add_argument("--path", default=EMBEDDING_CACHE_PATH, help="Cache database path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="Show cache size and entries per model")
+
+    prune_parser = subparsers.add_parser("prune", help="Remove old or excess entries")
+    prune_parser.add_argument("--max-entries", type=int, help="Keep at most this many most recently used entries")
+    prune_parser.add_argument("--older-than-days", type=float, help="Remove entries not used in this many days")
+
+    subparsers.add_parser("clear", help="Remove every entry")
+
+    args = parser.parse_args()
+    cache = EmbeddingCache(args.path)
+
+    try:
+        if args.command == "stats":
+            stats = cache.stats()
+            print(f"Path: {stats['path']}")
+            print(f"Entries: {stats['entries']} (max {stats['max_entries']})")
+            print(f"Size: {stats['size_bytes'] / 1024 / 1024:.1f} MB")
+            for model, count in stats["models"].items():
+                print(f"  {model}: {count}")
+            if stats["oldest_use"]:
+                print(f"Least recently used: {time.ctime(stats['oldest_use'])}")
+                print(f"Most recently used: {time.ctime(stats['newest_use'])}")
+        elif args.command == "prune":
+            if args.max_entries is None and args.older_than_days is None:
+                parser.error("prune needs --max-entries and/or --older-than-days")
+            removed = cache.prune(max_entries=args.max_entries, older_than_days=args.older_than_days)
+            print(f"Removed {removed} entries")
+        elif args.command == "clear":
+            print(f"Removed {cache.clear()} entries")
+    finally:
+        cache.close()
+
+if __name__ == "__main__":
+    main()
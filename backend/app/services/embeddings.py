@@ -1,8 +1,43 @@
+import asyncio
 import logging
 import json
-from typing import Dict, List, Any, AsyncGenerator
+import time
+from contextlib import aclosing, nullcontext
+from typing import Dict, Iterable, List, Any, AsyncGenerator, Optional, Tuple
+from types import SimpleNamespace
 from pinecone.grpc import PineconeGRPC as Pinecone
-from app.config import PINECONE_API_KEY, GEMINI_API_KEY
+from app.config import (
+    PINECONE_API_KEY,
+    GEMINI_API_KEY,
+    VECTOR_BACKEND,
+    LOCAL_VECTOR_STORE_PATH,
+    LOCAL_VECTOR_DTYPE,
+    HYBRID_SEARCH_ENABLED,
+    HYBRID_CANDIDATES,
+    RRF_K,
+    QUERY_FILTERS_ENABLED,
+    QUERY_EMBEDDING_CACHE_DISK,
+    ANSWER_CACHE_ENABLED,
+    CONTEXT_BUILDER_ENABLED,
+    CONTEXT_CANDIDATES,
+    CONTEXT_TOKEN_BUDGET,
+    NEAR_DUPLICATE_MODE,
+    NEAR_DUPLICATE_SEARCH_CANDIDATES,
+)
+from app.services.answer_cache import get_answer_cache
+from app.services.bm25 import get_keyword_index, reciprocal_rank_fusion
+from app.services.context_builder import Context, build_context, log_context_usage, passthrough_context
+from app.services.embedding_cache import get_embedding_cache
+from app.services.executor import run_blocking
+from app.services.metadata_filters import matches_filter
+from app.services.metrics import GEMINI_TOKENS
+from app.services.near_duplicates import COPY_FIELDS, get_near_duplicate_index
+from app.services.query_cache import get_query_embedding_cache, normalize_query
+from app.services.rate_limiter import BACKGROUND, INTERACTIVE, estimate_tokens, get_rate_limiter, is_retryable
+from app.services.vector_index import IndexManager
+from app.services.ingest_state import IngestStateStore
+from app.services.query_filters import QueryFilters, extract_query_filters
+from app.services.tracing import record_stage, stage, trace
 from google import genai
 from google.genai import types
 from fastapi.responses import StreamingResponse
@@ -23,11 +58,16 @@ genai_client = genai.Client(api_key=GEMINI_API_KEY)
 # Constants
 INDEX_NAME = "govwatch"
 EMBEDDING_MODEL = "text-embedding-004"  # Gemini's embedding model
-BATCH_SIZE = 20  # Smaller batch size for Gemini API
+BATCH_SIZE = 100  # Gemini accepts up to 100 texts per embedding request
+EMBEDDING_CONCURRENCY = 4  # Embedding batches in flight at once
+MAX_EMBEDDING_CHARS = 25000  # Gemini's limit may be different, adjust as needed
 
 def initialize_pinecone():
     """
     Initialize Pinecone and connect to the index
+    
+    Called once per connection by index_manager; use index_manager.get_index()
+    to get the shared handle.
     """
     try:
         # Debug logging
@@ -52,29 +92,88 @@ def initialize_pinecone():
         logger.error(f"Error initializing Pinecone: {str(e)}")
         raise
 
-async def generate_gemini_embedding(text: str) -> List[float]:
+def connect_vector_index():
+    """
+    Connect to the vector store backend selected by VECTOR_BACKEND
+    
+    Both backends expose the same upsert/query/delete/describe_index_stats interface.
+    
+    Returns:
+        The index handle: a Pinecone index or a LocalVectorIndex
+    """
+    if VECTOR_BACKEND == "local":
+        # Imported lazily so numpy is only needed when the local backend is used
+        from app.services.vector_store import LocalVectorIndex
+        
+        logger.info(f"Using local vector index at {LOCAL_VECTOR_STORE_PATH} ({LOCAL_VECTOR_DTYPE})")
+        return LocalVectorIndex(LOCAL_VECTOR_STORE_PATH, dtype=LOCAL_VECTOR_DTYPE)
+    
+    if VECTOR_BACKEND != "pinecone":
+        raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND}")
+    
+    return initialize_pinecone()
+
+# Long-lived index handle shared by ingest and search
+index_manager = IndexManager(connect_vector_index)
+
+def truncate_for_embedding(text: str) -> str:
+    """
+    Truncate text that is too long for the embedding model (Gemini has token limits)
+    
+    Args:
+        text: The text to embed
+        
+    Returns:
+        str: The text, cut to MAX_EMBEDDING_CHARS if needed
+    """
+    if len(text) > MAX_EMBEDDING_CHARS:
+        logger.warning(f"Text too long ({len(text)} chars), truncating to {MAX_EMBEDDING_CHARS} chars")
+        return text[:MAX_EMBEDDING_CHARS]
+    return text
+
+def record_generation_usage(operation: str, usage: Any, prompt: str, answer: str) -> None:
+    """
+    Count a generation's tokens, estimating them when Gemini didn't report usage
+    
+    Args:
+        operation: "search" or "stream"
+        usage: The response's usage_metadata, if any
+        prompt: The prompt sent
+        answer: The generated text
+    """
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+    answer_tokens = getattr(usage, "candidates_token_count", None) or (estimate_tokens(answer) if answer else 0)
+    GEMINI_TOKENS.inc(prompt_tokens, operation=operation, direction="prompt")
+    GEMINI_TOKENS.inc(answer_tokens, operation=operation, direction="completion")
+
+async def generate_gemini_embedding(text: str, priority: int = INTERACTIVE) -> List[float]:
     """
     Generate an embedding for the given text using Gemini's API
     
     Args:
         text: The text to generate an embedding for
+        priority: Rate-limiter lane, INTERACTIVE (search) or BACKGROUND (ingest)
         
     Returns:
         List[float]: The embedding vector
     """
     try:
-        # Truncate text if it's too long (Gemini has token limits)
-        max_chars = 25000  # Gemini's limit may be different, adjust as needed
-        if len(text) > max_chars:
-            logger.warning(f"Text too long ({len(text)} chars), truncating to {max_chars} chars")
-            text = text[:max_chars]
-        
-        # Generate embedding using Gemini
-        result = genai_client.models.embed_content(
-            model=EMBEDDING_MODEL,
-            contents=text
+        text = truncate_for_embedding(text)
+        
+        # Generate embedding using Gemini's async client so the event loop stays free;
+        # the rate limiter queues, throttles and retries the call
+        result = await get_rate_limiter().call(
+            lambda: genai_client.aio.models.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=text
+            ),
+            priority=priority,
+            tokens=estimate_tokens(text)
         )
         
+        # Embedding responses carry no usage, so count the estimate
+        GEMINI_TOKENS.inc(estimate_tokens(text), operation="embed", direction="prompt")
+        
         # Make sure we're returning a list of floats
         embeddings = result.embeddings
         values = embeddings[0].values
@@ -85,168 +184,620 @@ async def generate_gemini_embedding(text: str) -> List[float]:
         logger.error(f"Error generating Gemini embedding: {str(e)}")
         raise
 
-async def generate_embeddings(contract_data: List[Dict[str, Any]]):
+async def embed_query(query: str) -> List[float]:
     """
-    Process contract data, generate embeddings using Gemini, and upsert to Pinecone
-    All vectors will be stored in a single namespace
+    Embed a search query, reusing the embedding of an identical recent query
+    
+    Checks the in-memory LRU cache, then (if QUERY_EMBEDDING_CACHE_DISK is
+    set) the persistent embedding cache, and only calls Gemini on a miss in
+    both, so repeated searches skip a remote round trip.
     
     Args:
-        contract_data: List of contract dictionaries with date, sections, and URL
+        query: The search query
+        
+    Returns:
+        List[float]: The query embedding
+    """
+    with stage("embed_query"):
+        cache = get_query_embedding_cache()
+        embedding = cache.get(EMBEDDING_MODEL, query)
+        if embedding is not None:
+            return embedding
+        
+        normalized = normalize_query(query)
+        disk_cache = None
+        if QUERY_EMBEDDING_CACHE_DISK:
+            try:
+                disk_cache = await run_blocking(get_embedding_cache)
+                embedding = (await run_blocking(disk_cache.get_many, EMBEDDING_MODEL, [normalized]))[0]
+            except Exception as e:
+                logger.warning(f"Query embedding disk cache unavailable: {str(e)}")
+                disk_cache = None
+            if embedding is not None:
+                cache.record_disk_hit()
+                cache.put(EMBEDDING_MODEL, query, embedding)
+                return embedding
+        
+        embedding = await generate_gemini_embedding(query)
+        cache.put(EMBEDDING_MODEL, query, embedding)
+        if disk_cache:
+            try:
+                await run_blocking(disk_cache.put_many, EMBEDDING_MODEL, [normalized], [embedding])
+            except Exception as e:
+                logger.warning(f"Could not store query embedding on disk: {str(e)}")
+        return embedding
+
+async def embed_queries(queries: List[str]) -> List[Optional[List[float]]]:
+    """
+    Embed many search queries at once, reusing the embeddings of recent identical queries
+    
+    Cached queries are served as in embed_query; the rest are embedded with
+    one Gemini request per BATCH_SIZE distinct queries instead of one each.
     
+    Args:
+        queries: The search queries
+        
     Returns:
-        Dict: Statistics about the processing
+        List[Optional[List[float]]]: One embedding per query, in order, or None where embedding failed
     """
-    try:
-        # Initialize Pinecone
-        index = initialize_pinecone()
-        
-        stats = {
-            "total_contracts": len(contract_data),
-            "successful_embeddings": 0,
-            "failed_embeddings": 0,
-            "total_sections": 0,
-            "batches_processed": 0
-        }
+    with stage("embed_query"):
+        cache = get_query_embedding_cache()
+        embeddings = [cache.get(EMBEDDING_MODEL, query) for query in queries]
         
-        # Collect all sections across all contracts
-        all_sections = []
+        # Queries that only differ in case or spacing are embedded once
+        missing: Dict[str, List[int]] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(normalize_query(queries[i]), []).append(i)
+        if not missing:
+            return embeddings
         
-        # Process each contract
-        for contract in contract_data:
-            contract_url = contract["url"]
-            contract_date = contract["date"]
-            sections = contract["sections"]
-            
-            logger.info(f"Processing contract: {contract_url}")
-            
-            # Process each section
-            for section_name, section_text in sections.items():
-                # Skip empty sections
-                if not section_text.strip():
-                    logger.warning(f"Empty section '{section_name}' in contract {contract_url}")
-                    continue
-                
-                # Generate a unique ID for this section
-                article_id = contract_url.split("/")[-2] if contract_url.split("/")[-1] == "" else contract_url.split("/")[-1]
-                vector_id = f"{article_id}_{section_name.replace(' ', '_')}"
-                
-                # Add to collection
-                all_sections.append({
-                    "id": vector_id,
-                    "text": section_text,
-                    "metadata": {
-                        "contract_url": contract_url,
-                        "date": contract_date,
-                        "section": section_name,
-                        "text": section_text[:1000]  # Store a preview of the text
-                    }
-                })
-                
-                stats["total_sections"] += 1
-        
-        # Process all sections in batches
-        for i in range(0, len(all_sections), BATCH_SIZE):
-            batch = all_sections[i:i+BATCH_SIZE]
-            
+        def fill(normalized: str, embedding: List[float]) -> None:
+            for i in missing[normalized]:
+                embeddings[i] = embedding
+            cache.put(EMBEDDING_MODEL, queries[missing[normalized][0]], embedding)
+        
+        disk_cache = None
+        if QUERY_EMBEDDING_CACHE_DISK:
             try:
-                # Prepare vectors for upsert
-                vectors_to_upsert = []
-                
-                # Generate embeddings for each section in the batch
-                for section in batch:
-                    try:
-                        # Generate embedding using Gemini
-                        embedding = await generate_gemini_embedding(section["text"])
-                        
-                        # Add to upsert list
-                        vectors_to_upsert.append({
-                            "id": section["id"],
-                            "values": embedding,
-                            "metadata": section["metadata"]
-                        })
-                        
-                        stats["successful_embeddings"] += 1
-                        
-                    except Exception as e:
-                        logger.error(f"Error generating embedding for section {section['id']}: {str(e)}")
-                        stats["failed_embeddings"] += 1
-                
-                # Upsert vectors to Pinecone (using a single namespace)
-                if vectors_to_upsert:
-                    # Use a single namespace for all vectors
-                    # You can use an empty string or a specific namespace name
-                    index.upsert(
-                        vectors=vectors_to_upsert,
-                        namespace="contracts"  # Single namespace for all contracts
-                    )
-                    logger.info(f"Upserted {len(vectors_to_upsert)} vectors to namespace 'contracts'")
-                
-                stats["batches_processed"] += 1
-                
+                disk_cache = await run_blocking(get_embedding_cache)
+                stored = await run_blocking(disk_cache.get_many, EMBEDDING_MODEL, list(missing))
+                for normalized, embedding in zip(list(missing), stored):
+                    if embedding is not None:
+                        cache.record_disk_hit()
+                        fill(normalized, embedding)
+                        del missing[normalized]
             except Exception as e:
-                logger.error(f"Error processing batch {i//BATCH_SIZE + 1}: {str(e)}")
-                stats["failed_embeddings"] += len(batch)
+                logger.warning(f"Query embedding disk cache unavailable: {str(e)}")
+                disk_cache = None
         
-        logger.info(f"Completed embedding process. Stats: {json.dumps(stats)}")
-        return stats
+        pending = list(missing)
+        for start in range(0, len(pending), BATCH_SIZE):
+            chunk = pending[start:start + BATCH_SIZE]
+            fresh = await generate_gemini_embeddings_batch(
+                [queries[missing[normalized][0]] for normalized in chunk],
+                priority=INTERACTIVE
+            )
+            stored = [(normalized, embedding) for normalized, embedding in zip(chunk, fresh) if embedding is not None]
+            for normalized, embedding in stored:
+                fill(normalized, embedding)
+            if disk_cache and stored:
+                try:
+                    await run_blocking(
+                        disk_cache.put_many,
+                        EMBEDDING_MODEL,
+                        [normalized for normalized, _ in stored],
+                        [embedding for _, embedding in stored]
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not store query embeddings on disk: {str(e)}")
+        return embeddings
+
+async def generate_gemini_embeddings_batch(texts: List[str], priority: int = BACKGROUND) -> List[Optional[List[float]]]:
+    """
+    Generate embeddings for many texts with a single Gemini request
+    
+    Throttled or transiently failing requests are retried by the rate
+    limiter. If the batch still fails for another reason, each text is
+    retried on its own so one bad input only fails itself instead of the
+    whole batch.
     
+    Args:
+        texts: The texts to generate embeddings for (at most BATCH_SIZE)
+        priority: Rate-limiter lane, BACKGROUND (ingest) by default
+        
+    Returns:
+        List[Optional[List[float]]]: One embedding per text, in order, or None where embedding failed
+    """
+    contents = [truncate_for_embedding(text) for text in texts]
+    
+    try:
+        result = await get_rate_limiter().call(
+            lambda: genai_client.aio.models.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=contents
+            ),
+            priority=priority,
+            tokens=sum(estimate_tokens(text) for text in contents)
+        )
+        
+        embeddings = [embedding.values for embedding in result.embeddings]
+        if len(embeddings) != len(contents):
+            raise ValueError(f"Expected {len(contents)} embeddings, got {len(embeddings)}")
+        GEMINI_TOKENS.inc(sum(estimate_tokens(text) for text in contents), operation="embed", direction="prompt")
+            
+        return embeddings
+    
+    except Exception as e:
+        if is_retryable(e):
+            # Still throttled after every retry: splitting the batch would only add load
+            logger.error(f"Batch embedding of {len(contents)} texts failed after retries: {str(e)}")
+            return [None] * len(contents)
+        logger.warning(f"Batch embedding of {len(contents)} texts failed, retrying individually: {str(e)}")
+    
+    results = await asyncio.gather(
+        *(generate_gemini_embedding(text, priority=priority) for text in contents),
+        return_exceptions=True
+    )
+    
+    return [None if isinstance(result, Exception) else result for result in results]
+
+def contract_records(contract: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Split a scraped contract article into the records stored as vectors
+    
+    Articles scraped with award extraction yield one record per award, so
+    each vector covers a single award (well under the embedding size limit)
+    and carries typed metadata (company, amount, contract number, ...) that
+    filters and sources can use. Articles without award records fall back to
+    one record per section.
+    
+    Args:
+        contract: A contract dictionary with sections and optionally awards
+        
+    Returns:
+        List[Dict]: Records with a "key" unique within the article, the "text"
+            to embed and the "metadata" to store with it
+    """
+    records = []
+    awards = contract.get("awards")
+    
+    if awards:
+        # Number awards within their section: NAVY_1, NAVY_2, ...
+        counts: Dict[str, int] = {}
+        for award in awards:
+            section_name = award["section"]
+            counts[section_name] = counts.get(section_name, 0) + 1
+            metadata = {key: value for key, value in award.items() if key != "text" and value is not None}
+            records.append({
+                "key": f"{section_name.replace(' ', '_')}_{counts[section_name]}",
+                # The agency name gives the embedding context the paragraph itself lacks
+                "text": f"{section_name}: {award['text']}",
+                "metadata": metadata
+            })
+        return records
+    
+    for section_name, section_text in contract["sections"].items():
+        # Skip empty sections
+        if not section_text.strip():
+            logger.warning(f"Empty section '{section_name}' in contract {contract['url']}")
+            continue
+        records.append({
+            "key": section_name.replace(' ', '_'),
+            "text": section_text,
+            "metadata": {"section": section_name}
+        })
+    return records
+
+async def generate_embeddings(
+    contract_data: Iterable[Dict[str, Any]],
+    ingest_state: Optional[IngestStateStore] = None,
+    full: bool = False
+):
+    """
+    Process contract data, generate embeddings using Gemini, and upsert to Pinecone
+    All vectors will be stored in a single namespace
+    
+    Runs the embed and upsert stages of the streaming ingest pipeline, so
+    batches are upserted while later ones are still being embedded.
+    
+    Args:
+        contract_data: Contract dictionaries with date, sections, and URL; any
+            iterable, consumed as the pipeline has room
+        ingest_state: Optional state store; sections whose text is unchanged since they
+            were last stored, or that nearly copy a stored section, are skipped, and
+            vectors for removed sections are deleted
+        full: Re-embed and upsert every section even if it is unchanged
+    
+    Returns:
+        Dict: Statistics about the processing
+    """
+    # Imported here because the pipeline is built on this module
+    from app.services.ingest_pipeline import IngestPipeline
+    
+    try:
+        return await IngestPipeline(ingest_state=ingest_state, full=full).run_articles(contract_data)
     except Exception as e:
         logger.error(f"Error in generate_embeddings: {str(e)}")
         raise
 
-async def search_with_gemini(query: str, top_k: int = 5):
+def keyword_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Metadata kept in the keyword index: everything except the text preview,
+    which stays in the vector store to keep the keyword index small
+    """
+    return {key: value for key, value in metadata.items() if key != "text"}
+
+# Award fields passed through to sources when a match is a single award
+AWARD_SOURCE_FIELDS = ("company", "location", "amount", "contract_number", "completion_date", "contracting_activity")
+
+def match_source(match) -> Dict[str, Any]:
+    """
+    Build the source entry returned to the client for a retrieved match
+    
+    Args:
+        match: A vector or fused match with score and metadata
+        
+    Returns:
+        Dict: Score, article URL, date and section, plus the award fields when present
+    """
+    source = {
+        "score": match.score,
+        "contract_url": match.metadata.get("contract_url", ""),
+        "date": match.metadata.get("date", ""),
+        "section": match.metadata.get("section", "")
+    }
+    for field in AWARD_SOURCE_FIELDS:
+        if field in match.metadata:
+            source[field] = match.metadata[field]
+    return source
+
+async def query_vector_index(query_embedding: List[float], top_k: int, metadata_filter: Optional[Dict[str, Any]] = None):
+    """
+    Run a vector query against the shared index, reporting failures to the index manager
+    
+    Args:
+        query_embedding: The query vector
+        top_k: Number of matches to return
+        metadata_filter: Optional Pinecone-style metadata filter applied by the index
+        
+    Returns:
+        The index's query response
+    """
+    index = await index_manager.get_index()
+    
+    query_kwargs = {"filter": metadata_filter} if metadata_filter else {}
+    
+    # The Pinecone gRPC client is synchronous, so run it off the event loop
+    try:
+        with stage("vector_query"):
+            return await run_blocking(
+                index.query,
+                vector=query_embedding,
+                top_k=top_k,
+                namespace="contracts",  # Using the single namespace we defined
+                include_metadata=True,
+                **query_kwargs
+            )
+    except Exception as e:
+        index_manager.report_failure(e)
+        raise
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    norm = (sum(x * x for x in a) * sum(y * y for y in b)) ** 0.5
+    return sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+
+async def with_linked_copies(
+    matches: List[Any],
+    query_embedding: List[float],
+    metadata_filter: Optional[Dict[str, Any]],
+    top_k: int
+) -> List[Any]:
+    """
+    Add the near copies a filter selects to a filtered vector query's matches
+    
+    Copies linked instead of stored (NEAR_DUPLICATE_MODE=link) are not in the
+    index, so a filter on their date or agency never reaches them. The stored
+    vector each copies is scored against the query instead and returned under
+    the copy's ID with the copy's URL, date and section.
+    
+    Args:
+        matches: The vector query's matches, best first
+        query_embedding: The query vector
+        metadata_filter: The filter the query applied
+        top_k: Number of matches to return
+        
+    Returns:
+        List: The matches and copies, best first
+    """
+    if NEAR_DUPLICATE_MODE != "link" or not metadata_filter:
+        return matches
+    
+    try:
+        with stage("linked_copies"):
+            copies = await run_blocking(get_near_duplicate_index().linked_copies, metadata_filter, NEAR_DUPLICATE_SEARCH_CANDIDATES)
+            if not copies:
+                return matches
+            index = await index_manager.get_index()
+            canonical_ids = sorted({copy["canonical_id"] for copy in copies})
+            fetched = (await run_blocking(index.fetch, ids=canonical_ids, namespace="contracts")).vectors
+    except Exception as e:
+        logger.warning(f"Could not look up near copies for the filter: {str(e)}")
+        return matches
+    
+    found = {match.id for match in matches}
+    for copy in copies:
+        vector = fetched.get(copy["canonical_id"])
+        if vector is None or copy["vector_id"] in found:
+            continue
+        metadata = {**(vector.metadata or {}), **{name: copy[name] for name in COPY_FIELDS if copy[name] is not None}}
+        # The rest of the filter (e.g. amounts) applies to the award the copy shares with its stored vector
+        if matches_filter(metadata, metadata_filter):
+            matches.append(SimpleNamespace(id=copy["vector_id"], score=_cosine(query_embedding, vector.values), metadata=metadata))
+    
+    return sorted(matches, key=lambda match: match.score, reverse=True)[:top_k]
+
+async def retrieve_matches(
+    query: str,
+    top_k: int,
+    metadata_filter: Optional[Dict[str, Any]] = None,
+    query_embedding: Optional[List[float]] = None
+) -> List[Any]:
+    """
+    Retrieve the sections most relevant to a query
+    
+    Dense retrieval over Gemini embeddings is fused with BM25 keyword search
+    using reciprocal-rank fusion, so exact tokens such as contract numbers or
+    small company names are found even when the embedding misses them.
+    
+    Args:
+        query: The natural language search query
+        top_k: Number of matches to return
+        metadata_filter: Optional metadata filter applied by both retrievers
+        query_embedding: The query's embedding, if the caller already has it
+        
+    Returns:
+        List: Matches with id, score and metadata, best first; fused matches also
+            carry vector_score, their vector similarity (None for keyword-only hits)
+    """
+    if not HYBRID_SEARCH_ENABLED:
+        if query_embedding is None:
+            query_embedding = await embed_query(query)
+        search_response = await query_vector_index(query_embedding, top_k, metadata_filter)
+        return await with_linked_copies(list(search_response.matches), query_embedding, metadata_filter, top_k)
+    
+    candidates = max(top_k, HYBRID_CANDIDATES)
+    keyword_index = await run_blocking(get_keyword_index)
+    
+    # Embed + vector search and keyword search run concurrently
+    async def vector_search():
+        embedding = query_embedding if query_embedding is not None else await embed_query(query)
+        search_response = await query_vector_index(embedding, candidates, metadata_filter)
+        return await with_linked_copies(list(search_response.matches), embedding, metadata_filter, candidates)
+    
+    async def keyword_search():
+        with stage("keyword_query"):
+            return await run_blocking(keyword_index.search, query, candidates, metadata_filter)
+    
+    vector_results, keyword_results = await asyncio.gather(vector_search(), keyword_search())
+    
+    vector_matches = {match.id: match for match in vector_results}
+    keyword_matches = {doc_id: metadata for doc_id, _, metadata in keyword_results}
+    
+    fused = reciprocal_rank_fusion(
+        [list(vector_matches), list(keyword_matches)],
+        k=RRF_K
+    )[:top_k]
+    
+    # Keyword-only hits need their text preview from the vector store
+    missing = [doc_id for doc_id, _ in fused if doc_id not in vector_matches]
+    fetched = {}
+    if missing:
+        index = await index_manager.get_index()
+        try:
+            with stage("fetch_keyword_matches"):
+                fetch_response = await run_blocking(index.fetch, ids=missing, namespace="contracts")
+            fetched = {doc_id: vector.metadata for doc_id, vector in fetch_response.vectors.items()}
+        except Exception as e:
+            logger.warning(f"Could not fetch keyword-only matches: {str(e)}")
+    
+    matches = []
+    for doc_id, score in fused:
+        if doc_id in vector_matches:
+            metadata = vector_matches[doc_id].metadata
+        else:
+            metadata = fetched.get(doc_id) or keyword_matches[doc_id]
+        # The vector similarity is kept for the answer cache, which can't compare fused ranks
+        vector_score = vector_matches[doc_id].score if doc_id in vector_matches else None
+        matches.append(SimpleNamespace(id=doc_id, score=score, metadata=metadata, vector_score=vector_score))
+    
+    return matches
+
+# Sampling and safety settings for streamed answers
+STREAM_GENERATION_CONFIG = types.GenerateContentConfig(
+    temperature=0.2,
+    top_p=0.8,
+    top_k=40,
+    max_output_tokens=1024,
+    safety_settings=[
+        types.SafetySetting(category=category, threshold="BLOCK_MEDIUM_AND_ABOVE")
+        for category in (
+            "HARM_CATEGORY_HARASSMENT",
+            "HARM_CATEGORY_HATE_SPEECH",
+            "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+            "HARM_CATEGORY_DANGEROUS_CONTENT",
+        )
+    ]
+)
+
+async def retrieve_for_query(
+    query: str,
+    top_k: int,
+    filters: Optional[QueryFilters] = None,
+    query_embedding: Optional[List[float]] = None
+) -> Tuple[List[Any], QueryFilters]:
+    """
+    Retrieve matches for a query, narrowed by the constraints it states
+    
+    Dates, agencies and dollar thresholds found in the query (and any
+    explicit filters, which take precedence) are pushed down to the index as
+    metadata filters, which is much cheaper than widening top_k and leaving
+    the model to sort out irrelevant sections. If filters read from the
+    query alone match nothing, retrieval is retried without them, since the
+    extraction can misread a query.
+    
+    Args:
+        query: The natural language search query
+        top_k: Number of matches to return
+        filters: Explicit filters from the request, if any
+        query_embedding: The query's embedding, if the caller already has it
+        
+    Returns:
+        Tuple[List, QueryFilters]: The matches and the filters that were applied
+    """
+    explicit = filters or QueryFilters()
+    extracted = extract_query_filters(query) if QUERY_FILTERS_ENABLED else QueryFilters()
+    applied = extracted.merge(explicit)
+    
+    if applied.is_empty():
+        return await retrieve_matches(query, top_k, query_embedding=query_embedding), applied
+    
+    logger.info(f"Applying query filters: {json.dumps(applied.describe())}")
+    matches = await retrieve_matches(query, top_k, applied.to_metadata_filter(), query_embedding)
+    
+    if not matches and explicit.is_empty():
+        logger.info("No matches for filters read from the query, retrying unfiltered")
+        return await retrieve_matches(query, top_k, query_embedding=query_embedding), QueryFilters()
+    
+    return matches, applied
+
+def context_candidates(top_k: int) -> int:
+    """
+    Number of matches to retrieve for a search: a wider set when passages are
+    chosen within a token budget, otherwise just top_k
+    """
+    return max(top_k, CONTEXT_CANDIDATES) if CONTEXT_BUILDER_ENABLED else top_k
+
+def select_context(query: str, matches: List[Any], top_k: int) -> Context:
+    """
+    Choose the passages of the retrieved matches to put in the prompt
+    
+    With CONTEXT_BUILDER_ENABLED, near-duplicates are dropped and up to top_k
+    passages are picked for relevance and diversity until CONTEXT_TOKEN_BUDGET
+    is spent; otherwise the stored text of the top_k best matches is used.
+    
+    Args:
+        query: The natural language search query
+        matches: Retrieved matches, best first
+        top_k: Most passages (and so sources) to use
+        
+    Returns:
+        Context: The passages and the matches they came from
+    """
+    if CONTEXT_BUILDER_ENABLED:
+        return build_context(query, matches, max_passages=top_k)
+    return passthrough_context(matches[:top_k])
+
+async def search_sources(
+    query: str,
+    top_k: int = 5,
+    filters: Optional[QueryFilters] = None,
+    query_embedding: Optional[List[float]] = None
+) -> Dict[str, Any]:
+    """
+    Find the sources a search would answer from, without generating an answer
+    
+    Args:
+        query: The natural language search query
+        top_k: As for search_with_gemini
+        filters: Explicit date/agency/amount filters; merged with those read from the query
+        query_embedding: The query's embedding, if the caller already has it
+        
+    Returns:
+        Dict: The sources and the filters applied
+    """
+    with trace("search_sources"):
+        with stage("retrieve"):
+            matches, applied_filters = await retrieve_for_query(query, context_candidates(top_k), filters, query_embedding)
+        with stage("context"):
+            context = select_context(query, matches, top_k)
+        return {
+            "sources": [match_source(match) for match in context.matches],
+            "filters": applied_filters.describe()
+        }
+
+async def search_with_gemini(
+    query: str,
+    top_k: int = 5,
+    filters: Optional[QueryFilters] = None,
+    query_embedding: Optional[List[float]] = None,
+    generation_slots: Optional[asyncio.Semaphore] = None
+):
     """
     Search for contracts using a natural language query and generate a response using Gemini
     
     Args:
         query: The natural language search query
-        top_k: Number of results to retrieve from Pinecone
+        top_k: Most sources to answer from (at least CONTEXT_CANDIDATES matches are
+            retrieved to choose them from when the context builder is enabled)
+        filters: Explicit date/agency/amount filters; merged with those read from the query
+        query_embedding: The query's embedding, if the caller already has it
+        generation_slots: Optional semaphore held only while the answer is generated,
+            to bound how many answers a batch of searches generates at once
         
     Returns:
-        Dict: Response containing the answer and sources
+        Dict: Response containing the answer, sources, the filters applied and whether
+            the answer came from the answer cache
     """
+    # One log line and one set of stage timings per search
+    with trace("search"):
+        return await _search_with_gemini(query, top_k, filters, query_embedding, generation_slots)
+
+async def _search_with_gemini(
+    query: str,
+    top_k: int,
+    filters: Optional[QueryFilters],
+    query_embedding: Optional[List[float]],
+    generation_slots: Optional[asyncio.Semaphore]
+):
     try:
-        # Initialize Pinecone
-        index = initialize_pinecone()
-        
-        # Generate embedding for the query using Gemini
-        query_embedding = await generate_gemini_embedding(query)
-        
-        # Search in Pinecone
-        search_response = index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            namespace="contracts",  # Using the single namespace we defined
-            include_metadata=True
-        )
+        # The answer cache compares query embeddings, so embed up front and reuse it for retrieval
+        if query_embedding is None and ANSWER_CACHE_ENABLED:
+            query_embedding = await embed_query(query)
         
-        # Extract relevant context from search results
-        contexts = []
-        sources = []
+        # Retrieve the most relevant sections (vector + keyword), narrowed by the query's constraints
+        with stage("retrieve"):
+            matches, applied_filters = await retrieve_for_query(query, context_candidates(top_k), filters, query_embedding)
         
-        for match in search_response.matches:
-            # Add the text as context
-            context_text = match.metadata.get("text", "")
-            if context_text:
-                contexts.append(context_text)
-            
-            # Add source information
-            sources.append({
-                "score": match.score,
-                "contract_url": match.metadata.get("contract_url", ""),
-                "date": match.metadata.get("date", ""),
-                "section": match.metadata.get("section", "")
-            })
+        # Choose the passages for the prompt; the sources are the matches they came from
+        with stage("context"):
+            context = select_context(query, matches, top_k)
+        sources = [match_source(match) for match in context.matches]
         
-        # If no contexts found, return early
-        if not contexts:
+        # If no passages were found, return early
+        if not context.texts:
             return {
                 "answer": "I couldn't find any relevant information about your query in the contracts database.",
-                "sources": []
+                "sources": [],
+                "filters": applied_filters.describe()
             }
         
-        # Combine contexts into a single string
-        combined_context = "\n\n".join(contexts)
+        # A near-identical question with the same retrieved matches was already answered
+        if ANSWER_CACHE_ENABLED:
+            cached = get_answer_cache().lookup(query, query_embedding, context.matches, applied_filters.describe())
+            if cached:
+                logger.info(f"Answer cache hit for query (cached query: {cached.query!r})")
+                return {
+                    "answer": cached.answer,
+                    "sources": sources,
+                    "filters": applied_filters.describe(),
+                    "cached": True
+                }
+        
+        # Combine the passages into a single string
+        prompt_started = time.perf_counter()
+        combined_context = context.combined()
+        log_context_usage(context, CONTEXT_TOKEN_BUDGET if CONTEXT_BUILDER_ENABLED else None)
         
         # Prepare prompt for Gemini
         prompt = f"""
@@ -281,6 +832,7 @@ async def search_with_gemini(query: str, top_k: int = 5):
 
         If the information doesn't contain an answer to the query, say so clearly.
         """
+        record_stage("prompt", time.perf_counter() - prompt_started)
         
         # Generate response using Gemini
         generation_config = {
@@ -309,72 +861,93 @@ async def search_with_gemini(query: str, top_k: int = 5):
             }
         ]
         
-        response = genai_client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt
-        )
+        async with generation_slots or nullcontext():
+            with stage("generate"):
+                response = await get_rate_limiter().call(
+                    lambda: genai_client.aio.models.generate_content(
+                        model="gemini-2.0-flash",
+                        contents=prompt
+                    ),
+                    priority=INTERACTIVE,
+                    tokens=estimate_tokens(prompt)
+                )
+        record_generation_usage("search", getattr(response, "usage_metadata", None), prompt, response.text or "")
+        
+        if ANSWER_CACHE_ENABLED and response.text:
+            get_answer_cache().store(query, query_embedding, context.matches, applied_filters.describe(), response.text, sources)
         
         # Return the answer and sources
         return {
             "answer": response.text,
-            "sources": sources
+            "sources": sources,
+            "filters": applied_filters.describe(),
+            "cached": False
         }
     
     except Exception as e:
         logger.error(f"Error in search_with_gemini: {str(e)}")
         raise
 
-async def search_with_gemini_stream(query: str, top_k: int = 5) -> AsyncGenerator[str, None]:
+async def search_with_gemini_stream(query: str, top_k: int = 5, filters: Optional[QueryFilters] = None) -> AsyncGenerator[Dict[str, Any], None]:
     """
-    Search for contracts using a natural language query and generate a streaming response using Gemini
+    Search for contracts using a natural language query and stream the response from Gemini
+    
+    Sources are yielded as soon as retrieval finishes, before generation
+    starts, so clients can show them while the answer streams in.
     
     Args:
         query: The natural language search query
-        top_k: Number of results to retrieve from Pinecone
+        top_k: Most sources to answer from (at least CONTEXT_CANDIDATES matches are
+            retrieved to choose them from when the context builder is enabled)
+        filters: Explicit date/agency/amount filters; merged with those read from the query
         
     Returns:
-        AsyncGenerator: Streaming response from Gemini
+        AsyncGenerator: Events in order: {"event": "sources", "sources", "filters"}, then
+            {"event": "token", "text"} per chunk, then {"event": "done"}, or
+            {"event": "error", "message"} if the search fails
     """
+    with trace("stream") as active:
+        async with aclosing(_search_with_gemini_stream(query, top_k, filters)) as events:
+            async for event in events:
+                if event["event"] == "error":
+                    active.mark_failed()
+                yield event
+
+async def _search_with_gemini_stream(query: str, top_k: int, filters: Optional[QueryFilters]) -> AsyncGenerator[Dict[str, Any], None]:
     try:
-        # Initialize Pinecone
-        index = initialize_pinecone()
-        
-        # Generate embedding for the query using Gemini
-        query_embedding = await generate_gemini_embedding(query)
-        
-        # Search in Pinecone
-        search_response = index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            namespace="contracts",  # Using the single namespace we defined
-            include_metadata=True
-        )
+        # The answer cache compares query embeddings, so embed up front and reuse it for retrieval
+        query_embedding = await embed_query(query) if ANSWER_CACHE_ENABLED else None
         
-        # Extract relevant context from search results
-        contexts = []
-        sources = []
+        # Retrieve the most relevant sections (vector + keyword), narrowed by the query's constraints
+        with stage("retrieve"):
+            matches, applied_filters = await retrieve_for_query(query, context_candidates(top_k), filters, query_embedding)
         
-        for match in search_response.matches:
-            # Add the text as context
-            context_text = match.metadata.get("text", "")
-            if context_text:
-                contexts.append(context_text)
-            
-            # Add source information
-            sources.append({
-                "score": match.score,
-                "contract_url": match.metadata.get("contract_url", ""),
-                "date": match.metadata.get("date", ""),
-                "section": match.metadata.get("section", "")
-            })
+        # Choose the passages for the prompt; the sources are the matches they came from
+        with stage("context"):
+            context = select_context(query, matches, top_k)
+        sources = [match_source(match) for match in context.matches]
+        
+        yield {"event": "sources", "sources": sources, "filters": applied_filters.describe()}
         
-        # If no contexts found, yield a message and return
-        if not contexts:
-            yield "I couldn't find any relevant information about your query in the contracts database."
+        # If no passages were found, yield a message and return
+        if not context.texts:
+            yield {"event": "token", "text": "I couldn't find any relevant information about your query in the contracts database."}
+            yield {"event": "done"}
             return
         
-        # Combine contexts into a single string
-        combined_context = "\n\n".join(contexts)
+        # A near-identical question with the same retrieved matches was already answered
+        if ANSWER_CACHE_ENABLED:
+            cached = get_answer_cache().lookup(query, query_embedding, context.matches, applied_filters.describe())
+            if cached:
+                logger.info(f"Answer cache hit for query (cached query: {cached.query!r})")
+                yield {"event": "token", "text": cached.answer}
+                yield {"event": "done"}
+                return
+        
+        # Combine the passages into a single string
+        prompt_started = time.perf_counter()
+        combined_context = context.combined()
+        log_context_usage(context, CONTEXT_TOKEN_BUDGET if CONTEXT_BUILDER_ENABLED else None)
         
         # Prepare prompt for Gemini
         prompt = f"""
@@ -405,48 +978,47 @@ async def search_with_gemini_stream(query: str, top_k: int = 5) -> AsyncGenerato
 
         If the information doesn't contain an answer to the query, say so clearly.
         """
+        record_stage("prompt", time.perf_counter() - prompt_started)
         
-        # Generate streaming response using Gemini
-        generation_config = {
-            "temperature": 0.2,
-            "top_p": 0.8,
-            "top_k": 40,
-            "max_output_tokens": 1024,
-        }
-        
-        safety_settings = [
-            {
-                "category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_HATE_SPEECH",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            }
-        ]
+        with stage("generate"):
+            # Use the streaming version of generate_content; chunks arrive without blocking the loop
+            # The rate limiter admits (and retries) opening the stream, not each chunk
+            generate_started = time.perf_counter()
+            response_stream = await get_rate_limiter().call(
+                lambda: genai_client.aio.models.generate_content_stream(
+                    model="gemini-2.0-flash",
+                    contents=prompt,
+                    config=STREAM_GENERATION_CONFIG
+                ),
+                priority=INTERACTIVE,
+                tokens=estimate_tokens(prompt)
+            )
+            
+            # Stream the response chunks; usage is reported on the last one
+            answer_parts = []
+            usage = None
+            try:
+                async for chunk in response_stream:
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    if chunk.text:
+                        if not answer_parts:
+                            record_stage("first_token", time.perf_counter() - generate_started)
+                        answer_parts.append(chunk.text)
+                        yield {"event": "token", "text": chunk.text}
+            finally:
+                # On client disconnect the consumer is cancelled or closed; stop the upstream stream too
+                aclose = getattr(response_stream, "aclose", None)
+                if aclose:
+                    await aclose()
+        record_generation_usage("stream", usage, prompt, "".join(answer_parts))
         
-        # Use the streaming version of generate_content
-        response_stream = genai_client.models.generate_content_stream(
-            model="gemini-2.0-flash",
-            contents=prompt,
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
+        # Only complete answers are cached
+        if ANSWER_CACHE_ENABLED and answer_parts:
+            get_answer_cache().store(query, query_embedding, context.matches, applied_filters.describe(), "".join(answer_parts), sources)
         
-        # Stream the response chunks
-        for chunk in response_stream:
-            if chunk.text:
-                yield chunk.text
+        yield {"event": "done"}
     
     except Exception as e:
         error_msg = f"Error in search_with_gemini_stream: {str(e)}"
         logger.error(error_msg)
-        yield f"Error: {error_msg}"
+        yield {"event": "error", "message": error_msg}
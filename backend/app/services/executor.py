@@ -0,0 +1,92 @@
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.config import BLOCKING_EXECUTOR_WORKERS, JOB_EXECUTOR_WORKERS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_job_executor: Optional[ThreadPoolExecutor] = None
+
+# Set inside background job tasks (and inherited by the tasks they start)
+_in_job: contextvars.ContextVar[bool] = contextvars.ContextVar("in_job", default=False)
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Return the shared executor for blocking client calls, creating it on first use
+    
+    Returns:
+        ThreadPoolExecutor: Executor with BLOCKING_EXECUTOR_WORKERS threads
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=BLOCKING_EXECUTOR_WORKERS,
+            thread_name_prefix="blocking-io"
+        )
+        logger.info(f"Started blocking I/O executor with {BLOCKING_EXECUTOR_WORKERS} workers")
+    return _executor
+
+def get_job_executor() -> ThreadPoolExecutor:
+    """
+    Return the executor for blocking calls made by background jobs, creating it on first use
+    
+    Returns:
+        ThreadPoolExecutor: Executor with JOB_EXECUTOR_WORKERS threads
+    """
+    global _job_executor
+    if _job_executor is None:
+        _job_executor = ThreadPoolExecutor(
+            max_workers=JOB_EXECUTOR_WORKERS,
+            thread_name_prefix="job-io"
+        )
+        logger.info(f"Started background job executor with {JOB_EXECUTOR_WORKERS} workers")
+    return _job_executor
+
+def use_job_executor() -> None:
+    """
+    Send the current task's blocking calls, and those of tasks it starts, to the job executor
+    
+    Keeps a long ingest from occupying the threads that searches need.
+    """
+    _in_job.set(True)
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a synchronous call (Pinecone, requests, SQLite) without blocking the event loop
+    
+    The shared executor bounds how many of these calls run at once, so a burst
+    of slow calls queues up instead of spawning unlimited threads. Calls made
+    from background jobs use a separate executor.
+    
+    Args:
+        func: The blocking function to call
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+        
+    Returns:
+        The return value of func
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_job_executor() if _in_job.get() else get_executor()
+    # Run in a copy of the caller's context so logs from the thread keep its trace ID
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+
+def shutdown_executor() -> None:
+    """
+    Stop the shared and job executors, waiting for running calls to finish
+    """
+    global _executor, _job_executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    if _job_executor is not None:
+        _job_executor.shutdown(wait=True)
+        _job_executor = None
@@ -0,0 +1,267 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import (
+    FETCH_MAX_WORKERS,
+    FETCH_MAX_RETRIES,
+    FETCH_BACKOFF_SECONDS,
+    FETCH_MIN_HOST_INTERVAL,
+    FETCH_TIMEOUT_SECONDS,
+)
+from app.services.html_archive import ARTICLE, LISTING, HtmlArchive
+from app.services.metrics import FETCH_FAILURES, FETCH_RETRIES
+from app.services.scraper import ContractScraper, DEFAULT_HEADERS
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying; anything else is treated as a permanent failure
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def conditional_headers(validators: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """
+    Build conditional-request headers from previously recorded validators
+
+    Args:
+        validators: Dict with optional "etag" and "last_modified" values
+
+    Returns:
+        Optional[Dict[str, str]]: If-None-Match/If-Modified-Since headers, or None
+    """
+    if not validators:
+        return None
+
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers or None
+
+class HostRateLimiter:
+    """
+    Enforces a minimum interval between requests to the same host across threads
+    """
+
+    def __init__(self, min_interval: float):
+        """
+        Initialize the rate limiter
+
+        Args:
+            min_interval: Minimum number of seconds between two requests to one host
+        """
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def wait(self, url: str) -> None:
+        """
+        Block until a request to the URL's host is allowed
+
+        Args:
+            url: The URL about to be requested
+        """
+        if self.min_interval <= 0:
+            return
+
+        host = urlparse(url).netloc
+
+        # Reserve the next slot under the lock, then sleep outside of it
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+class ContractFetcher:
+    """
+    Fetches defense.gov pages concurrently over a shared keep-alive session
+    """
+
+    replay = False
+
+    def __init__(
+        self,
+        max_workers: int = FETCH_MAX_WORKERS,
+        max_retries: int = FETCH_MAX_RETRIES,
+        backoff_seconds: float = FETCH_BACKOFF_SECONDS,
+        min_host_interval: float = FETCH_MIN_HOST_INTERVAL,
+        timeout: float = FETCH_TIMEOUT_SECONDS,
+        archive: Optional[HtmlArchive] = None,
+    ):
+        """
+        Initialize the fetcher
+
+        Args:
+            max_workers: Maximum number of pages fetched at the same time
+            max_retries: Number of retries after a failed attempt
+            backoff_seconds: Initial retry delay, doubled after each retry
+            min_host_interval: Minimum number of seconds between requests to one host
+            timeout: Per-request timeout in seconds
+            archive: Archive every successfully fetched page here, for later replay
+        """
+        self.max_workers = max(1, max_workers)
+        self.archive = archive
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.rate_limiter = HostRateLimiter(min_host_interval)
+
+        # One session for every request so connections are reused; the pool
+        # must be at least as large as the number of worker threads
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch_response(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[requests.Response]:
+        """
+        Fetch a page, retrying transient failures with exponential backoff
+
+        Args:
+            url: The URL to fetch
+            headers: Extra request headers, e.g. conditional-request validators
+
+        Returns:
+            Optional[requests.Response]: A 200 or 304 response, or None if the page could not be fetched
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(url)
+
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code in (200, 304):
+                    return response
+
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    logger.error(f"Failed to retrieve {url}. Status code: {response.status_code}")
+                    FETCH_FAILURES.inc()
+                    return None
+
+                logger.warning(f"Retryable status {response.status_code} for {url} (attempt {attempt + 1})")
+
+            except requests.RequestException as e:
+                logger.warning(f"Error fetching {url} (attempt {attempt + 1}): {str(e)}")
+
+            if attempt < self.max_retries:
+                # Exponential backoff with jitter so workers don't retry in lockstep
+                delay = self.backoff_seconds * (2 ** attempt)
+                FETCH_RETRIES.inc()
+                time.sleep(delay + random.uniform(0, delay))
+
+        logger.error(f"Giving up on {url} after {self.max_retries + 1} attempts")
+        FETCH_FAILURES.inc()
+        return None
+
+    def fetch(self, url: str, kind: str = LISTING) -> Optional[str]:
+        """
+        Fetch a page unconditionally
+
+        Args:
+            url: The URL to fetch
+            kind: What the page is ("listing" or "article"), recorded in the archive
+
+        Returns:
+            Optional[str]: The page HTML, or None if the page could not be fetched
+        """
+        response = self.fetch_response(url)
+        if response is None or response.status_code != 200:
+            return None
+        self._archive_page(url, response, kind)
+        return response.text
+
+    def _archive_page(self, url: str, response: requests.Response, kind: str) -> None:
+        if self.archive is None:
+            return
+        try:
+            self.archive.put(
+                url,
+                response.text,
+                kind=kind,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+        except Exception as e:
+            # Archiving is best effort; the ingest doesn't depend on it
+            logger.warning(f"Could not archive {url}: {str(e)}")
+
+    def scrape(self, url: str, validators: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        Fetch and parse a single contract article
+
+        Args:
+            url: The URL of the contract article
+            validators: etag/last_modified recorded for the article; when given the
+                request is conditional and an unchanged article is not downloaded
+
+        Returns:
+            Dict: The article URL with its date, sections, awards and validators, a
+                not_modified marker, or an error entry
+        """
+        response = self.fetch_response(url, headers=conditional_headers(validators))
+        if response is None:
+            return {"url": url, "error": "Failed to fetch page"}
+
+        if response.status_code == 304:
+            return {"url": url, "not_modified": True}
+
+        # Archived before parsing, so pages the parser fails on can be replayed after a fix
+        self._archive_page(url, response, ARTICLE)
+
+        try:
+            # A scraper per call keeps parsing thread-safe
+            contract_info = ContractScraper(url).parse(response.text)
+        except Exception as e:
+            logger.error(f"Error parsing contract {url}: {str(e)}")
+            return {"url": url, "error": str(e)}
+
+        return {
+            "url": url,
+            "date": contract_info["date"],
+            "sections": contract_info["sections"],
+            "awards": contract_info["awards"],
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
+        }
+
+    def scrape_many(self, urls: List[str], validators: Optional[Dict[str, Dict[str, str]]] = None) -> List[Dict]:
+        """
+        Fetch and parse contract articles concurrently
+
+        Args:
+            urls: The URLs of the contract articles
+            validators: Optional URL-to-validators mapping for conditional requests
+
+        Returns:
+            List[Dict]: One result per URL, in the same order as the input
+        """
+        if not urls:
+            return []
+
+        validators = validators or {}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            return list(executor.map(lambda url: self.scrape(url, validators.get(url)), urls))
+
+    def close(self) -> None:
+        """
+        Close the underlying session and its pooled connections
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
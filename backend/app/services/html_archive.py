@@ -0,0 +1,385 @@
+import argparse
+import gzip
+import hashlib
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from app.config import HTML_ARCHIVE_ENABLED, HTML_ARCHIVE_PARSE_WORKERS, HTML_ARCHIVE_PATH
+from app.services.scraper import ContractScraper
+
+logger = logging.getLogger(__name__)
+
+LISTING = "listing"
+ARTICLE = "article"
+
+class HtmlArchive:
+    """
+    Content-addressed archive of every fetched defense.gov page
+
+    Each distinct page body is stored once, gzip-compressed, under the
+    SHA-256 of its content (objects/ab/abcdef....html.gz). A SQLite index
+    records every fetch: the URL, when it was fetched, what kind of page it
+    is and its HTTP validators, so pages can be re-parsed later without
+    downloading them again.
+    """
+
+    def __init__(self, root: str = HTML_ARCHIVE_PATH):
+        """
+        Open (or create) the archive
+
+        Args:
+            root: Directory holding the index database and the objects
+        """
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+
+        # Backfill workers in other processes write to the same index; wait for their locks
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS fetches (
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                kind TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                PRIMARY KEY (url, fetched_at)
+            );
+            CREATE INDEX IF NOT EXISTS idx_fetches_kind ON fetches(kind, fetched_at);
+            CREATE TABLE IF NOT EXISTS objects (
+                content_hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                compressed_size INTEGER NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def object_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, "objects", content_hash[:2], f"{content_hash}.html.gz")
+
+    def put(
+        self,
+        url: str,
+        html: str,
+        kind: str = ARTICLE,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        fetched_at: Optional[float] = None,
+    ) -> str:
+        """
+        Record a fetched page, storing its content if it isn't archived yet
+
+        Args:
+            url: The page URL
+            html: The page HTML
+            kind: "listing" or "article"
+            etag: ETag header returned with the page, if any
+            last_modified: Last-Modified header returned with the page, if any
+            fetched_at: Fetch time (defaults to now)
+
+        Returns:
+            str: The content hash
+        """
+        data = html.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self.object_path(content_hash)
+
+        compressed_size = None
+        if not os.path.exists(path):
+            # mtime=0 keeps the compressed bytes a pure function of the content
+            compressed = gzip.compress(data, compresslevel=6, mtime=0)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name and renamed, so readers never see a partial object
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+            compressed_size = len(compressed)
+
+        with self._lock:
+            if compressed_size is not None:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO objects (content_hash, size, compressed_size) VALUES (?, ?, ?)",
+                    (content_hash, len(data), compressed_size)
+                )
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO fetches (url, fetched_at, kind, content_hash, etag, last_modified)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (url, fetched_at or time.time(), kind, content_hash, etag, last_modified)
+            )
+            self._conn.commit()
+
+        return content_hash
+
+    def read(self, content_hash: str) -> str:
+        """
+        Return archived page content
+
+        Args:
+            content_hash: The content hash returned by put
+
+        Returns:
+            str: The page HTML
+        """
+        return read_object(self.object_path(content_hash))
+
+    def latest(self, url: str, as_of: Optional[float] = None) -> Optional[Dict]:
+        """
+        Return the most recent fetch of a URL
+
+        Args:
+            url: The page URL
+            as_of: Only consider fetches at or before this time
+
+        Returns:
+            Optional[Dict]: url, fetched_at, kind, content_hash, etag and last_modified,
+                or None if the URL was never archived
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT url, fetched_at, kind, content_hash, etag, last_modified FROM fetches
+                WHERE url = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1
+                """,
+                (url, as_of if as_of is not None else float("inf"))
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("url", "fetched_at", "kind", "content_hash", "etag", "last_modified"), row))
+
+    def urls(self, kind: str = ARTICLE, since: Optional[float] = None, until: Optional[float] = None) -> List[str]:
+        """
+        List archived URLs of one kind, in the order they were first fetched
+
+        Args:
+            kind: "listing" or "article"
+            since: Only URLs fetched at or after this time
+            until: Only URLs fetched at or before this time
+
+        Returns:
+            List[str]: Distinct URLs
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT url FROM fetches WHERE kind = ? AND fetched_at >= ? AND fetched_at <= ?
+                GROUP BY url ORDER BY MIN(fetched_at)
+                """,
+                (kind, since if since is not None else 0.0, until if until is not None else float("inf"))
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Describe the archive contents
+
+        Returns:
+            Dict: Fetch counts per kind, distinct URLs and objects, and raw and compressed sizes
+        """
+        with self._lock:
+            fetches = dict(self._conn.execute("SELECT kind, COUNT(*) FROM fetches GROUP BY kind").fetchall())
+            urls = self._conn.execute("SELECT COUNT(DISTINCT url) FROM fetches").fetchone()[0]
+            objects, size, compressed = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(compressed_size), 0) FROM objects"
+            ).fetchone()
+            oldest, newest = self._conn.execute("SELECT MIN(fetched_at), MAX(fetched_at) FROM fetches").fetchone()
+
+        return {
+            "path": self.root,
+            "fetches": fetches,
+            "urls": urls,
+            "objects": objects,
+            "size_bytes": size,
+            "compressed_bytes": compressed,
+            "oldest_fetch": oldest,
+            "newest_fetch": newest,
+        }
+
+    def close(self) -> None:
+        """
+        Close the index database connection
+        """
+        with self._lock:
+            self._conn.close()
+
+def read_object(path: str) -> str:
+    with open(path, "rb") as f:
+        return gzip.decompress(f.read()).decode("utf-8")
+
+def _parse_object(url: str, path: str) -> Dict:
+    # Runs in a worker process: read, decompress and parse one archived article
+    return ContractScraper(url).parse(read_object(path))
+
+class ArchiveFetcher:
+    """
+    Serves pages from the archive instead of the network, for replaying ingests
+
+    It has the interface of ContractFetcher that the ingest pipeline uses, so
+    a replay goes through the same parsing, embedding and storing steps as a
+    live ingest. Articles are always returned (validators are ignored) and
+    are not skipped on their article hash: a replay exists to re-parse pages
+    whose extraction logic changed, so each record is compared with what was
+    stored and only records whose text or metadata changed are embedded
+    again. Parsing is CPU-bound, so it runs in a pool of processes.
+    """
+
+    replay = True
+
+    def __init__(self, archive: HtmlArchive, parse_workers: int = HTML_ARCHIVE_PARSE_WORKERS, as_of: Optional[float] = None):
+        """
+        Initialize the fetcher
+
+        Args:
+            archive: The archive to read from
+            parse_workers: Processes parsing articles; 1 parses in the calling thread
+            as_of: Replay the pages as they were at this time (defaults to the latest fetch)
+        """
+        self.archive = archive
+        self.as_of = as_of
+        self.parse_workers = max(1, parse_workers)
+        # Keep every parsing process busy while other articles are read from disk
+        self.max_workers = self.parse_workers * 2
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.parse_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) if self.parse_workers > 1 else None
+
+    def fetch(self, url: str) -> Optional[str]:
+        """
+        Return the archived copy of a page
+
+        Args:
+            url: The page URL
+
+        Returns:
+            Optional[str]: The page HTML, or None if it was never archived
+        """
+        record = self.archive.latest(url, self.as_of)
+        if record is None:
+            logger.warning(f"{url} is not in the archive")
+            return None
+        return self.archive.read(record["content_hash"])
+
+    def scrape(self, url: str, validators: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        Parse the archived copy of a contract article
+
+        Args:
+            url: The URL of the contract article
+            validators: Ignored; archived articles are always re-parsed
+
+        Returns:
+            Dict: The article URL with its date, sections, awards and validators, or an error entry
+        """
+        record = self.archive.latest(url, self.as_of)
+        if record is None:
+            return {"url": url, "error": "Not in the archive"}
+
+        path = self.archive.object_path(record["content_hash"])
+        try:
+            if self._pool:
+                contract_info = self._pool.submit(_parse_object, url, path).result()
+            else:
+                contract_info = _parse_object(url, path)
+        except Exception as e:
+            logger.error(f"Error parsing archived contract {url}: {str(e)}")
+            return {"url": url, "error": str(e)}
+
+        return {
+            "url": url,
+            "date": contract_info["date"],
+            "sections": contract_info["sections"],
+            "awards": contract_info["awards"],
+            "etag": record["etag"],
+            "last_modified": record["last_modified"]
+        }
+
+    def close(self) -> None:
+        """
+        Stop the parsing processes
+        """
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+_archive: Optional[HtmlArchive] = None
+
+def get_html_archive() -> HtmlArchive:
+    """
+    Return the process-wide archive, opening it on first use
+
+    Returns:
+        HtmlArchive: The shared archive instance
+    """
+    global _archive
+    if _archive is None:
+        _archive = HtmlArchive()
+    return _archive
+
+def default_archive() -> Optional[HtmlArchive]:
+    """
+    Return the archive fetched pages should be stored in, if archiving is enabled
+
+    Returns:
+        Optional[HtmlArchive]: The shared archive, or None if it is disabled or can't be opened
+    """
+    if not HTML_ARCHIVE_ENABLED:
+        return None
+    try:
+        return get_html_archive()
+    except Exception as e:
+        logger.warning(f"HTML archive unavailable, fetched pages won't be archived: {str(e)}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the raw HTML archive")
+    parser.add_argument("--path", default=HTML_ARCHIVE_PATH, help="Archive directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="Show archived fetches, pages and sizes")
+
+    show_parser = subparsers.add_parser("show", help="Print the latest archived copy of a URL")
+    show_parser.add_argument("url")
+
+    args = parser.parse_args()
+    archive = HtmlArchive(args.path)
+
+    try:
+        if args.command == "stats":
+            stats = archive.stats()
+            print(f"Path: {stats['path']}")
+            print(f"Fetches: {sum(stats['fetches'].values())} ({', '.join(f'{count} {kind}' for kind, count in stats['fetches'].items())})")
+            print(f"URLs: {stats['urls']}, distinct pages: {stats['objects']}")
+            print(f"Size: {stats['size_bytes'] / 1024 / 1024:.1f} MB, compressed {stats['compressed_bytes'] / 1024 / 1024:.1f} MB")
+            if stats["oldest_fetch"]:
+                print(f"Oldest fetch: {time.ctime(stats['oldest_fetch'])}")
+                print(f"Newest fetch: {time.ctime(stats['newest_fetch'])}")
+        elif args.command == "show":
+            record = archive.latest(args.url)
+            if record is None:
+                parser.error(f"{args.url} is not in the archive")
+            print(archive.read(record["content_hash"]))
+    finally:
+        archive.close()
+
+if __name__ == "__main__":
+    main()
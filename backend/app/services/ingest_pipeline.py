@@ -0,0 +1,672 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from app.config import (
+    EMBEDDING_CACHE_ENABLED,
+    INGEST_ARTICLE_QUEUE_SIZE,
+    INGEST_BATCH_QUEUE_SIZE,
+    INGEST_MAX_PENDING_ARTICLES,
+    INGEST_UPSERT_WORKERS,
+    NEAR_DUPLICATE_MODE,
+    VECTOR_TEXT_MAX_CHARS,
+)
+from app.services import embeddings
+from app.services.answer_cache import get_answer_cache
+from app.services.bm25 import get_keyword_index
+from app.services.embedding_cache import get_embedding_cache
+from app.services.executor import run_blocking
+from app.services.fetcher import ContractFetcher
+from app.services.ingest_state import IngestStateStore, article_content_hash, record_content_hash
+from app.services.metrics import INGEST_ARTICLES, INGEST_SECTIONS
+from app.services.near_duplicates import COPY_FIELDS, NearDuplicateIndex, fingerprint
+from app.services.query_filters import date_number
+from app.services.scraper import article_id_from_url
+from app.services.tracing import stage, trace
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "contracts"
+
+@dataclass
+class _PendingArticle:
+    """
+    An article whose sections are still moving through the embed and upsert stages
+    """
+    url: str
+    content_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    vectors: Dict[str, str]     # Every vector ID the article should have, mapped to its text hash
+    remaining: int              # Sections not yet stored or failed
+    failed: bool = False
+    checked: List[str] = field(default_factory=list)    # Vector IDs checked for near-duplicates
+    links: Dict[str, Tuple[str, float]] = field(default_factory=dict)  # Near copies: vector ID -> (stored vector ID, similarity)
+    link_metadata: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # Near copies' own URL, date and section
+    legacy_ids: List[str] = field(default_factory=list)  # One-per-section vector IDs stored before the article had ingest state
+
+@dataclass
+class _Batch:
+    """
+    Sections embedded with one Gemini request and stored with one upsert
+    """
+    sections: List[Dict[str, Any]] = field(default_factory=list)
+    embeddings: List[Optional[List[float]]] = field(default_factory=list)
+
+class IngestPipeline:
+    """
+    Streaming scrape -> embed -> upsert ingest with bounded queues
+
+    Each stage runs as its own set of workers connected by bounded asyncio
+    queues. An article's sections are batched for embedding as soon as the
+    article is parsed, and a batch is upserted while the next ones are being
+    embedded. A full queue blocks the stage feeding it, and at most
+    pending_articles articles are held between parsing and storing, so
+    memory stays bounded however many articles are ingested, and the run
+    takes about as long as its slowest stage rather than the sum of all of
+    them.
+
+    Articles are finalized (stale vectors deleted, ingest state recorded) as
+    soon as their last section is stored. Articles with a failed section are
+    left unrecorded so the next run retries them.
+
+    With an ingest state, new and changed sections are first checked against
+    a MinHash index of the sections already stored; near copies are neither
+    embedded nor stored (see NEAR_DUPLICATE_MODE). Sections are indexed once
+    their vectors are upserted, so copies within a single run are only caught
+    if the earlier one was stored first.
+    """
+
+    def __init__(
+        self,
+        ingest_state: Optional[IngestStateStore] = None,
+        full: bool = False,
+        embed_workers: int = embeddings.EMBEDDING_CONCURRENCY,
+        upsert_workers: int = INGEST_UPSERT_WORKERS,
+        article_queue_size: int = INGEST_ARTICLE_QUEUE_SIZE,
+        batch_queue_size: int = INGEST_BATCH_QUEUE_SIZE,
+        batch_size: int = embeddings.BATCH_SIZE,
+        pending_articles: int = INGEST_MAX_PENDING_ARTICLES,
+        keyword_index: Optional[Any] = None,
+        on_article_done: Optional[Callable[[str], Awaitable[None]]] = None,
+        near_duplicate_mode: str = NEAR_DUPLICATE_MODE,
+    ):
+        """
+        Args:
+            ingest_state: Optional state store; unchanged articles and sections are
+                skipped, and vectors for removed sections are deleted
+            full: Re-fetch, re-embed and re-upsert everything even if unchanged
+            embed_workers: Embedding batches in flight at once
+            upsert_workers: Upserts in flight at once
+            article_queue_size: Parsed articles buffered ahead of the embed stage
+            batch_queue_size: Batches buffered ahead of each of the embed and upsert stages
+            batch_size: Sections per embedding request and upsert
+            pending_articles: Articles parsed but not yet fully stored at once
+            keyword_index: Keyword index to update instead of the shared BM25 index
+                (anything with add_many, remove and save)
+            on_article_done: Awaited with the URL of every article that is fully
+                stored or skipped as unchanged, e.g. to checkpoint progress
+            near_duplicate_mode: "link" to skip near copies of stored sections and
+                record which vector each copies, "skip" to only skip them, "off"
+                to embed every section; needs an ingest state
+        """
+        self.ingest_state = ingest_state
+        self.full = full
+        self.embed_workers = max(1, embed_workers)
+        self.upsert_workers = max(1, upsert_workers)
+        self.article_queue_size = max(1, article_queue_size)
+        self.batch_queue_size = max(1, batch_queue_size)
+        self.batch_size = batch_size
+        self.pending_articles = max(1, pending_articles)
+        self.on_article_done = on_article_done
+        self.near_duplicate_mode = near_duplicate_mode
+
+        self.stats: Dict[str, Any] = {
+            "total_links": 0,
+            "unchanged_articles": 0,
+            "fetch_errors": 0,
+            "total_contracts": 0,
+            "successful_embeddings": 0,
+            "failed_embeddings": 0,
+            "total_sections": 0,
+            "embedded_sections": 0,
+            "batches_processed": 0,
+            "embedding_cache_hits": 0,
+            "embedding_cache_misses": 0,
+            "unchanged_sections": 0,
+            "deleted_vectors": 0,
+            "award_records": 0,
+            "dedup_checked_sections": 0,
+            "near_duplicate_sections": 0,
+            "dedup_ratio": 0.0,
+            "failed_articles": 0,
+            "max_pending_articles": 0,
+            "stage_seconds": {"fetch": 0.0, "embed": 0.0, "upsert": 0.0},
+            "elapsed_seconds": 0.0,
+        }
+
+        self._pending: Dict[str, _PendingArticle] = {}
+        self._released = asyncio.Condition()    # Notified whenever a pending article is finalized
+        self._index = None
+        self._keyword_index = keyword_index
+        self._cache = None
+        self._near_duplicates: Optional[NearDuplicateIndex] = None
+        self._stored_ids: Set[str] = set()    # Sections stored by a full run
+
+    def progress(self) -> Dict[str, int]:
+        """
+        Summarize how far the run has got, for job status reports
+
+        Returns:
+            Dict[str, int]: Articles fetched, sections embedded and vectors upserted so far
+        """
+        return {
+            "articles_fetched": self.stats["total_contracts"] + self.stats["unchanged_articles"],
+            "articles_unchanged": self.stats["unchanged_articles"],
+            "fetch_errors": self.stats["fetch_errors"],
+            "sections_embedded": self.stats["embedded_sections"],
+            "vectors_upserted": self.stats["successful_embeddings"],
+            "vectors_deleted": self.stats["deleted_vectors"],
+            "sections_deduplicated": self.stats["near_duplicate_sections"],
+        }
+
+    async def run_urls(
+        self,
+        urls: Union[Iterable[str], AsyncIterable[str]],
+        fetcher: Optional[ContractFetcher] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch, parse, embed and store contract articles
+
+        Args:
+            urls: Article URLs; an async iterable (e.g. paged listings) is consumed lazily
+            fetcher: Fetcher to use; one is created (and closed) if not given.
+                Its max_workers sets how many articles are fetched at once
+
+        Returns:
+            Dict[str, Any]: Statistics about the run
+        """
+        owns_fetcher = fetcher is None
+        fetcher = fetcher or ContractFetcher()
+        try:
+            return await self._run(lambda articles: self._fetch_stage(urls, fetcher, articles))
+        finally:
+            if owns_fetcher:
+                fetcher.close()
+
+    async def run_articles(self, contract_data: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Embed and store already scraped contract articles
+
+        Args:
+            contract_data: Contract dictionaries with url, date, sections and awards
+
+        Returns:
+            Dict[str, Any]: Statistics about the run
+        """
+        async def produce(articles: asyncio.Queue):
+            for contract in contract_data:
+                await articles.put(contract)
+            await articles.put(None)
+
+        return await self._run(produce)
+
+    async def _run(self, produce) -> Dict[str, Any]:
+        started = time.monotonic()
+        # The stage tasks inherit the trace, so each run logs one line of per-stage totals
+        with trace("ingest"):
+            await self._open()
+
+            articles: asyncio.Queue = asyncio.Queue(self.article_queue_size)
+            batches: asyncio.Queue = asyncio.Queue(self.batch_queue_size)
+            embedded: asyncio.Queue = asyncio.Queue(self.batch_queue_size)
+
+            # A stage's failure cancels the others instead of leaving them blocked on a queue
+            async with asyncio.TaskGroup() as group:
+                group.create_task(produce(articles))
+                group.create_task(self._batch_stage(articles, batches))
+                embedders = [group.create_task(self._embed_worker(batches, embedded)) for _ in range(self.embed_workers)]
+                for _ in range(self.upsert_workers):
+                    group.create_task(self._upsert_worker(embedded))
+                group.create_task(self._close_after(embedders, embedded, self.upsert_workers))
+
+            with stage("close"):
+                await self._close()
+        self.stats["elapsed_seconds"] = time.monotonic() - started
+        logger.info(f"Completed ingest pipeline. Stats: {json.dumps(self.stats)}")
+        return self.stats
+
+    async def _open(self) -> None:
+        self._index = await embeddings.index_manager.get_index()
+
+        # Sections are also indexed for keyword (BM25) retrieval
+        if embeddings.HYBRID_SEARCH_ENABLED and self._keyword_index is None:
+            try:
+                self._keyword_index = await run_blocking(get_keyword_index)
+            except Exception as e:
+                logger.warning(f"Keyword index unavailable, storing vectors only: {str(e)}")
+
+        # Embeddings from earlier runs are reused instead of calling Gemini again
+        if EMBEDDING_CACHE_ENABLED:
+            try:
+                self._cache = await run_blocking(get_embedding_cache)
+            except Exception as e:
+                logger.warning(f"Embedding cache unavailable, embedding everything: {str(e)}")
+
+        # Near copies of stored sections are found with a MinHash index kept in the ingest state database
+        if self.near_duplicate_mode in ("link", "skip") and self.ingest_state:
+            try:
+                self._near_duplicates = await run_blocking(NearDuplicateIndex, self.ingest_state.path)
+            except Exception as e:
+                logger.warning(f"Near-duplicate index unavailable, embedding every section: {str(e)}")
+
+    async def _close(self) -> None:
+        # Answers generated from the old vectors may no longer match what retrieval returns
+        if self.stats["successful_embeddings"] or self.stats["deleted_vectors"]:
+            get_answer_cache().invalidate()
+
+        # Backends that buffer writes (the local index) persist them now
+        flush = getattr(self._index, "flush", None)
+        if flush:
+            await run_blocking(flush)
+        if self._keyword_index:
+            await run_blocking(self._keyword_index.save)
+        if self._near_duplicates:
+            await run_blocking(self._near_duplicates.close)
+
+    async def _close_after(self, workers: List[asyncio.Task], queue: asyncio.Queue, consumers: int) -> None:
+        # Once every worker feeding the queue is done, tell each consumer to stop
+        await asyncio.gather(*workers)
+        for _ in range(consumers):
+            await queue.put(None)
+
+    async def _fetch_stage(
+        self,
+        urls: Union[Iterable[str], AsyncIterable[str]],
+        fetcher: ContractFetcher,
+        articles: asyncio.Queue
+    ) -> None:
+        queue: asyncio.Queue = asyncio.Queue(fetcher.max_workers)
+
+        async def feed():
+            if hasattr(urls, "__aiter__"):
+                async for url in urls:
+                    await queue.put(url)
+            else:
+                for url in urls:
+                    await queue.put(url)
+            for _ in range(fetcher.max_workers):
+                await queue.put(None)
+
+        async def worker():
+            while (url := await queue.get()) is not None:
+                with stage("fetch") as span:
+                    contract = await self._fetch_article(url, fetcher)
+                self.stats["stage_seconds"]["fetch"] += span.seconds
+                if contract is not None:
+                    await articles.put(contract)
+
+        await asyncio.gather(feed(), *(worker() for _ in range(fetcher.max_workers)))
+        await articles.put(None)
+
+    async def _fetch_article(self, url: str, fetcher: ContractFetcher) -> Optional[Dict[str, Any]]:
+        self.stats["total_links"] += 1
+        state = self.ingest_state if not self.full else None
+
+        try:
+            # Previously ingested articles are only downloaded again if they changed
+            validators = (await run_blocking(state.get_validators, [url])).get(url) if state else None
+            contract = await run_blocking(fetcher.scrape, url, validators)
+        except Exception as e:
+            contract = {"url": url, "error": str(e)}
+
+        if "error" in contract:
+            logger.error(f"Error processing contract {url}: {contract['error']}")
+            self.stats["fetch_errors"] += 1
+            INGEST_ARTICLES.inc(result="fetch_error")
+            return None
+
+        if contract.get("not_modified"):
+            logger.info(f"Contract not modified since last ingest: {url}")
+            self.stats["unchanged_articles"] += 1
+            INGEST_ARTICLES.inc(result="unchanged")
+            await self._article_done(url)
+            return None
+
+        # Servers without validators still get skipped if the parsed content is identical. A replay
+        # re-parses archived pages to pick up extraction changes, so it compares every record instead
+        contract["content_hash"] = article_content_hash(contract["date"], contract["sections"], contract.get("awards"))
+        if state and not fetcher.replay:
+            stored_hash = await run_blocking(state.get_article_hash, article_id_from_url(url))
+            if stored_hash == contract["content_hash"]:
+                logger.info(f"Contract content unchanged since last ingest: {url}")
+                self.stats["unchanged_articles"] += 1
+                INGEST_ARTICLES.inc(result="unchanged")
+                await self._article_done(url)
+                return None
+
+        logger.info(f"Successfully processed contract: {url}")
+        return contract
+
+    async def _batch_stage(self, articles: asyncio.Queue, batches: asyncio.Queue) -> None:
+        pending: List[Dict[str, Any]] = []
+
+        while True:
+            # Wait for stored articles to make room; the partial batch goes first since it may hold their sections
+            if len(self._pending) >= self.pending_articles:
+                if pending:
+                    await batches.put(_Batch(pending))
+                    pending = []
+                async with self._released:
+                    await self._released.wait_for(lambda: len(self._pending) < self.pending_articles)
+
+            if (contract := await articles.get()) is None:
+                break
+            pending.extend(await self._article_sections(contract))
+
+            while len(pending) >= self.batch_size:
+                await batches.put(_Batch(pending[:self.batch_size]))
+                pending = pending[self.batch_size:]
+
+            # Don't hold a partial batch back while no batch is queued for the embedders
+            if pending and articles.empty() and batches.empty():
+                await batches.put(_Batch(pending))
+                pending = []
+
+        if pending:
+            await batches.put(_Batch(pending))
+        for _ in range(self.embed_workers):
+            await batches.put(None)
+
+    async def _article_sections(self, contract: Dict[str, Any]) -> List[Dict[str, Any]]:
+        contract_url = contract["url"]
+        contract_date = contract["date"]
+        # Numeric copy of the date so range filters work (Pinecone only compares numbers)
+        contract_date_number = date_number(contract_date)
+        article_id = article_id_from_url(contract_url)
+
+        if article_id in self._pending:
+            logger.warning(f"Article {article_id} is already being ingested, skipping duplicate {contract_url}")
+            return []
+
+        logger.info(f"Processing contract: {contract_url}")
+        self.stats["total_contracts"] += 1
+        INGEST_ARTICLES.inc(result="processed")
+
+        stored_hashes = await run_blocking(self.ingest_state.get_vector_hashes, article_id) if self.ingest_state else {}
+        # Before awards were split out, each section was stored as {article_id}_{SECTION}; an
+        # article the ingest state has never recorded may still have those vectors
+        legacy_ids = []
+        if self.ingest_state and not stored_hashes and await run_blocking(self.ingest_state.get_article_hash, article_id) is None:
+            legacy_ids = [f"{article_id}_{name.replace(' ', '_')}" for name in contract["sections"]]
+        vectors: Dict[str, str] = {}
+        sections = []
+
+        # One vector per award where the article was split into awards, else one per section
+        for record in embeddings.contract_records(contract):
+            vector_id = f"{article_id}_{record['key']}"
+            record_hash = record_content_hash(record["text"], record["metadata"])
+            vectors[vector_id] = record_hash
+
+            self.stats["total_sections"] += 1
+            if "company" in record["metadata"] or "amount" in record["metadata"]:
+                self.stats["award_records"] += 1
+
+            # The stored vector was embedded from identical text with identical metadata, nothing to do
+            if not self.full and stored_hashes.get(vector_id) == record_hash:
+                self.stats["unchanged_sections"] += 1
+                INGEST_SECTIONS.inc(result="unchanged")
+                continue
+
+            sections.append({
+                "id": vector_id,
+                "article_id": article_id,
+                "text": record["text"],
+                "metadata": {
+                    "contract_url": contract_url,
+                    "date": contract_date,
+                    **({"date_number": contract_date_number} if contract_date_number else {}),
+                    **record["metadata"],
+                    # Passages for the prompt context are taken from this text
+                    "text": record["text"][:VECTOR_TEXT_MAX_CHARS]
+                }
+            })
+
+        # Sections that nearly copy one already stored are neither embedded nor stored
+        checked = [section["id"] for section in sections]
+        links = await self._find_near_duplicates(sections) if self._near_duplicates and sections else {}
+        link_metadata = {}
+        if links:
+            logger.info(f"Skipping {len(links)} near-duplicate sections of {contract_url}")
+            # Kept with the links so searches filtered on a copy's date or agency can still return it
+            link_metadata = {
+                section["id"]: {name: section["metadata"].get(name) for name in COPY_FIELDS}
+                for section in sections if section["id"] in links
+            }
+            sections = [section for section in sections if section["id"] not in links]
+
+        # Only what finalizing needs is kept; the parsed article itself is released
+        self._pending[article_id] = _PendingArticle(
+            url=contract_url,
+            content_hash=contract.get("content_hash") or article_content_hash(contract_date, contract["sections"], contract.get("awards")),
+            etag=contract.get("etag"),
+            last_modified=contract.get("last_modified"),
+            vectors=vectors,
+            remaining=len(sections),
+            checked=checked if self._near_duplicates else [],
+            links=links,
+            link_metadata=link_metadata,
+            legacy_ids=legacy_ids,
+        )
+        self.stats["max_pending_articles"] = max(self.stats["max_pending_articles"], len(self._pending))
+
+        if not sections:
+            await self._finalize(article_id)
+        return sections
+
+    async def _find_near_duplicates(self, sections: List[Dict[str, Any]]) -> Dict[str, Tuple[str, float]]:
+        try:
+            fingerprints = await run_blocking(lambda: [fingerprint(section["text"]) for section in sections])
+            for section, section_fingerprint in zip(sections, fingerprints):
+                section["fingerprint"] = section_fingerprint
+            links = await run_blocking(
+                self._near_duplicates.find,
+                sections[0]["article_id"],
+                {section["id"]: section["fingerprint"] for section in sections if section["fingerprint"]}
+            )
+        except Exception as e:
+            logger.warning(f"Near-duplicate check failed, embedding the sections: {str(e)}")
+            return {}
+        # A full refresh may be rebuilding an emptied index; only sections stored by this run are known to exist
+        if self.full:
+            links = {vector_id: link for vector_id, link in links.items() if link[0] in self._stored_ids}
+
+        self.stats["dedup_checked_sections"] += len(sections)
+        self.stats["near_duplicate_sections"] += len(links)
+        self.stats["dedup_ratio"] = self.stats["near_duplicate_sections"] / self.stats["dedup_checked_sections"]
+        INGEST_SECTIONS.inc(len(links), result="near_duplicate")
+        return links
+
+    async def _embed_worker(self, batches: asyncio.Queue, embedded: asyncio.Queue) -> None:
+        while (batch := await batches.get()) is not None:
+            with stage("embed") as span:
+                batch.embeddings = await self._embed(batch)
+            embedded_count = sum(1 for vector in batch.embeddings if vector is not None)
+            self.stats["embedded_sections"] += embedded_count
+            self.stats["stage_seconds"]["embed"] += span.seconds
+            INGEST_SECTIONS.inc(embedded_count, result="embedded")
+            await embedded.put(batch)
+
+    async def _embed(self, batch: _Batch) -> List[Optional[List[float]]]:
+        texts = [section["text"] for section in batch.sections]
+        try:
+            vectors = await run_blocking(self._cache.get_many, embeddings.EMBEDDING_MODEL, texts) if self._cache else [None] * len(texts)
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+            self.stats["embedding_cache_hits"] += len(texts) - len(missing)
+            self.stats["embedding_cache_misses"] += len(missing)
+            INGEST_SECTIONS.inc(len(texts) - len(missing), result="embedding_cache_hit")
+
+            if missing:
+                # Generate embeddings for the rest of the batch in one request
+                fresh = await embeddings.generate_gemini_embeddings_batch([texts[i] for i in missing])
+                for i, vector in zip(missing, fresh):
+                    vectors[i] = vector
+
+                if self._cache:
+                    stored = [(texts[i], vector) for i, vector in zip(missing, fresh) if vector is not None]
+                    await run_blocking(
+                        self._cache.put_many,
+                        embeddings.EMBEDDING_MODEL,
+                        [text for text, _ in stored],
+                        [vector for _, vector in stored]
+                    )
+            return vectors
+
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(texts)} sections: {str(e)}")
+            return [None] * len(texts)
+
+    async def _upsert_worker(self, embedded: asyncio.Queue) -> None:
+        while (batch := await embedded.get()) is not None:
+            with stage("upsert") as span:
+                await self._upsert(batch)
+            self.stats["stage_seconds"]["upsert"] += span.seconds
+
+    async def _upsert(self, batch: _Batch) -> None:
+        vectors_to_upsert = []
+        failed_ids = set()
+
+        for section, embedding in zip(batch.sections, batch.embeddings):
+            if embedding is None:
+                logger.error(f"Error generating embedding for section {section['id']}")
+                failed_ids.add(section["id"])
+                continue
+            vectors_to_upsert.append({"id": section["id"], "values": embedding, "metadata": section["metadata"]})
+
+        if vectors_to_upsert:
+            try:
+                await run_blocking(self._index.upsert, vectors=vectors_to_upsert, namespace=NAMESPACE)
+                logger.info(f"Upserted {len(vectors_to_upsert)} vectors to namespace '{NAMESPACE}'")
+
+                if self._keyword_index:
+                    await run_blocking(self._keyword_index.add_many, [
+                        (section["id"], section["text"], embeddings.keyword_metadata(section["metadata"]))
+                        for section in batch.sections if section["id"] not in failed_ids
+                    ])
+                # Later sections are checked against these ones
+                if self._near_duplicates:
+                    indexed = [
+                        (section["id"], section["article_id"], section["fingerprint"])
+                        for section in batch.sections if section["id"] not in failed_ids and section.get("fingerprint")
+                    ]
+                    await run_blocking(self._near_duplicates.add, indexed)
+                    if self.full:
+                        self._stored_ids.update(vector_id for vector_id, _, _ in indexed)
+                self.stats["batches_processed"] += 1
+            except Exception as e:
+                logger.error(f"Error upserting batch of {len(vectors_to_upsert)} vectors: {str(e)}")
+                failed_ids.update(vector["id"] for vector in vectors_to_upsert)
+
+        # Only count embeddings as successful once they are stored
+        self.stats["successful_embeddings"] += len(batch.sections) - len(failed_ids)
+        self.stats["failed_embeddings"] += len(failed_ids)
+        INGEST_SECTIONS.inc(len(batch.sections) - len(failed_ids), result="stored")
+        INGEST_SECTIONS.inc(len(failed_ids), result="failed")
+
+        for section in batch.sections:
+            article = self._pending[section["article_id"]]
+            article.failed |= section["id"] in failed_ids
+            article.remaining -= 1
+            if article.remaining == 0:
+                await self._finalize(section["article_id"])
+
+    async def _finalize(self, article_id: str) -> None:
+        article = self._pending.pop(article_id)
+        async with self._released:
+            self._released.notify_all()
+
+        # Leave failed articles unrecorded so the next run retries them
+        if article.failed:
+            self.stats["failed_articles"] += 1
+            INGEST_ARTICLES.inc(result="failed")
+            return
+
+        if not self.ingest_state:
+            await self._article_done(article.url)
+            return
+
+        try:
+            # Remove vectors for sections the article no longer has
+            stored_hashes = await run_blocking(self.ingest_state.get_vector_hashes, article_id)
+            stale_ids = [vector_id for vector_id in stored_hashes if vector_id not in article.vectors]
+            # Vectors stored before for sections that are now near copies of another
+            stale_ids += [vector_id for vector_id in article.links if vector_id in stored_hashes]
+            # Vectors from before the ingest state existed, which it has no record of
+            legacy_ids = [vector_id for vector_id in article.legacy_ids if vector_id not in article.vectors and vector_id not in stale_ids]
+            if legacy_ids:
+                await run_blocking(self._index.delete, ids=legacy_ids, namespace=NAMESPACE)
+                if self._keyword_index:
+                    await run_blocking(self._keyword_index.remove, legacy_ids)
+                logger.info(f"Deleted {len(legacy_ids)} legacy section vector IDs for article {article_id}")
+            if stale_ids:
+                await run_blocking(self._index.delete, ids=stale_ids, namespace=NAMESPACE)
+                if self._keyword_index:
+                    await run_blocking(self._keyword_index.remove, stale_ids)
+                self.stats["deleted_vectors"] += len(stale_ids)
+                INGEST_SECTIONS.inc(len(stale_ids), result="deleted")
+                logger.info(f"Deleted {len(stale_ids)} stale vectors for article {article_id}")
+
+            if self._near_duplicates:
+                await self._update_near_duplicates(article_id, article, stored_hashes, stale_ids)
+
+            await run_blocking(
+                self.ingest_state.record_article,
+                article_id,
+                article.url,
+                article.content_hash,
+                article.vectors,
+                etag=article.etag,
+                last_modified=article.last_modified
+            )
+        except Exception as e:
+            logger.error(f"Error recording ingest state for article {article_id}: {str(e)}")
+            return
+
+        await self._article_done(article.url)
+
+    async def _update_near_duplicates(
+        self,
+        article_id: str,
+        article: _PendingArticle,
+        stored_hashes: Dict[str, str],
+        stale_ids: List[str]
+    ) -> None:
+        await run_blocking(self._near_duplicates.remove, stale_ids)
+
+        # Copies of vectors that were deleted or re-embedded from changed text are embedded in their own right
+        changed = [
+            vector_id for vector_id in article.checked
+            if vector_id in stored_hashes and stored_hashes[vector_id] != article.vectors.get(vector_id)
+        ]
+        released = await run_blocking(self._near_duplicates.release, stale_ids + changed)
+        if released:
+            # Copies always belong to other articles, which are processed again on their next ingest
+            reopened = await run_blocking(self.ingest_state.forget_vectors, [vector_id for vector_id, _ in released])
+            logger.info(f"Released {len(released)} near copies of changed or deleted vectors; {reopened} articles will be re-ingested")
+
+        if self.near_duplicate_mode == "link":
+            await run_blocking(
+                self._near_duplicates.set_links, article_id, article.checked + stale_ids, article.links, article.link_metadata
+            )
+
+    async def _article_done(self, url: str) -> None:
+        if self.on_article_done is None:
+            return
+        try:
+            await self.on_article_done(url)
+        except Exception as e:
+            logger.error(f"Error checkpointing article {url}: {str(e)}")
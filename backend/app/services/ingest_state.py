@@ -0,0 +1,254 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import INGEST_STATE_PATH
+from app.services.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Recorded with every article and part of its hash: bump it when parsing or
+# splitting into records changes, so the next ingest fetches and processes
+# every article again
+EXTRACTOR_VERSION = 2
+
+def record_content_hash(text: str, metadata: Dict[str, Any]) -> str:
+    """
+    Hash a record's text and metadata so corrected metadata is stored again
+
+    Args:
+        text: The record text
+        metadata: The metadata stored with the record's vector
+
+    Returns:
+        str: Hex SHA-256 over the normalized text and the sorted metadata
+    """
+    payload = json.dumps({"text": normalize_text(text), "metadata": metadata}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def article_content_hash(date: str, sections: Dict[str, str], awards: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Hash everything extracted from an article
+
+    Args:
+        date: The contract date
+        sections: Section names mapped to their text
+        awards: The awards parsed from the sections, if any
+
+    Returns:
+        str: Hex SHA-256 over the extractor version, the date, every section and every award
+    """
+    payload = json.dumps(
+        {
+            "extractor": EXTRACTOR_VERSION,
+            "date": date,
+            "sections": {name: normalize_text(text) for name, text in sections.items()},
+            "awards": awards or [],
+        },
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class IngestStateStore:
+    """
+    Records what has already been ingested so later runs only process changes
+
+    For each article it keeps the HTTP validators (ETag/Last-Modified), a
+    hash of the parsed content and the EXTRACTOR_VERSION it was parsed with,
+    and for each stored vector the hash of the record it was embedded from.
+    """
+
+    def __init__(self, path: str = INGEST_STATE_PATH):
+        """
+        Open (or create) the state database
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Backfill workers in other processes write to the same database; wait for their locks
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS articles (
+                article_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                ingested_at REAL NOT NULL,
+                extractor_version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS vectors (
+                vector_id TEXT PRIMARY KEY,
+                article_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_vectors_article ON vectors(article_id);
+            """
+        )
+        # Articles recorded before the extractor version was kept count as version 0
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(articles)")}
+        if "extractor_version" not in columns:
+            self._conn.execute("ALTER TABLE articles ADD COLUMN extractor_version INTEGER NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+    def get_validators(self, urls: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """
+        Look up the HTTP validators recorded for articles
+
+        Articles parsed with another EXTRACTOR_VERSION get none, so they are
+        downloaded and processed again even if the page did not change.
+
+        Args:
+            urls: Article URLs
+
+        Returns:
+            Dict[str, Dict[str, str]]: URL mapped to its etag/last_modified, for articles that have any
+        """
+        validators = {}
+
+        with self._lock:
+            for url in urls:
+                row = self._conn.execute(
+                    "SELECT etag, last_modified FROM articles WHERE url = ? AND extractor_version = ?",
+                    (url, EXTRACTOR_VERSION)
+                ).fetchone()
+                if row and (row[0] or row[1]):
+                    validators[url] = {"etag": row[0], "last_modified": row[1]}
+
+        return validators
+
+    def get_article_hash(self, article_id: str) -> Optional[str]:
+        """
+        Return the content hash recorded when the article was last ingested
+
+        Args:
+            article_id: The defense.gov article ID
+
+        Returns:
+            Optional[str]: The content hash, or None if the article was never ingested
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM articles WHERE article_id = ?", (article_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_vector_hashes(self, article_id: str) -> Dict[str, str]:
+        """
+        Return the vectors stored for an article and the section hash each was embedded from
+
+        Args:
+            article_id: The defense.gov article ID
+
+        Returns:
+            Dict[str, str]: Vector ID mapped to section content hash
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT vector_id, content_hash FROM vectors WHERE article_id = ?", (article_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def record_article(
+        self,
+        article_id: str,
+        url: str,
+        content_hash: str,
+        vector_hashes: Dict[str, str],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """
+        Record a fully ingested article, replacing its previous vector set
+
+        Args:
+            article_id: The defense.gov article ID
+            url: The article URL
+            content_hash: Hash of the parsed article content
+            vector_hashes: Every vector ID now stored for the article mapped to its section hash
+            etag: ETag header returned with the article, if any
+            last_modified: Last-Modified header returned with the article, if any
+        """
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO articles (article_id, url, etag, last_modified, content_hash, ingested_at, extractor_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (article_id, url, etag, last_modified, content_hash, time.time(), EXTRACTOR_VERSION)
+            )
+            self._conn.execute("DELETE FROM vectors WHERE article_id = ?", (article_id,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (vector_id, article_id, content_hash) VALUES (?, ?, ?)",
+                [(vector_id, article_id, section_hash) for vector_id, section_hash in vector_hashes.items()]
+            )
+            self._conn.commit()
+
+    def forget_vectors(self, vector_ids: Iterable[str]) -> int:
+        """
+        Drop vectors from the state so their articles are processed again on the next ingest
+
+        Used for sections that were skipped as near copies of a vector that has
+        since been deleted or changed: the next run embeds them in their own right.
+
+        Args:
+            vector_ids: Vector IDs to forget
+
+        Returns:
+            int: Articles that will be processed again
+        """
+        vector_ids = list(vector_ids)
+        if not vector_ids:
+            return 0
+        with self._lock:
+            article_ids = set()
+            for start in range(0, len(vector_ids), 900):
+                chunk = vector_ids[start:start + 900]
+                placeholders = ",".join("?" * len(chunk))
+                article_ids.update(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT article_id FROM vectors WHERE vector_id IN ({placeholders})", chunk
+                ))
+                self._conn.execute(f"DELETE FROM vectors WHERE vector_id IN ({placeholders})", chunk)
+            # Clearing the validators and content hash makes the next ingest fetch and parse the article again
+            self._conn.executemany(
+                "UPDATE articles SET etag = NULL, last_modified = NULL, content_hash = '' WHERE article_id = ?",
+                [(article_id,) for article_id in article_ids]
+            )
+            self._conn.commit()
+        return len(article_ids)
+
+    def close(self) -> None:
+        """
+        Close the database connection
+        """
+        with self._lock:
+            self._conn.close()
+
+_store: Optional[IngestStateStore] = None
+
+def get_ingest_state() -> IngestStateStore:
+    """
+    Return the process-wide ingest state store, opening it on first use
+
+    Returns:
+        IngestStateStore: The shared store instance
+    """
+    global _store
+    if _store is None:
+        _store = IngestStateStore()
+    return _store
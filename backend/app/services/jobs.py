@@ -0,0 +1,607 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import (
+    INGEST_SCHEDULE_HOURS,
+    JOB_HISTORY_SIZE,
+    JOB_LOCK_TTL,
+    JOB_STORE_ENABLED,
+    JOB_STORE_PATH,
+)
+from app.services.executor import run_blocking, use_job_executor
+from app.services.tracing import bind_trace_id
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+SKIPPED = "skipped"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+@dataclass
+class Job:
+    """
+    One run of a registered job kind, and what it has done so far
+    """
+    kind: str
+    params: Dict[str, Any]
+    trigger: str = "manual"
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # Live progress reported by the running job function, read on each snapshot
+    progress_source: Optional[Callable[[], Dict[str, Any]]] = field(default=None, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the job's state as JSON-serializable data
+
+        Returns:
+            Dict[str, Any]: Status, timestamps, progress, result and error
+        """
+        if self.progress_source is not None:
+            try:
+                self.progress = dict(self.progress_source())
+            except Exception as e:
+                logger.warning(f"Could not read progress of job {self.id}: {str(e)}")
+
+        now = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "trigger": self.trigger,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": now - self.started_at if self.started_at else 0.0,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+class JobStore:
+    """
+    SQLite record of jobs, schedule runs and job locks shared by every API worker process
+
+    Job history survives restarts, only one process fires each scheduled run,
+    and a lease per job kind keeps two processes from running the same kind
+    of job at once. A lease that is not renewed expires after JOB_LOCK_TTL
+    seconds, so a crashed process doesn't hold it forever.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        """
+        Open (or create) the job database
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at);
+            CREATE TABLE IF NOT EXISTS schedules (
+                name TEXT PRIMARY KEY,
+                last_run_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS locks (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def save(self, snapshot: Dict[str, Any]) -> None:
+        """
+        Insert or update a job record
+
+        Args:
+            snapshot: The job's snapshot()
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, kind, status, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                (snapshot["id"], snapshot["kind"], snapshot["status"], snapshot["created_at"], json.dumps(snapshot))
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Return the most recently created jobs, newest first
+
+        Args:
+            limit: Maximum number of jobs
+
+        Returns:
+            List[Dict[str, Any]]: Job snapshots
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def prune(self, keep: int) -> None:
+        """
+        Delete finished jobs beyond the newest `keep`
+        """
+        with self._lock:
+            self._conn.execute(
+                f"""
+                DELETE FROM jobs WHERE status NOT IN ({", ".join("?" * len(ACTIVE_STATUSES))})
+                AND job_id NOT IN (SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?)
+                """,
+                (*ACTIVE_STATUSES, keep)
+            )
+            self._conn.commit()
+
+    def mark_interrupted(self, owner: str) -> int:
+        """
+        Fail active jobs whose process has gone away
+
+        A job is considered orphaned when no live lease is held for its kind.
+
+        Args:
+            owner: This process's lock owner ID; its own leases are ignored
+
+        Returns:
+            int: Number of jobs marked as failed
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT job_id, data FROM jobs WHERE status IN ({", ".join("?" * len(ACTIVE_STATUSES))})
+                AND kind NOT IN (SELECT name FROM locks WHERE expires_at > ? AND owner != ?)
+                """,
+                (*ACTIVE_STATUSES, now, owner)
+            ).fetchall()
+            for job_id, data in rows:
+                snapshot = json.loads(data)
+                snapshot.update(status=FAILED, finished_at=now, error="Interrupted by a restart")
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, data = ? WHERE job_id = ?", (FAILED, json.dumps(snapshot), job_id)
+                )
+            self._conn.commit()
+        return len(rows)
+
+    def claim_schedule(self, name: str, interval: float) -> bool:
+        """
+        Record a scheduled run if one is due, so that only one process fires it
+
+        Args:
+            name: Schedule name
+            interval: Seconds between runs
+
+        Returns:
+            bool: True if this caller should run the job now
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO schedules (name, last_run_at) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET last_run_at = excluded.last_run_at
+                WHERE schedules.last_run_at <= ?
+                """,
+                (name, now, now - interval)
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def last_scheduled_run(self, name: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT last_run_at FROM schedules WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Take or renew the lease on a lock
+
+        Args:
+            name: Lock name (the job kind)
+            owner: ID of the process taking the lock
+            ttl: Seconds the lease lasts unless renewed
+
+        Returns:
+            bool: True if the caller now holds the lock
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO locks (name, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE locks.owner = excluded.owner OR locks.expires_at <= ?
+                """,
+                (name, owner, now + ttl, now)
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def release_lock(self, name: str, owner: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner))
+            self._conn.commit()
+
+    def close(self) -> None:
+        """
+        Close the database connection
+        """
+        with self._lock:
+            self._conn.close()
+
+JobFunction = Callable[..., Awaitable[Optional[Dict[str, Any]]]]
+
+class JobScheduler:
+    """
+    Runs background jobs in the API process, off the request path
+
+    Job functions are registered per kind and called as fn(job, **params) in
+    their own task; they may set job.progress_source to report live progress.
+    Triggering a job that is already queued or running with the same
+    parameters returns that job instead of starting a duplicate, and jobs of
+    one kind run one at a time (across processes too, when a store is
+    configured). Blocking calls made by jobs use their own thread pool, and
+    Gemini calls from ingest go through the rate limiter's background lane,
+    so jobs don't take capacity away from searches.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, history_size: int = JOB_HISTORY_SIZE, lock_ttl: float = JOB_LOCK_TTL):
+        """
+        Initialize the scheduler
+
+        Args:
+            store: Persistent job store; None keeps jobs in memory only
+            history_size: Finished jobs kept for status queries
+            lock_ttl: Lease duration of job locks in the store, renewed while a job runs
+        """
+        self.store = store
+        self.history_size = history_size
+        self.lock_ttl = lock_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._functions: Dict[str, JobFunction] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._kind_locks: Dict[str, asyncio.Lock] = {}
+        self._schedules: Dict[str, asyncio.Task] = {}
+
+    def register(self, kind: str, fn: JobFunction) -> None:
+        """
+        Register the function that runs jobs of a kind
+
+        Args:
+            kind: Job kind, e.g. "ingest"
+            fn: Async function called as fn(job, **params); its return value becomes job.result
+        """
+        self._functions[kind] = fn
+
+    async def start(self) -> None:
+        """
+        Mark jobs left active by a previous process as interrupted
+        """
+        if self.store:
+            interrupted = await run_blocking(self.store.mark_interrupted, self.owner)
+            if interrupted:
+                logger.warning(f"Marked {interrupted} jobs interrupted by a restart as failed")
+
+    async def stop(self) -> None:
+        """
+        Stop every schedule and cancel running jobs
+        """
+        for task in self._schedules.values():
+            task.cancel()
+        tasks = list(self._schedules.values()) + list(self._tasks.values())
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._schedules.clear()
+
+    def submit(self, kind: str, params: Optional[Dict[str, Any]] = None, trigger: str = "manual") -> Dict[str, Any]:
+        """
+        Queue a job, or return the identical job that is already queued or running
+
+        Args:
+            kind: A registered job kind
+            params: Keyword arguments for the job function
+            trigger: What started the job ("manual" or "schedule")
+
+        Raises:
+            KeyError: If no function is registered for the kind
+
+        Returns:
+            Dict[str, Any]: The job's snapshot, with "deduplicated" set if it was already active
+        """
+        if kind not in self._functions:
+            raise KeyError(f"Unknown job kind: {kind}")
+        params = params or {}
+
+        for job in self._jobs.values():
+            if job.active and job.kind == kind and job.params == params:
+                logger.info(f"Job {job.id} ({kind}) is already {job.status}, not starting another")
+                return {**job.snapshot(), "deduplicated": True}
+
+        job = Job(kind=kind, params=params, trigger=trigger)
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        logger.info(f"Queued job {job.id} ({kind}, {trigger}) with params {params}")
+        return {**job.snapshot(), "deduplicated": False}
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a queued or running job
+
+        Args:
+            job_id: The job ID
+
+        Returns:
+            Optional[Dict[str, Any]]: The job's snapshot, or None if this process doesn't know the job
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        task = self._tasks.get(job_id)
+        if job.active and task is not None:
+            logger.info(f"Cancelling job {job_id} ({job.kind})")
+            task.cancel()
+        return job.snapshot()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a job's current state
+
+        Jobs started by other processes are found in the store, if there is one.
+
+        Args:
+            job_id: The job ID
+
+        Returns:
+            Optional[Dict[str, Any]]: The job's snapshot, or None if it is unknown
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot()
+        return await run_blocking(self.store.get, job_id) if self.store else None
+
+    async def list(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Return the most recent jobs, newest first
+
+        Args:
+            limit: Maximum number of jobs
+
+        Returns:
+            List[Dict[str, Any]]: Job snapshots
+        """
+        jobs = {job.id: job.snapshot() for job in self._jobs.values()}
+        if self.store:
+            for snapshot in await run_blocking(self.store.recent, limit):
+                jobs.setdefault(snapshot["id"], snapshot)
+        return sorted(jobs.values(), key=lambda snapshot: snapshot["created_at"], reverse=True)[:limit]
+
+    def schedule(self, name: str, kind: str, interval: float, params: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Submit a job every `interval` seconds
+
+        With a store, the last run time is shared between processes and kept
+        across restarts, so the job runs once per interval however many API
+        workers are running.
+
+        Args:
+            name: Schedule name
+            kind: A registered job kind
+            interval: Seconds between runs
+            params: Keyword arguments for the job function
+        """
+        if name in self._schedules:
+            self._schedules[name].cancel()
+        self._schedules[name] = asyncio.create_task(self._schedule_loop(name, kind, interval, params or {}))
+        logger.info(f"Scheduled {kind} job '{name}' every {interval:.0f}s")
+
+    async def _schedule_loop(self, name: str, kind: str, interval: float, params: Dict[str, Any]) -> None:
+        last_run = await run_blocking(self.store.last_scheduled_run, name) if self.store else None
+        next_run = (last_run + interval) if last_run else time.time()
+
+        while True:
+            await asyncio.sleep(max(0.0, next_run - time.time()))
+            try:
+                due = await run_blocking(self.store.claim_schedule, name, interval) if self.store else True
+                if due:
+                    self.submit(kind, params, trigger="schedule")
+                last_run = await run_blocking(self.store.last_scheduled_run, name) if self.store else time.time()
+            except Exception as e:
+                logger.error(f"Error running schedule '{name}': {str(e)}")
+                last_run = time.time()
+            next_run = (last_run or time.time()) + interval
+
+    async def _run(self, job: Job) -> None:
+        # Blocking calls made by this task and its children use the job executor
+        use_job_executor()
+        # Logs and traces from the job carry its ID
+        bind_trace_id(job.id)
+        fn = self._functions[job.kind]
+        heartbeat = None
+        locked = False
+
+        try:
+            await self._save(job)
+            # One job of a kind at a time in this process...
+            async with self._kind_locks.setdefault(job.kind, asyncio.Lock()):
+                # ...and across processes sharing the store
+                if self.store:
+                    locked = await run_blocking(self.store.acquire_lock, job.kind, self.owner, self.lock_ttl)
+                    if not locked:
+                        job.status = SKIPPED
+                        job.error = f"A {job.kind} job is already running in another process"
+                        logger.info(f"Skipping job {job.id}: {job.error}")
+                        return
+                    heartbeat = asyncio.create_task(self._renew_lock(job.kind))
+
+                job.status = RUNNING
+                job.started_at = time.time()
+                await self._save(job)
+                logger.info(f"Started job {job.id} ({job.kind})")
+
+                job.result = await fn(job, **job.params)
+                job.status = SUCCEEDED
+
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+            logger.info(f"Job {job.id} ({job.kind}) cancelled")
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            if locked:
+                try:
+                    await run_blocking(self.store.release_lock, job.kind, self.owner)
+                except Exception as e:
+                    logger.warning(f"Could not release the {job.kind} job lock: {str(e)}")
+
+            # Freeze the final progress
+            job.snapshot()
+            job.progress_source = None
+            job.finished_at = time.time()
+            self._tasks.pop(job.id, None)
+            await self._save(job)
+            await self._prune()
+            if job.status != SKIPPED:
+                logger.info(f"Job {job.id} ({job.kind}) {job.status} after {job.finished_at - (job.started_at or job.created_at):.1f}s")
+
+    async def _renew_lock(self, kind: str) -> None:
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                await run_blocking(self.store.acquire_lock, kind, self.owner, self.lock_ttl)
+            except Exception as e:
+                logger.warning(f"Could not renew the {kind} job lock: {str(e)}")
+
+    async def _save(self, job: Job) -> None:
+        if not self.store:
+            return
+        try:
+            await run_blocking(self.store.save, job.snapshot())
+        except Exception as e:
+            logger.warning(f"Could not persist job {job.id}: {str(e)}")
+
+    async def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if not job.active]
+        for job in sorted(finished, key=lambda job: job.created_at)[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job.id]
+        if self.store:
+            try:
+                await run_blocking(self.store.prune, self.history_size)
+            except Exception as e:
+                logger.warning(f"Could not prune job history: {str(e)}")
+
+async def run_ingest_job(job: Job, full: bool = False) -> Dict[str, Any]:
+    """
+    Job function for the incremental (or full) contract ingest
+
+    Args:
+        job: The job being run; its progress follows the ingest pipeline's
+        full: Ignore the ingest state and re-process everything
+
+    Raises:
+        RuntimeError: If the ingest reports an error
+
+    Returns:
+        Dict[str, Any]: The ingest result
+    """
+    # Imported here: the routes module imports this one
+    from app.routes.contracts import process_contract_embeddings
+
+    def track(pipeline) -> None:
+        job.progress_source = pipeline.progress
+
+    result = await process_contract_embeddings(full=full, on_pipeline=track)
+    if result.get("status") == "error":
+        raise RuntimeError(result.get("message", "Ingest failed"))
+    return result
+
+_scheduler: Optional[JobScheduler] = None
+
+def get_job_scheduler() -> JobScheduler:
+    """
+    Return the process-wide job scheduler, creating it on first use
+
+    The ingest job kind is registered. If the job store can't be opened,
+    jobs are kept in memory only.
+
+    Returns:
+        JobScheduler: The shared scheduler
+    """
+    global _scheduler
+    if _scheduler is None:
+        store = None
+        if JOB_STORE_ENABLED:
+            try:
+                store = JobStore()
+            except Exception as e:
+                logger.warning(f"Job store unavailable, keeping jobs in memory: {str(e)}")
+        _scheduler = JobScheduler(store=store)
+        _scheduler.register("ingest", run_ingest_job)
+    return _scheduler
+
+async def start_job_scheduler() -> JobScheduler:
+    """
+    Start the shared scheduler and the periodic ingest, if INGEST_SCHEDULE_HOURS is set
+
+    Returns:
+        JobScheduler: The shared scheduler
+    """
+    scheduler = get_job_scheduler()
+    await scheduler.start()
+    if INGEST_SCHEDULE_HOURS > 0:
+        scheduler.schedule("ingest", "ingest", INGEST_SCHEDULE_HOURS * 3600)
+    return scheduler
@@ -0,0 +1,60 @@
+from typing import Any, Dict, Optional
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Pinecone-style metadata filter against one vector's metadata
+
+    Supports implicit equality ({"section": "NAVY"}), the comparison operators
+    $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin and $exists, and the logical
+    operators $and and $or.
+
+    Args:
+        metadata: The vector's metadata
+        filter: The filter expression, or None to match everything
+
+    Returns:
+        bool: True if the metadata satisfies the filter
+    """
+    if not filter:
+        return True
+
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not all(_compare(metadata.get(key), key in metadata, op, operand) for op, operand in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+
+    return True
+
+def _compare(value: Any, present: bool, op: str, operand: Any) -> bool:
+    if op == "$exists":
+        return present == bool(operand)
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+
+    # Range operators only apply to numbers, as in Pinecone
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    if op == "$lte":
+        return value <= operand
+
+    raise ValueError(f"Unsupported filter operator: {op}")
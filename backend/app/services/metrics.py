@@ -0,0 +1,322 @@
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds; searches take tens of milliseconds to seconds, ingest batches up to a minute
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+class _Metric:
+    """
+    A named metric with a fixed set of label names
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """
+        Yield (sample name, label names, label values, value) for the exposition format
+        """
+        return []
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labelnames, values, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count per label combination
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Add `amount` (not negative) to the count for the given labels
+        """
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, self.labelnames, key, value
+
+class Histogram(_Metric):
+    """
+    Observations counted into cumulative buckets per label combination
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label combination: count per bucket (not cumulative), sum, count
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record one observation, e.g. a duration in seconds
+        """
+        key = self._key(labels)
+        # Index of the first bucket whose upper bound holds the value
+        bucket = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            counts, totals = self._values.setdefault(key, ([0] * len(self.buckets), [0.0, 0.0]))
+            counts[bucket] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return int(entry[1][1]) if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._values.items())
+        bucket_labels = self.labelnames + ("le",)
+        for key, (counts, (total, count)) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", bucket_labels, key + (_format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, key, total
+            yield f"{self.name}_count", self.labelnames, key, count
+
+class CallbackMetric(_Metric):
+    """
+    A gauge or counter read from another component's stats when metrics are rendered
+    """
+
+    def __init__(self, name: str, help: str, type: str, labelnames: Sequence[str], fn: Callable[[], Dict[LabelValues, float]]):
+        """
+        Args:
+            name: Metric name
+            help: Description
+            type: "gauge" or "counter"
+            labelnames: Label names
+            fn: Returns the current value per tuple of label values
+        """
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def samples(self):
+        for key, value in sorted(self.fn().items()):
+            yield self.name, self.labelnames, key, value
+
+class MetricsRegistry:
+    """
+    Process-wide collection of metrics, rendered in the Prometheus text format
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, type: str, labelnames: Sequence[str], fn: Callable[[], Dict[LabelValues, float]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, type, labelnames, fn))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4)
+
+        A metric whose stats can't be read is left out rather than failing the scrape.
+
+        Returns:
+            str: The exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                continue
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+# Latency of each stage of a search or ingest, labelled by the traced operation it ran in
+STAGE_SECONDS = registry.histogram(
+    "govwatch_stage_duration_seconds",
+    "Time spent in one stage of a search or ingest",
+    ["operation", "stage"],
+)
+STAGE_FAILURES = registry.counter(
+    "govwatch_stage_failures_total",
+    "Stages that raised an error",
+    ["operation", "stage"],
+)
+OPERATION_SECONDS = registry.histogram(
+    "govwatch_operation_duration_seconds",
+    "End-to-end time of a traced search, stream or ingest",
+    ["operation", "outcome"],
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "govwatch_http_request_duration_seconds",
+    "Time from receiving an HTTP request to sending the last byte of the response",
+    ["method", "path", "status"],
+)
+
+# Gemini usage; embedding requests don't report usage, so their prompt tokens are estimated
+GEMINI_TOKENS = registry.counter(
+    "govwatch_gemini_tokens_total",
+    "Gemini tokens by operation and direction",
+    ["operation", "direction"],
+)
+
+# Ingest progress
+INGEST_ARTICLES = registry.counter(
+    "govwatch_ingest_articles_total",
+    "Contract articles seen by ingest, by result",
+    ["result"],
+)
+INGEST_SECTIONS = registry.counter(
+    "govwatch_ingest_sections_total",
+    "Sections (or award records) seen by ingest, by result",
+    ["result"],
+)
+FETCH_RETRIES = registry.counter("govwatch_fetch_retries_total", "defense.gov requests retried after a transient failure")
+FETCH_FAILURES = registry.counter("govwatch_fetch_failures_total", "defense.gov pages that could not be fetched")
+
+# Estimated tokens of retrieved passages put in each search prompt
+CONTEXT_TOKENS = registry.histogram(
+    "govwatch_context_tokens",
+    "Estimated tokens of contract passages in a search prompt",
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000),
+)
+
+def _rate_limiter_stats() -> Dict:
+    from app.services.rate_limiter import get_rate_limiter
+
+    return get_rate_limiter().stats()
+
+def _cache_lookups() -> Dict[LabelValues, float]:
+    from app.services.answer_cache import get_answer_cache
+    from app.services.query_cache import get_query_embedding_cache
+
+    query = get_query_embedding_cache().stats()
+    answer = get_answer_cache().stats()
+    return {
+        ("query_embedding", "hit"): query["hits"],
+        # Memory misses served by the on-disk tier
+        ("query_embedding", "disk_hit"): query["disk_hits"],
+        ("query_embedding", "miss"): query["misses"] - query["disk_hits"],
+        ("answer", "hit"): answer["hits"],
+        ("answer", "miss"): answer["misses"],
+    }
+
+registry.callback(
+    "govwatch_cache_lookups_total",
+    "Search cache lookups by cache and result",
+    "counter",
+    ["cache", "result"],
+    _cache_lookups,
+)
+def _search_executions() -> Dict[LabelValues, float]:
+    from app.services.single_flight import search_flights
+
+    stats = search_flights.stats()
+    return {
+        ("search", "executed"): stats["executions"],
+        ("search", "coalesced"): stats["coalesced"],
+        ("stream", "executed"): stats["stream_executions"],
+        ("stream", "coalesced"): stats["stream_coalesced"],
+    }
+
+registry.callback(
+    "govwatch_search_requests_total",
+    "Searches that ran, or were coalesced into an identical one already running",
+    "counter",
+    ["mode", "result"],
+    _search_executions,
+)
+registry.callback(
+    "govwatch_gemini_calls_total",
+    "Gemini calls admitted by the rate limiter, by lane",
+    "counter",
+    ["lane"],
+    lambda: {(lane,): stats["calls"] for lane, stats in _rate_limiter_stats()["lanes"].items()},
+)
+for _name, _help in (
+    ("retries", "Gemini calls retried after a throttled or transient failure"),
+    ("failures", "Gemini calls that failed after all retries"),
+    ("throttled", "Gemini responses that asked the client to slow down (429 or 503)"),
+):
+    registry.callback(f"govwatch_gemini_{_name}_total", _help, "counter", [], lambda key=_name: {(): _rate_limiter_stats()[key]})
+for _name, _key, _help in (
+    ("concurrency_limit", "concurrency_limit", "Current adaptive limit on concurrent Gemini calls"),
+    ("in_flight", "in_flight", "Gemini calls in flight"),
+    ("queued", "queued", "Gemini calls waiting for the rate limiter"),
+):
+    registry.callback(f"govwatch_gemini_{_name}", _help, "gauge", [], lambda key=_key: {(): _rate_limiter_stats()[key]})
+
+def render_metrics() -> str:
+    """
+    Render the process's metrics for a Prometheus scrape
+
+    Returns:
+        str: The exposition text
+    """
+    return registry.render()
@@ -0,0 +1,453 @@
+import hashlib
+import logging
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.config import INGEST_STATE_PATH, NEAR_DUPLICATE_THRESHOLD
+from app.services.bm25 import tokenize
+from app.services.context_builder import shingles
+
+# Optional dependency: numpy computes signatures for a whole section at once
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Signature length and LSH banding. 16 bands of 4 rows make sections with a
+# Jaccard similarity around 0.5 or more likely to share a band; candidates are
+# then compared on their full signatures. Stored signatures depend on these
+# values and the seed, so they are constants rather than settings.
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed permutations (a * x + b) mod p, the same in every process
+_random = random.Random(1234)
+_A = [_random.randint(1, _MAX_HASH) for _ in range(NUM_PERMUTATIONS)]
+_B = [_random.randint(0, _MAX_HASH) for _ in range(NUM_PERMUTATIONS)]
+
+_SIGNATURE_FORMAT = f"<{NUM_PERMUTATIONS}I"
+
+# SQLite's default limit on parameters per statement
+_MAX_PARAMETERS = 900
+
+# What a copy's link records about it, so filtered searches can return it under its own date, agency and URL
+COPY_FIELDS = ("contract_url", "date", "date_number", "section")
+
+# Pinecone-style comparisons on date_number that linked_copies evaluates in SQL
+_DATE_OPERATORS = {"$eq": "=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+# Dollar amounts ("$245,118,000"); announcements quoting different amounts are different awards or modifications
+AMOUNT = re.compile(r"\$\s?\d[\d,]*(?:\.\d+)?")
+
+Signature = Tuple[int, ...]
+
+class Fingerprint(NamedTuple):
+    """
+    What a section is compared on: its MinHash signature and the dollar amounts it quotes
+    """
+    signature: Signature
+    amounts: str                # Sorted, comma-free amounts joined with spaces
+
+def _shingle_hashes(text: str) -> List[int]:
+    return [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+        for shingle in shingles(tokenize(text))
+    ]
+
+def minhash_signature(text: str) -> Optional[Signature]:
+    """
+    MinHash signature of a text's word shingles (the ones the context builder compares)
+
+    Two signatures agree at each position with probability equal to the
+    Jaccard similarity of the texts' shingle sets.
+
+    Args:
+        text: Section text
+
+    Returns:
+        Optional[Signature]: NUM_PERMUTATIONS 32-bit values, or None for a text without words
+    """
+    hashes = _shingle_hashes(text)
+    if not hashes:
+        return None
+
+    if NUMPY_AVAILABLE:
+        # a * x + b stays below 2**64 because a, b and x are 32-bit
+        values = np.array(hashes, dtype=np.uint64)[:, None]
+        permuted = (values * np.array(_A, dtype=np.uint64) + np.array(_B, dtype=np.uint64)) % np.uint64(_MERSENNE_PRIME)
+        return tuple(int(value) for value in (permuted & np.uint64(_MAX_HASH)).min(axis=0))
+
+    return tuple(
+        min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in hashes)
+        for a, b in zip(_A, _B)
+    )
+
+def fingerprint(text: str) -> Optional[Fingerprint]:
+    """
+    Fingerprint of a section's text
+
+    Args:
+        text: Section text
+
+    Returns:
+        Optional[Fingerprint]: None for a text without words
+    """
+    signature = minhash_signature(text)
+    if signature is None:
+        return None
+    amounts = sorted({re.sub(r"[$\s,]", "", amount) for amount in AMOUNT.findall(text)})
+    return Fingerprint(signature, " ".join(amounts))
+
+def estimated_similarity(a: Signature, b: Signature) -> float:
+    """
+    Estimated Jaccard similarity: the fraction of positions where two signatures agree
+    """
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTATIONS
+
+def band_keys(signature: Signature) -> List[int]:
+    """
+    One LSH bucket key per band; sections sharing any key are candidate near-duplicates
+    """
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<B{ROWS}I", band, *rows), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+def _chunks(values: Sequence, size: int = _MAX_PARAMETERS) -> Iterable[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of stored sections with an LSH index over them, kept in the ingest state database
+
+    A section is a near copy of a stored one when their signatures estimate a
+    Jaccard similarity of at least the threshold and they quote the same
+    dollar amounts, so a modification re-announced with a new amount is kept.
+    Only sections that were embedded and stored are indexed, so every
+    near-duplicate found points to a vector that exists. Sections skipped as
+    near copies can be linked to the vector they duplicate, together with
+    their own URL, date and section, so searches filtered on date or agency
+    can still return them. When that vector is deleted or re-embedded from
+    changed text, its links are released so the copies are embedded the
+    next time their articles are ingested.
+    """
+
+    def __init__(self, path: str = INGEST_STATE_PATH, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        """
+        Open (or create) the index tables
+
+        Args:
+            path: Path of the SQLite database file (the ingest state database)
+            threshold: Estimated Jaccard similarity at which a section is a near-duplicate
+        """
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Backfill workers in other processes write to the same database; wait for their locks
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS minhash_signatures (
+                vector_id TEXT PRIMARY KEY,
+                article_id TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                amounts TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS minhash_bands (
+                band_key INTEGER NOT NULL,
+                vector_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_minhash_bands_key ON minhash_bands(band_key);
+            CREATE INDEX IF NOT EXISTS idx_minhash_bands_vector ON minhash_bands(vector_id);
+            CREATE TABLE IF NOT EXISTS near_duplicates (
+                vector_id TEXT PRIMARY KEY,
+                article_id TEXT NOT NULL,
+                canonical_id TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                contract_url TEXT,
+                date TEXT,
+                date_number INTEGER,
+                section TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_near_duplicates_canonical ON near_duplicates(canonical_id);
+            """
+        )
+        # Links recorded before copies' metadata was kept have none and are never returned by searches
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(near_duplicates)")}
+        for column, column_type in (("contract_url", "TEXT"), ("date", "TEXT"), ("date_number", "INTEGER"), ("section", "TEXT")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE near_duplicates ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_near_duplicates_date ON near_duplicates(date_number)")
+        self._conn.commit()
+
+    def find(self, article_id: str, fingerprints: Dict[str, Fingerprint]) -> Dict[str, Tuple[str, float]]:
+        """
+        Find the stored section each of an article's sections is a near-duplicate of
+
+        Sections are never matched to the article's own stored sections, which
+        may be about to change or be deleted.
+
+        Args:
+            article_id: The article the sections belong to
+            fingerprints: Vector ID mapped to the fingerprint of its text
+
+        Returns:
+            Dict[str, Tuple[str, float]]: Vector ID mapped to (canonical vector ID,
+                estimated similarity) for each section at or above the threshold
+        """
+        keys = {vector_id: band_keys(section_fingerprint.signature) for vector_id, section_fingerprint in fingerprints.items()}
+        all_keys = sorted({key for section_keys in keys.values() for key in section_keys})
+        if not all_keys:
+            return {}
+
+        with self._lock:
+            buckets: Dict[int, List[str]] = {}
+            for chunk in _chunks(all_keys):
+                rows = self._conn.execute(
+                    f"SELECT band_key, vector_id FROM minhash_bands WHERE band_key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, vector_id in rows:
+                    buckets.setdefault(key, []).append(vector_id)
+
+            candidate_ids = sorted({vector_id for ids in buckets.values() for vector_id in ids})
+            stored: Dict[str, Fingerprint] = {}
+            for chunk in _chunks(candidate_ids):
+                rows = self._conn.execute(
+                    f"SELECT vector_id, signature, amounts FROM minhash_signatures "
+                    f"WHERE vector_id IN ({','.join('?' * len(chunk))}) AND article_id != ?",
+                    [*chunk, article_id]
+                ).fetchall()
+                stored.update(
+                    (vector_id, Fingerprint(struct.unpack(_SIGNATURE_FORMAT, blob), amounts)) for vector_id, blob, amounts in rows
+                )
+
+        duplicates = {}
+        for vector_id, section_fingerprint in fingerprints.items():
+            candidates = {
+                candidate for key in keys[vector_id] for candidate in buckets.get(key, ())
+                if candidate in stored and stored[candidate].amounts == section_fingerprint.amounts
+            }
+            best = max(
+                ((candidate, estimated_similarity(section_fingerprint.signature, stored[candidate].signature)) for candidate in candidates),
+                key=lambda entry: (entry[1], entry[0]),
+                default=None
+            )
+            if best and best[1] >= self.threshold:
+                duplicates[vector_id] = best
+        return duplicates
+
+    def add(self, entries: Iterable[Tuple[str, str, Fingerprint]]) -> None:
+        """
+        Index stored sections, replacing earlier fingerprints for the same vector IDs
+
+        Args:
+            entries: (vector ID, article ID, fingerprint) for each stored section
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        with self._lock:
+            self._remove([vector_id for vector_id, _, _ in entries])
+            self._conn.executemany(
+                "INSERT INTO minhash_signatures (vector_id, article_id, signature, amounts) VALUES (?, ?, ?, ?)",
+                [
+                    (vector_id, article_id, struct.pack(_SIGNATURE_FORMAT, *section_fingerprint.signature), section_fingerprint.amounts)
+                    for vector_id, article_id, section_fingerprint in entries
+                ]
+            )
+            self._conn.executemany(
+                "INSERT INTO minhash_bands (band_key, vector_id) VALUES (?, ?)",
+                [(key, vector_id) for vector_id, _, section_fingerprint in entries for key in band_keys(section_fingerprint.signature)]
+            )
+            self._conn.commit()
+
+    def remove(self, vector_ids: Iterable[str]) -> None:
+        """
+        Stop matching against sections whose vectors were deleted or now duplicate another
+        """
+        vector_ids = list(vector_ids)
+        if not vector_ids:
+            return
+        with self._lock:
+            self._remove(vector_ids)
+            self._conn.commit()
+
+    def _remove(self, vector_ids: List[str]) -> None:
+        for chunk in _chunks(vector_ids):
+            placeholders = ",".join("?" * len(chunk))
+            self._conn.execute(f"DELETE FROM minhash_bands WHERE vector_id IN ({placeholders})", chunk)
+            self._conn.execute(f"DELETE FROM minhash_signatures WHERE vector_id IN ({placeholders})", chunk)
+
+    def set_links(
+        self,
+        article_id: str,
+        checked: Iterable[str],
+        links: Dict[str, Tuple[str, float]],
+        metadata: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> None:
+        """
+        Record which of an article's sections were skipped as copies of which stored vector
+
+        Args:
+            article_id: The defense.gov article ID
+            checked: The article's vector IDs that were checked in this run; their old links are replaced
+            links: Vector ID mapped to (canonical vector ID, similarity) for the copies
+            metadata: Vector ID mapped to the copy's own metadata (the COPY_FIELDS are kept)
+        """
+        checked = list(checked)
+        metadata = metadata or {}
+        with self._lock:
+            for chunk in _chunks(checked):
+                self._conn.execute(f"DELETE FROM near_duplicates WHERE vector_id IN ({','.join('?' * len(chunk))})", chunk)
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO near_duplicates (vector_id, article_id, canonical_id, similarity, {', '.join(COPY_FIELDS)}) "
+                f"VALUES (?, ?, ?, ?{', ?' * len(COPY_FIELDS)})",
+                [
+                    (vector_id, article_id, canonical_id, similarity, *(metadata.get(vector_id, {}).get(name) for name in COPY_FIELDS))
+                    for vector_id, (canonical_id, similarity) in links.items()
+                ]
+            )
+            self._conn.commit()
+
+    def linked_copies(self, metadata_filter: Optional[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """
+        Copies whose own date and section satisfy a search filter
+
+        Only the filter's date_number and section clauses are evaluated here;
+        the caller checks the rest against the copy's metadata merged into
+        its canonical vector's.
+
+        Args:
+            metadata_filter: A filter from QueryFilters.to_metadata_filter
+            limit: Most copies to return, newest first
+
+        Returns:
+            List[Dict]: Vector ID, canonical vector ID and the COPY_FIELDS of each copy;
+                empty when the filter has no date or section clause
+        """
+        metadata_filter = metadata_filter or {}
+        clauses, parameters = [], []
+
+        date_range = metadata_filter.get("date_number")
+        if isinstance(date_range, dict):
+            for op, operand in date_range.items():
+                if op in _DATE_OPERATORS:
+                    clauses.append(f"date_number {_DATE_OPERATORS[op]} ?")
+                    parameters.append(operand)
+        elif date_range is not None:
+            clauses.append("date_number = ?")
+            parameters.append(date_range)
+
+        sections = metadata_filter.get("section")
+        if isinstance(sections, dict) and "$in" in sections:
+            clauses.append(f"section IN ({','.join('?' * len(sections['$in']))})")
+            parameters.extend(sections["$in"])
+        elif isinstance(sections, str):
+            clauses.append("section = ?")
+            parameters.append(sections)
+
+        # Unfiltered searches already find the canonical vector itself
+        if not clauses:
+            return []
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT vector_id, canonical_id, {', '.join(COPY_FIELDS)} FROM near_duplicates "
+                f"WHERE contract_url IS NOT NULL AND {' AND '.join(clauses)} ORDER BY date_number DESC, vector_id LIMIT ?",
+                [*parameters, limit]
+            ).fetchall()
+        return [
+            {"vector_id": vector_id, "canonical_id": canonical_id, **dict(zip(COPY_FIELDS, values))}
+            for vector_id, canonical_id, *values in rows
+        ]
+
+    def release(self, canonical_ids: Iterable[str]) -> List[Tuple[str, str]]:
+        """
+        Unlink the copies of vectors that were deleted or re-embedded from changed text
+
+        Args:
+            canonical_ids: Vector IDs whose copies should be embedded in their own right
+
+        Returns:
+            List[Tuple[str, str]]: (vector ID, article ID) of every released copy
+        """
+        canonical_ids = list(canonical_ids)
+        released = []
+        with self._lock:
+            for chunk in _chunks(canonical_ids):
+                placeholders = ",".join("?" * len(chunk))
+                released.extend(self._conn.execute(
+                    f"SELECT vector_id, article_id FROM near_duplicates WHERE canonical_id IN ({placeholders})", chunk
+                ).fetchall())
+                self._conn.execute(f"DELETE FROM near_duplicates WHERE canonical_id IN ({placeholders})", chunk)
+            self._conn.commit()
+        return [tuple(row) for row in released]
+
+    def copies(self, canonical_id: str) -> List[Dict[str, object]]:
+        """
+        Sections linked to a stored vector as its near copies
+
+        Args:
+            canonical_id: A stored vector ID
+
+        Returns:
+            List[Dict]: Vector ID, article ID and similarity of each copy
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT vector_id, article_id, similarity FROM near_duplicates WHERE canonical_id = ? ORDER BY vector_id",
+                (canonical_id,)
+            ).fetchall()
+        return [{"vector_id": vector_id, "article_id": article_id, "similarity": similarity} for vector_id, article_id, similarity in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Indexed sections and linked copies
+        """
+        with self._lock:
+            signatures = self._conn.execute("SELECT COUNT(*) FROM minhash_signatures").fetchone()[0]
+            links = self._conn.execute("SELECT COUNT(*) FROM near_duplicates").fetchone()[0]
+        return {"indexed_sections": signatures, "linked_copies": links}
+
+    def close(self) -> None:
+        """
+        Close the database connection
+        """
+        with self._lock:
+            self._conn.close()
+
+_index: Optional[NearDuplicateIndex] = None
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """
+    Return the process-wide near-duplicate index, opening it on first use
+
+    Returns:
+        NearDuplicateIndex: The shared index over the ingest state database
+    """
+    global _index
+    if _index is None:
+        _index = NearDuplicateIndex()
+    return _index
@@ -0,0 +1,145 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL
+from app.services.embedding_cache import cache_key, normalize_text
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query so trivially different spellings share cache entries
+
+    Args:
+        query: The search query
+
+    Returns:
+        str: The query lowercased with runs of whitespace collapsed
+    """
+    return normalize_text(query).lower()
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU cache with TTL for query embeddings
+
+    Keyed on the embedding model and the normalized query text. Entries are
+    stored as compact float arrays, and the cache holds at most max_entries
+    of them, evicting the least recently used first.
+    """
+
+    def __init__(self, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE, ttl_seconds: float = QUERY_EMBEDDING_CACHE_TTL):
+        """
+        Args:
+            max_entries: Maximum number of embeddings kept in memory
+            ttl_seconds: Seconds an entry stays valid after it was stored (0 = no expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, array]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        """
+        Look up a query embedding
+
+        Args:
+            model: The embedding model name
+            query: The search query
+
+        Returns:
+            Optional[List[float]]: The cached embedding, or None on a miss or expired entry
+        """
+        key = cache_key(model, normalize_query(query))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, vector = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector.tolist()
+
+    def put(self, model: str, query: str, embedding: List[float]) -> None:
+        """
+        Store a query embedding, evicting the least recently used entries if full
+
+        Args:
+            model: The embedding model name
+            query: The search query
+            embedding: Its embedding
+        """
+        if self.max_entries <= 0:
+            return
+
+        key = cache_key(model, normalize_query(query))
+
+        with self._lock:
+            self._entries[key] = (time.monotonic(), array("f", embedding))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_disk_hit(self) -> None:
+        """
+        Count a memory miss that was served by the on-disk tier
+        """
+        with self._lock:
+            self.disk_hits += 1
+
+    def clear(self) -> None:
+        """
+        Remove every entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Describe the cache size and hit/miss counters
+
+        Returns:
+            Dict: Entries, limits, counters and the memory hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+_cache: Optional[QueryEmbeddingCache] = None
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """
+    Return the process-wide query embedding cache
+
+    Returns:
+        QueryEmbeddingCache: The shared cache instance
+    """
+    global _cache
+    if _cache is None:
+        _cache = QueryEmbeddingCache()
+    return _cache
@@ -0,0 +1,315 @@
+import calendar
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Query phrases mapped to the section headers defense.gov uses. Longer phrases
+# are matched first so "missile defense agency" isn't also read as "defense".
+AGENCY_ALIASES = {
+    "army": "ARMY",
+    "army corps of engineers": "ARMY",
+    "navy": "NAVY",
+    "naval": "NAVY",
+    "air force": "AIR FORCE",
+    "usaf": "AIR FORCE",
+    "space force": "SPACE FORCE",
+    "marine corps": "MARINE CORPS",
+    "marines": "MARINE CORPS",
+    "defense logistics agency": "DEFENSE LOGISTICS AGENCY",
+    "dla": "DEFENSE LOGISTICS AGENCY",
+    "missile defense agency": "MISSILE DEFENSE AGENCY",
+    "mda": "MISSILE DEFENSE AGENCY",
+    "defense health agency": "DEFENSE HEALTH AGENCY",
+    "dha": "DEFENSE HEALTH AGENCY",
+    "defense information systems agency": "DEFENSE INFORMATION SYSTEMS AGENCY",
+    "disa": "DEFENSE INFORMATION SYSTEMS AGENCY",
+    "darpa": "DEFENSE ADVANCED RESEARCH PROJECTS AGENCY",
+    "defense threat reduction agency": "DEFENSE THREAT REDUCTION AGENCY",
+    "dtra": "DEFENSE THREAT REDUCTION AGENCY",
+    "special operations command": "U.S. SPECIAL OPERATIONS COMMAND",
+    "socom": "U.S. SPECIAL OPERATIONS COMMAND",
+    "transportation command": "U.S. TRANSPORTATION COMMAND",
+    "transcom": "U.S. TRANSPORTATION COMMAND",
+    "washington headquarters services": "WASHINGTON HEADQUARTERS SERVICES",
+}
+
+AGENCY_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(alias) for alias in sorted(AGENCY_ALIASES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+MONTHS["sept"] = 9
+
+MONTH_NAME = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+EXPLICIT_DATE = rf"(?:\d{{4}}-\d{{2}}-\d{{2}}|{MONTH_NAME}\s+\d{{1,2}},?\s+\d{{4}})"
+
+# Dollar figures such as "$100M", "$1.5 billion", "$250,000" or "5 million dollars"
+MONEY = r"\$?\s?(\d[\d,]*(?:\.\d+)?)\s*(k|m|mm|mil|b|bn|thousand|million|billion)?\b"
+
+AMOUNT_RANGE = re.compile(rf"between\s+{MONEY}\s+and\s+{MONEY}", re.IGNORECASE)
+AMOUNT_MIN = re.compile(rf"(?:over|above|more than|greater than|exceeding|at least|>=?)\s+{MONEY}", re.IGNORECASE)
+AMOUNT_MAX = re.compile(rf"(?:under|below|less than|at most|up to|<=?)\s+{MONEY}", re.IGNORECASE)
+
+UNIT_SCALE = {
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "mm": 1e6, "mil": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+}
+
+@dataclass
+class QueryFilters:
+    """
+    Structured constraints pulled out of (or passed alongside) a search query
+    """
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    sections: List[str] = field(default_factory=list)
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return not (self.date_from or self.date_to or self.sections
+                    or self.min_amount is not None or self.max_amount is not None)
+
+    def merge(self, explicit: "QueryFilters") -> "QueryFilters":
+        """
+        Combine with explicitly requested filters, which take precedence field by field
+        """
+        return QueryFilters(
+            date_from=explicit.date_from or self.date_from,
+            date_to=explicit.date_to or self.date_to,
+            sections=explicit.sections or self.sections,
+            min_amount=explicit.min_amount if explicit.min_amount is not None else self.min_amount,
+            max_amount=explicit.max_amount if explicit.max_amount is not None else self.max_amount,
+        )
+
+    def to_metadata_filter(self) -> Optional[Dict[str, Any]]:
+        """
+        Build the Pinecone-style metadata filter for these constraints
+
+        Dates are compared on the numeric date_number metadata (YYYYMMDD),
+        since range operators only apply to numbers.
+
+        Returns:
+            Optional[Dict]: The filter, or None if there are no constraints
+        """
+        metadata_filter: Dict[str, Any] = {}
+
+        if self.date_from or self.date_to:
+            date_range = {}
+            if self.date_from:
+                date_range["$gte"] = date_number(self.date_from.isoformat())
+            if self.date_to:
+                date_range["$lte"] = date_number(self.date_to.isoformat())
+            metadata_filter["date_number"] = date_range
+
+        if self.sections:
+            metadata_filter["section"] = {"$in": list(self.sections)}
+
+        if self.min_amount is not None or self.max_amount is not None:
+            amount_range = {}
+            if self.min_amount is not None:
+                amount_range["$gte"] = self.min_amount
+            if self.max_amount is not None:
+                amount_range["$lte"] = self.max_amount
+            metadata_filter["amount"] = amount_range
+
+        return metadata_filter or None
+
+    def describe(self) -> Dict[str, Any]:
+        """
+        JSON-friendly summary of the applied filters for API responses
+        """
+        return {
+            "date_from": self.date_from.isoformat() if self.date_from else None,
+            "date_to": self.date_to.isoformat() if self.date_to else None,
+            "sections": list(self.sections),
+            "min_amount": self.min_amount,
+            "max_amount": self.max_amount,
+        }
+
+def date_number(value: str) -> Optional[int]:
+    """
+    Convert a YYYY-MM-DD date to the YYYYMMDD integer stored as date_number metadata
+
+    Args:
+        value: The date string
+
+    Returns:
+        Optional[int]: e.g. 20250224, or None if the date can't be parsed ("Unknown Date")
+    """
+    try:
+        return int(datetime.strptime(value, "%Y-%m-%d").strftime("%Y%m%d"))
+    except (TypeError, ValueError):
+        return None
+
+def parse_money(match: re.Match, number_group: int) -> Optional[float]:
+    # A bare number ("over 5 days") is not an amount: require "$" or a unit
+    number, unit = match.group(number_group), match.group(number_group + 1)
+    if not unit and "$" not in match.group(0):
+        return None
+    return float(number.replace(",", "")) * UNIT_SCALE.get((unit or "").lower(), 1)
+
+def parse_explicit_date(text: str) -> Optional[date]:
+    text = re.sub(r"\s+", " ", text.strip()).replace(",", "")
+    text = re.sub(r"^sept\b", "sep", text, flags=re.IGNORECASE)
+    for date_format in ("%Y-%m-%d", "%b. %d %Y", "%b %d %Y", "%B %d %Y"):
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+def extract_date_range(query: str, today: date) -> Tuple[Optional[date], Optional[date]]:
+    """
+    Find the announcement-date range a query asks about
+
+    Understands relative phrases ("last week", "past 30 days", "this month",
+    "last year", "yesterday"), months and years ("in March 2025", "in 2024")
+    and explicit bounds ("since Feb. 24, 2025", "before 2025-03-01",
+    "between 2025-02-01 and 2025-02-28").
+
+    Args:
+        query: The search query
+        today: Reference date for relative phrases
+
+    Returns:
+        Tuple[Optional[date], Optional[date]]: Inclusive (from, to) bounds, either may be None
+    """
+    text = query.lower()
+
+    match = re.search(rf"(?:between|from)\s+({EXPLICIT_DATE})\s+(?:and|to|through|until)\s+({EXPLICIT_DATE})", text)
+    if match:
+        return parse_explicit_date(match.group(1)), parse_explicit_date(match.group(2))
+
+    date_from = date_to = None
+    match = re.search(rf"(?:since|after|from|starting)\s+({EXPLICIT_DATE})", text)
+    if match:
+        date_from = parse_explicit_date(match.group(1))
+    match = re.search(rf"(?:before|until|through|prior to)\s+({EXPLICIT_DATE})", text)
+    if match:
+        date_to = parse_explicit_date(match.group(1))
+    match = re.search(rf"\bon\s+({EXPLICIT_DATE})", text)
+    if match:
+        date_from = date_to = parse_explicit_date(match.group(1))
+    if date_from or date_to:
+        return date_from, date_to
+
+    if re.search(r"\btoday\b", text):
+        return today, today
+    if re.search(r"\byesterday\b", text):
+        return today - timedelta(days=1), today - timedelta(days=1)
+
+    match = re.search(r"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month)s?\b", text)
+    if match:
+        days = int(match.group(1)) * {"day": 1, "week": 7, "month": 30}[match.group(2)]
+        return today - timedelta(days=days), today
+    if re.search(r"\b(?:last|past|previous)\s+week\b", text):
+        return today - timedelta(days=7), today
+    if re.search(r"\bthis\s+week\b", text):
+        return today - timedelta(days=today.weekday()), today
+    if re.search(r"\b(?:last|previous)\s+month\b", text):
+        last_month = today.replace(day=1) - timedelta(days=1)
+        return month_bounds(last_month.year, last_month.month)
+    if re.search(r"\bpast\s+month\b", text):
+        return today - timedelta(days=30), today
+    if re.search(r"\bthis\s+month\b", text):
+        return today.replace(day=1), today
+    if re.search(r"\b(?:last|previous)\s+year\b", text):
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+    if re.search(r"\bpast\s+year\b", text):
+        return today - timedelta(days=365), today
+    if re.search(r"\bthis\s+year\b", text):
+        return date(today.year, 1, 1), today
+
+    match = re.search(rf"\b(?:in|during|for)\s+({MONTH_NAME})\s+(\d{{4}})\b", text)
+    if match:
+        month = MONTHS.get(match.group(1).rstrip("."))
+        if month:
+            return month_bounds(int(match.group(2)), month)
+    match = re.search(r"\b(?:in|during|for)\s+(20\d{2})\b", text)
+    if match:
+        year = int(match.group(1))
+        return date(year, 1, 1), date(year, 12, 31)
+
+    return None, None
+
+def extract_sections(query: str) -> List[str]:
+    """
+    Find the agency sections a query names
+
+    Args:
+        query: The search query
+
+    Returns:
+        List[str]: Section headers (e.g. ["NAVY"]) in order of first mention
+    """
+    sections: List[str] = []
+    for match in AGENCY_PATTERN.finditer(query):
+        section = AGENCY_ALIASES[match.group(1).lower()]
+        if section not in sections:
+            sections.append(section)
+    return sections
+
+def normalize_section(name: str) -> str:
+    """
+    Map an agency name or abbreviation from a request to its section header
+
+    Args:
+        name: e.g. "navy", "DLA" or "AIR FORCE"
+
+    Returns:
+        str: The section header, e.g. "NAVY" or "DEFENSE LOGISTICS AGENCY"
+    """
+    return AGENCY_ALIASES.get(name.strip().lower(), name.strip().upper())
+
+def extract_amount_range(query: str) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Find dollar thresholds such as "over $100M" or "between $1M and $5M"
+
+    Args:
+        query: The search query
+
+    Returns:
+        Tuple[Optional[float], Optional[float]]: (minimum, maximum) in dollars, either may be None
+    """
+    match = AMOUNT_RANGE.search(query)
+    if match:
+        return parse_money(match, 1), parse_money(match, 3)
+
+    min_amount = max_amount = None
+    match = AMOUNT_MIN.search(query)
+    if match:
+        min_amount = parse_money(match, 1)
+    match = AMOUNT_MAX.search(query)
+    if match:
+        max_amount = parse_money(match, 1)
+    return min_amount, max_amount
+
+def extract_query_filters(query: str, today: Optional[date] = None) -> QueryFilters:
+    """
+    Pull date ranges, agencies and dollar thresholds out of a natural language query
+
+    Args:
+        query: The search query, e.g. "Navy contracts over $100M last week"
+        today: Reference date for relative phrases (defaults to today)
+
+    Returns:
+        QueryFilters: The constraints found; empty if the query has none
+    """
+    date_from, date_to = extract_date_range(query, today or date.today())
+    min_amount, max_amount = extract_amount_range(query)
+
+    return QueryFilters(
+        date_from=date_from,
+        date_to=date_to,
+        sections=extract_sections(query),
+        min_amount=min_amount,
+        max_amount=max_amount,
+    )
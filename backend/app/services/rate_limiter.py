@@ -0,0 +1,354 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import (
+    GEMINI_REQUESTS_PER_MINUTE,
+    GEMINI_TOKENS_PER_MINUTE,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_MIN_CONCURRENCY,
+    GEMINI_MAX_RETRIES,
+    GEMINI_BACKOFF_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower values are admitted first
+INTERACTIVE = 0  # User-facing search
+BACKGROUND = 1   # Ingest and backfills
+
+LANE_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# HTTP statuses that mean "slow down and try again"
+THROTTLE_STATUSES = {429, 503}
+RETRYABLE_STATUSES = THROTTLE_STATUSES | {500, 502, 504}
+
+# Seconds after a backoff during which further throttles don't shrink the limit again
+DECREASE_COOLDOWN = 1.0
+
+# Slots background calls may not take, so a search never waits behind a full ingest
+INTERACTIVE_RESERVED_SLOTS = 1
+
+def error_status(error: BaseException) -> Optional[int]:
+    """
+    Extract the HTTP status from a Gemini client error
+
+    Args:
+        error: The exception raised by the client
+
+    Returns:
+        Optional[int]: The status code, or None if the error carries none
+    """
+    for attribute in ("code", "status_code", "status"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    message = str(error)
+    if "RESOURCE_EXHAUSTED" in message:
+        return 429
+    if "UNAVAILABLE" in message:
+        return 503
+    return None
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether a failed call is worth retrying (throttling or a transient server error)
+    """
+    return error_status(error) in RETRYABLE_STATUSES or isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for quota accounting (about four characters per token)
+    """
+    return max(1, len(text) // 4)
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            per_minute: Refill rate; 0 disables the limit
+            capacity: Burst size; defaults to one second's worth, since a full
+                minute's quota sent at once is throttled server-side anyway
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` tokens are available (0 if they are now)
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        # A request larger than the bucket can still go once the bucket is full
+        needed = min(amount, self.capacity) - self.tokens
+        return 0.0 if needed <= 0 else needed / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.rate > 0:
+            self._refill(time.monotonic())
+            self.tokens -= min(amount, self.capacity)
+
+class AdaptiveRateLimiter:
+    """
+    Client-side admission control for Gemini calls
+
+    Requests wait for a slot in priority order (interactive search before
+    background ingest) and are admitted only when the requests-per-minute and
+    tokens-per-minute buckets allow it. The number of concurrent calls adapts
+    with AIMD: it grows by one for every `limit` successful calls and halves
+    when Gemini answers 429 or 503. Throttled and transient failures are
+    retried with exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = GEMINI_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = GEMINI_TOKENS_PER_MINUTE,
+        max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+        min_concurrency: int = GEMINI_MIN_CONCURRENCY,
+        max_retries: int = GEMINI_MAX_RETRIES,
+        backoff_seconds: float = GEMINI_BACKOFF_SECONDS,
+    ):
+        """
+        Args:
+            requests_per_minute: Request quota (0 = unlimited)
+            tokens_per_minute: Token quota (0 = unlimited)
+            max_concurrency: Upper bound for concurrent calls
+            min_concurrency: Lower bound the limit never shrinks below
+            max_retries: Retries per call after a retryable failure
+            backoff_seconds: Base backoff; doubled per retry, with full jitter
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_decrease = 0.0
+
+        self.calls = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.wait_seconds = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], priority: int = INTERACTIVE, tokens: int = 1) -> Any:
+        """
+        Run a Gemini call under the rate limits, retrying throttled or transient failures
+
+        Args:
+            fn: Makes the call; invoked once per attempt
+            priority: INTERACTIVE or BACKGROUND
+            tokens: Estimated tokens the call consumes
+
+        Returns:
+            The call's result
+
+        Raises:
+            The last error once retries are exhausted, or any non-retryable error
+        """
+        attempt = 0
+        while True:
+            async with self.slot(priority, tokens):
+                try:
+                    result = await fn()
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        self.failures += 1
+                        if error_status(e) in THROTTLE_STATUSES:
+                            self._on_throttle()
+                        raise
+                    if error_status(e) in THROTTLE_STATUSES:
+                        self._on_throttle()
+                    error = e
+                else:
+                    self._on_success()
+                    return result
+
+            attempt += 1
+            self.retries += 1
+            delay = random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1))
+            logger.warning(
+                f"Gemini call failed ({str(error)[:120]}), retry {attempt}/{self.max_retries} "
+                f"in {delay:.2f}s ({LANE_NAMES[priority]} lane)"
+            )
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE, tokens: int = 1):
+        """
+        Hold one admitted call slot for the duration of the block
+
+        Args:
+            priority: INTERACTIVE or BACKGROUND
+            tokens: Estimated tokens the call consumes
+        """
+        await self.acquire(priority, tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: int = INTERACTIVE, tokens: int = 1) -> None:
+        """
+        Wait until a call may start, in priority order
+
+        Args:
+            priority: INTERACTIVE or BACKGROUND
+            tokens: Estimated tokens the call consumes
+        """
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), tokens, future))
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller gave up: hand the slot back
+                self.release()
+            else:
+                future.cancel()
+                self._dispatch()
+            raise
+
+        self.calls[priority] += 1
+        self.wait_seconds[priority] += time.monotonic() - started
+
+    def release(self) -> None:
+        """
+        Return a slot taken by acquire
+        """
+        self.in_flight -= 1
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Describe the current limit, queue and counters
+
+        Returns:
+            Dict: Concurrency limit, in-flight and queued calls, and per-lane counters
+        """
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": sum(1 for *_, future in self._waiters if not future.done()),
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "failures": self.failures,
+            "lanes": {
+                LANE_NAMES[lane]: {
+                    "calls": self.calls[lane],
+                    "mean_wait_ms": 1000 * self.wait_seconds[lane] / self.calls[lane] if self.calls[lane] else 0.0,
+                }
+                for lane in (INTERACTIVE, BACKGROUND)
+            },
+        }
+
+    def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._timer_loop is not loop:
+            # A timer from an earlier event loop (e.g. a previous CLI run) will never fire
+            self._timer = None
+
+        # Admit waiters in priority order while concurrency and both buckets allow
+        while self._waiters:
+            priority, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            limit = int(self.limit)
+            if priority != INTERACTIVE and limit > INTERACTIVE_RESERVED_SLOTS:
+                limit -= INTERACTIVE_RESERVED_SLOTS
+            if self.in_flight >= limit:
+                return
+
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                # Check again when the buckets will have refilled enough
+                if self._timer is None:
+                    self._timer = loop.call_later(wait, self._on_timer)
+                    self._timer_loop = loop
+                return
+
+            heapq.heappop(self._waiters)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _on_success(self) -> None:
+        # Additive increase: about +1 per `limit` successful calls
+        self.limit = min(float(self.max_concurrency), self.limit + 1.0 / max(self.limit, 1.0))
+        self._dispatch()
+
+    def _on_throttle(self) -> None:
+        self.throttled += 1
+        now = time.monotonic()
+        # A burst of throttles from calls already in flight counts as one signal
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        previous = int(self.limit)
+        self.limit = max(float(self.min_concurrency), self.limit / 2)
+        logger.warning(f"Gemini throttled, concurrency limit {previous} -> {int(self.limit)}")
+
+_limiter: Optional[AdaptiveRateLimiter] = None
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """
+    Return the process-wide Gemini rate limiter
+
+    Returns:
+        AdaptiveRateLimiter: The shared limiter
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = AdaptiveRateLimiter()
+    return _limiter
+
+def share_quota(processes: int) -> None:
+    """
+    Limit this process to an equal share of the Gemini quota
+
+    Each of `processes` worker processes using the same API key calls this
+    before its first Gemini call, so together they stay under the quota.
+
+    Args:
+        processes: Processes sharing the quota
+    """
+    global _limiter
+    processes = max(1, processes)
+    _limiter = AdaptiveRateLimiter(
+        requests_per_minute=GEMINI_REQUESTS_PER_MINUTE / processes,
+        tokens_per_minute=GEMINI_TOKENS_PER_MINUTE / processes
+    )
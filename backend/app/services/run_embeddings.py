@@ -1,9 +1,27 @@
+import argparse
 import asyncio
-from app.routes.contracts import process_contract_embeddings
+from datetime import date, datetime
+from typing import Optional
+from app.routes.contracts import process_contract_embeddings, replay_archived_articles
 
-async def main():
-    result = await process_contract_embeddings()
+async def main(full: bool = False, replay: bool = False, end: Optional[date] = None):
+    result = await process_contract_embeddings(full=full, replay=replay, end=end)
     print(f"Embedding process completed with result: {result}")
 
+async def replay_all(full: bool = False, since: Optional[date] = None):
+    since_time = datetime.combine(since, datetime.min.time()).timestamp() if since else None
+    result = await replay_archived_articles(full=full, since=since_time)
+    print(f"Archive replay completed with result: {result}")
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape recent contracts and store their embeddings")
+    parser.add_argument("--full", action="store_true", help="Ignore the ingest state and re-process every article")
+    parser.add_argument("--replay", action="store_true", help="Re-parse the week's pages from the HTML archive instead of fetching them")
+    parser.add_argument("--end-date", type=date.fromisoformat, help="Last day of the week to process (YYYY-MM-DD), default yesterday")
+    parser.add_argument("--replay-all", action="store_true", help="Re-parse every archived article instead of one week")
+    parser.add_argument("--since", type=date.fromisoformat, help="With --replay-all, only articles fetched on or after this day")
+    args = parser.parse_args()
+    if args.replay_all:
+        asyncio.run(replay_all(full=args.full, since=args.since))
+    else:
+        asyncio.run(main(full=args.full, replay=args.replay, end=args.end_date))
@@ -1,21 +1,140 @@
 import requests
-from bs4 import BeautifulSoup
-from typing import Dict, List, Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+from app.config import DEFENSE_GOV_BASE_URL, SCRAPER_HTML_PARSER
+from app.services.awards import is_award_paragraph, parse_award
+
+# Optional dependency: lxml's C parser is several times faster than html.parser
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Parser used for defense.gov pages ("auto" picks lxml when it is installed)
+HTML_PARSER = ("lxml" if LXML_AVAILABLE else "html.parser") if SCRAPER_HTML_PARSER == "auto" else SCRAPER_HTML_PARSER
+
+# Browser-like headers sent with every defense.gov request
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Mobile Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+def article_id_from_url(url: str) -> str:
+    """
+    Get the defense.gov article ID from an article URL
+    
+    Args:
+        url: An article URL such as https://www.defense.gov/News/Contracts/Contract/Article/4076032/
+        
+    Returns:
+        str: The last path segment of the URL (e.g. "4076032")
+    """
+    return url.split("/")[-2] if url.split("/")[-1] == "" else url.split("/")[-1]
+
+def extract_contract_links(html: str, base_url: str = DEFENSE_GOV_BASE_URL) -> List[str]:
+    """
+    Extract the contract article links from a defense.gov contracts listing page
+    
+    Args:
+        html: The HTML of the listing page
+        base_url: Base URL used to absolutize relative article links
+        
+    Returns:
+        List[str]: Absolute article URLs in listing order
+    """
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=LISTING_STRAINER)
+    contract_links = []
+
+    for elem in soup.find_all("listing-titles-only"):
+        # Try to get the absolute URL attribute first
+        url = elem.get("article-url-or-link-absolute")
+        # Fallback to relative URL if needed
+        if not url:
+            url = elem.get("article-url-or-link")
+            if url and not url.startswith("http"):
+                url = f"{base_url}{url}"
+        
+        # Extract the publish date for constructing the title if needed
+        publish_date = elem.get("publish-date-ap", "").strip()
+        # Sometimes article-title may be empty for contracts, so we build a title
+        title = elem.get("article-title", "").strip()
+        if not title and publish_date:
+            title = f"Contracts For {publish_date}"
+        
+        if url:
+            print(f"Found contract: {title} at {url}")
+            contract_links.append(url)
+
+    return contract_links
+
+def contracts_listing_url(start_date: str, end_date: str, page: int = 1, base_url: str = DEFENSE_GOV_BASE_URL) -> str:
+    """
+    Build the URL of a defense.gov contracts listing page for a date range
+    
+    Args:
+        start_date: First day (YYYY-MM-DD)
+        end_date: Last day (YYYY-MM-DD)
+        page: 1-based listing page number
+        base_url: defense.gov base URL
+        
+    Returns:
+        str: The listing URL
+    """
+    url = f"{base_url}/News/Contracts/StartDate/{start_date}/EndDate/{end_date}/"
+    return url if page <= 1 else f"{url}?Page={page}"
+
+def extract_next_page_url(html: str, page_url: str) -> Optional[str]:
+    """
+    Find the link to the next page of a contracts listing
+    
+    Args:
+        html: The HTML of the listing page
+        page_url: The URL the page was fetched from, used to absolutize the link
+        
+    Returns:
+        Optional[str]: The next page's absolute URL, or None if the page has no next link
+    """
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=LINK_STRAINER)
+    
+    for link in soup.find_all("a", href=True):
+        classes = " ".join(link.get("class", [])).lower()
+        label = (link.get("aria-label") or link.get_text(strip=True)).lower()
+        if "next" in link.get("rel", []) or "next" in classes or label.startswith("next") or label in ("›", "»"):
+            return urljoin(page_url, link["href"])
+    return None
+
+def _is_article_part(class_value: Optional[str]) -> bool:
+    # Matches class="maintitle" and class="body" the way find(class_=...) does, as one of several classes
+    return bool(class_value) and any(name in ("maintitle", "body") for name in class_value.split())
+
+# Only the title and the article body are built into a tree; the site chrome around them is skipped
+ARTICLE_STRAINER = SoupStrainer(attrs={"class": _is_article_part})
+LISTING_STRAINER = SoupStrainer("listing-titles-only")
+LINK_STRAINER = SoupStrainer("a", href=True)
 
 class ContractScraper:
     """
     A class to scrape DoD contract information from defense.gov
     """
     
-    def __init__(self, url: Optional[str] = None):
+    def __init__(self, url: Optional[str] = None, parser: str = HTML_PARSER):
         """
         Initialize the scraper with an optional URL
         
         Args:
             url: The URL of the contract page to scrape
+            parser: BeautifulSoup parser ("lxml" or "html.parser")
         """
         self.url = url
+        self.parser = parser
         self.soup = None
+        self._paragraphs = None
         
     def set_url(self, url: str) -> None:
         """
@@ -26,6 +145,7 @@ class ContractScraper:
         """
         self.url = url
         self.soup = None  # Reset the soup when URL changes
+        self._paragraphs = None
         
     def fetch_page(self) -> bool:
         """
@@ -38,26 +158,61 @@ class ContractScraper:
             print("No URL provided")
             return False
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Mobile Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-            
         try:
-            response = requests.get(self.url, headers=headers)
+            response = requests.get(self.url, headers=DEFAULT_HEADERS)
             if response.status_code != 200:
                 print(f"Failed to retrieve the webpage. Status code: {response.status_code}")
                 return False
                 
-            self.soup = BeautifulSoup(response.text, 'html.parser')
+            self.load_html(response.text)
             return True
         except Exception as e:
             print(f"Error fetching page: {str(e)}")
             return False
     
+    def load_html(self, html: str) -> None:
+        """
+        Parse already-fetched HTML so the extract methods can run without a network call
+        
+        Only the title and body subtrees are parsed into the tree.
+        
+        Args:
+            html: The HTML of a contract article page
+        """
+        self.soup = BeautifulSoup(html, self.parser, parse_only=ARTICLE_STRAINER)
+        self._paragraphs = None
+    
+    def parse(self, html: str) -> Dict:
+        """
+        Parse already-fetched HTML and return structured data
+        
+        The tree is released once the data is extracted: its nodes reference
+        each other, so otherwise it stays in memory until the garbage
+        collector next runs, which adds up while an ingest parses hundreds
+        of pages.
+        
+        Args:
+            html: The HTML of a contract article page
+            
+        Returns:
+            Dict: Dictionary containing the contract date, sections with their content and award records
+        """
+        self.load_html(html)
+        
+        try:
+            return {
+                "date": self.extract_contract_date(),
+                "sections": self.extract_sections(),
+                "awards": self.extract_awards()
+            }
+        finally:
+            # Decomposing the soup object alone leaves its children intact
+            for element in list(self.soup.contents):
+                element.decompose()
+            self.soup.decompose()
+            self.soup = None
+            self._paragraphs = None
+    
     def extract_contract_date(self) -> str:
         """
         Extract and format the contract date from the page title
@@ -75,7 +230,6 @@ class ContractScraper:
         title_text = maintitle.get_text(strip=True)
         # Convert date formats like "Contracts For Feb. 24, 2025" or "Contracts For March 14, 2025" to "2025-02-24"
         try:
-            from datetime import datetime
             date_str = title_text.replace("Contracts For ", "")
             
             # Try different date formats
@@ -102,6 +256,32 @@ class ContractScraper:
             print(f"Error parsing date: {str(e)}")
             return "Unknown Date"
     
+    def _body_paragraphs(self) -> List[Tuple[Optional[str], str]]:
+        """
+        Walk the body's <p> tags once, for both extract_sections and extract_awards
+        
+        Returns:
+            List[Tuple[Optional[str], str]]: (section name, "") for each section header
+                and (None, text) for every other paragraph, in page order
+        """
+        if self._paragraphs is not None:
+            return self._paragraphs
+        
+        paragraphs = []
+        body_div = self.soup.find('div', class_='body') if self.soup else None
+        
+        for p in body_div.find_all('p') if body_div else []:
+            # A section header is centered text with a <strong> tag
+            if p.has_attr('style') and 'text-align: center' in p['style']:
+                strong_tag = p.find('strong')
+                if strong_tag:
+                    paragraphs.append((strong_tag.get_text(strip=True), ""))
+            else:
+                paragraphs.append((None, p.get_text(strip=True)))
+        
+        self._paragraphs = paragraphs
+        return paragraphs
+    
     def extract_sections(self) -> Dict[str, str]:
         """
         Extract all sections and their paragraphs from the contract page
@@ -109,36 +289,52 @@ class ContractScraper:
         Returns:
             Dict[str, str]: Dictionary with section names as keys and concatenated text as values
         """
-        sections = {}
+        sections: Dict[str, List[str]] = {}
+        current_section = None
         
-        if not self.soup:
-            return sections
-            
-        body_div = self.soup.find('div', class_='body')
-        if not body_div:
-            return sections
-            
+        for header, text in self._body_paragraphs():
+            if header is not None:
+                current_section = header
+                sections[current_section] = []
+            elif current_section and text:  # Only add non-empty paragraphs
+                sections[current_section].append(text)
+        
+        # Joined once per section rather than concatenated paragraph by paragraph
+        return {name: " ".join(texts) for name, texts in sections.items()}
+    
+    def extract_awards(self) -> List[Dict]:
+        """
+        Extract one structured record per contract award
+        
+        Each award paragraph under a section header becomes a record with the
+        awardee, location, amount, contract number, completion date and
+        contracting activity. Paragraphs that don't start a new award (e.g.
+        follow-on details) are appended to the previous award's text.
+        
+        Returns:
+            List[Dict]: Award records in page order (see awards.parse_award)
+        """
+        paragraphs = []  # (section, texts) of each award, in page order
         current_section = None
         
-        # Loop through all <p> tags in the body
-        for p in body_div.find_all('p'):
-            # Check if the <p> tag is a section header (centered text with a <strong> tag)
-            if p.has_attr('style') and 'text-align: center' in p['style']:
-                strong_tag = p.find('strong')
-                if strong_tag:
-                    current_section = strong_tag.get_text(strip=True)
-                    sections[current_section] = ""
+        for header, text in self._body_paragraphs():
+            if header is not None:
+                current_section = header
+                continue
+                
+            if not current_section:
+                continue
+                
+            # Skip empty paragraphs and the "*Small business" footnote
+            if not text or text.lstrip("*").strip().lower() == "small business":
+                continue
+                
+            if is_award_paragraph(text) or not paragraphs or paragraphs[-1][0] != current_section:
+                paragraphs.append((current_section, [text]))
             else:
-                # Add the paragraph text to the current section's content
-                if current_section:
-                    text = p.get_text(strip=True)
-                    if text:  # Only add non-empty paragraphs
-                        # If there's already text, add a space before appending
-                        if sections[current_section]:
-                            sections[current_section] += " "
-                        sections[current_section] += text
-        
-        return sections
+                paragraphs[-1][1].append(text)
+        
+        return [parse_award(" ".join(texts), section) for section, texts in paragraphs]
     
     def scrape(self, url: Optional[str] = None) -> Dict:
         """
@@ -148,7 +344,7 @@ class ContractScraper:
             url: Optional URL to scrape (will use the instance URL if not provided)
             
         Returns:
-            Dict: Dictionary containing the contract date and sections with their content
+            Dict: Dictionary containing the contract date, sections with their content and award records
         """
         if url:
             self.set_url(url)
@@ -158,10 +354,12 @@ class ContractScraper:
             
         contract_date = self.extract_contract_date()
         sections = self.extract_sections()
+        awards = self.extract_awards()
         
         return {
             "date": contract_date,
-            "sections": sections
+            "sections": sections,
+            "awards": awards
         }
 
 
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """
+    One in-flight execution shared by every caller with the same key
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        # Streaming flights buffer every event so late subscribers can replay them
+        self.events: List[Any] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent operations into one execution
+
+    The first caller for a key starts the operation; callers arriving while it
+    is still running wait for the same result instead of starting their own.
+    Streaming operations are fanned out to every subscriber, and a subscriber
+    that joins late first receives the events it missed. The operation is
+    cancelled once every caller waiting on it has gone away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.stream_executions = 0
+        self.stream_coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key: Identifies identical operations
+            fn: Starts the operation; only called by the first caller
+
+        Returns:
+            The operation's result (exceptions are raised to every caller)
+        """
+        flight_key = f"do:{key}"
+        flight = self._flights.get(flight_key)
+
+        if flight is None:
+            flight = self._flights[flight_key] = _Flight()
+            flight.task = asyncio.create_task(fn())
+            flight.task.add_done_callback(lambda _: self._finish(flight_key, flight))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        flight.subscribers += 1
+        try:
+            # Shield so one caller's cancellation doesn't cancel the shared task
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.subscribers -= 1
+            self._cancel_if_abandoned(flight_key, flight)
+
+    async def stream(self, key: str, fn: Callable[[], AsyncGenerator[Any, None]]) -> AsyncGenerator[Any, None]:
+        """
+        Fan one async generator out to all concurrent subscribers with the same key
+
+        Args:
+            key: Identifies identical operations
+            fn: Creates the generator; only called by the first subscriber
+
+        Yields:
+            Every event the shared generator produces, from the first one
+        """
+        flight_key = f"stream:{key}"
+        flight = self._flights.get(flight_key)
+
+        if flight is None:
+            flight = self._flights[flight_key] = _Flight()
+            flight.task = asyncio.create_task(self._produce(flight_key, flight, fn()))
+            self.stream_executions += 1
+        else:
+            self.stream_coalesced += 1
+
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: position < len(flight.events) or flight.finished)
+                    events = flight.events[position:]
+                    finished = flight.finished
+
+                for event in events:
+                    yield event
+                position += len(events)
+
+                if finished and position >= len(flight.events):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            flight.subscribers -= 1
+            self._cancel_if_abandoned(flight_key, flight)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Describe how many operations ran and how many callers shared them
+
+        Returns:
+            Dict: Execution and coalescing counters and current in-flight operations
+        """
+        return {
+            "in_flight": len(self._flights),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "stream_executions": self.stream_executions,
+            "stream_coalesced": self.stream_coalesced,
+            "cancelled": self.cancelled,
+        }
+
+    async def _produce(self, flight_key: str, flight: _Flight, generator: AsyncGenerator[Any, None]) -> None:
+        try:
+            async for event in generator:
+                async with flight.changed:
+                    flight.events.append(event)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            await generator.aclose()
+            self._finish(flight_key, flight)
+            async with flight.changed:
+                flight.finished = True
+                flight.changed.notify_all()
+
+    def _finish(self, flight_key: str, flight: _Flight) -> None:
+        # New callers start a fresh execution once this one is done
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+
+    def _cancel_if_abandoned(self, flight_key: str, flight: _Flight) -> None:
+        if flight.subscribers == 0 and flight.task and not flight.task.done():
+            logger.info("All callers of a shared search went away, cancelling it")
+            # Forget the flight first so a caller arriving now starts a fresh
+            # execution instead of joining the cancelled one
+            self._finish(flight_key, flight)
+            flight.task.cancel()
+            self.cancelled += 1
+
+# Shared by the search routes
+search_flights = SingleFlight()
@@ -0,0 +1,213 @@
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from app.config import TRACE_SLOW_SECONDS
+from app.services.metrics import HTTP_REQUEST_SECONDS, OPERATION_SECONDS, STAGE_FAILURES, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+
+# Trace IDs accepted from callers; anything else gets a fresh ID
+TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+_trace_id: ContextVar[str] = ContextVar("trace_id", default="-")
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def current_trace_id() -> str:
+    """
+    The trace ID of the request or job being handled, or "-" outside of one
+    """
+    return _trace_id.get()
+
+def bind_trace_id(trace_id: str) -> None:
+    """
+    Use `trace_id` for the rest of the current task, e.g. a background job's ID
+    """
+    _trace_id.set(trace_id)
+
+class Span:
+    """
+    Timing of one stage; `seconds` is set when the stage ends
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+
+class Trace:
+    """
+    Stage timings of one search, stream or ingest, summed per stage name
+    """
+
+    def __init__(self, operation: str, trace_id: str):
+        self.operation = operation
+        self.id = trace_id
+        self.started = time.perf_counter()
+        self.failed = False
+        self._lock = threading.Lock()
+        # Stage name -> [runs, total seconds], in the order stages first ran
+        self.stages: Dict[str, List[float]] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def mark_failed(self) -> None:
+        """
+        Count the operation as failed even though it returned normally (e.g. it sent an error event)
+        """
+        self.failed = True
+
+    def summary(self) -> str:
+        with self._lock:
+            stages = list(self.stages.items())
+        return ", ".join(
+            f"{name} {1000 * seconds:.0f} ms" if runs == 1 else f"{name} {int(runs)}x {1000 * seconds:.0f} ms"
+            for name, (runs, seconds) in stages
+        )
+
+@contextmanager
+def trace(operation: str) -> Iterator[Trace]:
+    """
+    Trace one search, stream or ingest: stages run inside the block are recorded against it
+
+    The trace keeps the ID of the request or job it runs in, or gets a new one.
+    When the block ends its duration is recorded and one log line lists the
+    time spent in each stage, at warning level if it took TRACE_SLOW_SECONDS
+    or longer.
+
+    Args:
+        operation: What is traced ("search", "stream", "ingest", ...)
+
+    Yields:
+        Trace: The active trace
+    """
+    trace_id = _trace_id.get()
+    active = Trace(operation, trace_id if trace_id != "-" else new_trace_id())
+    tokens = (_trace.set(active), _trace_id.set(active.id))
+    outcome = "ok"
+    try:
+        yield active
+    except Exception:
+        outcome = "error"
+        raise
+    except BaseException:
+        outcome = "cancelled"
+        raise
+    finally:
+        if outcome == "ok" and active.failed:
+            outcome = "error"
+        elapsed = time.perf_counter() - active.started
+        OPERATION_SECONDS.observe(elapsed, operation=operation, outcome=outcome)
+        level = logging.WARNING if TRACE_SLOW_SECONDS and elapsed >= TRACE_SLOW_SECONDS else logging.INFO
+        logger.log(level, f"{operation} {outcome} in {1000 * elapsed:.0f} ms: {active.summary() or 'no stages'}")
+        for var, token in zip((_trace, _trace_id), tokens):
+            try:
+                var.reset(token)
+            except ValueError:
+                # An async generator finalized from another context; that context never saw the trace
+                pass
+
+@contextmanager
+def stage(name: str) -> Iterator[Span]:
+    """
+    Time one stage of the current trace and record it in the stage histogram
+
+    Stages may nest and may run concurrently; each is recorded on its own.
+    A stage that raises is also counted as a failure.
+
+    Args:
+        name: The stage, e.g. "embed_query" or "upsert"
+
+    Yields:
+        Span: Holds the stage's duration once the block ends
+    """
+    span = Span(name)
+    started = time.perf_counter()
+    try:
+        yield span
+    except Exception:
+        active = _trace.get()
+        STAGE_FAILURES.inc(operation=active.operation if active else "none", stage=name)
+        raise
+    finally:
+        span.seconds = time.perf_counter() - started
+        record_stage(name, span.seconds)
+
+def record_stage(name: str, seconds: float) -> None:
+    """
+    Record a stage timed by the caller, for stages that don't fit a with block
+
+    Args:
+        name: The stage
+        seconds: How long it took
+    """
+    active = _trace.get()
+    STAGE_SECONDS.observe(seconds, operation=active.operation if active else "none", stage=name)
+    if active:
+        active.record(name, seconds)
+
+class TraceIdFilter(logging.Filter):
+    """
+    Add the current trace ID to every log record as `trace_id`
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get()
+        return True
+
+class TraceMiddleware:
+    """
+    ASGI middleware giving every HTTP request a trace ID and recording its latency
+
+    The ID is taken from the request's X-Trace-Id header when it looks valid
+    and is returned in the response's X-Trace-Id header. Latency is measured
+    until the last byte of the body is sent, so streamed responses are timed
+    in full, and labelled with the route's path template to keep the number
+    of series bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(TRACE_HEADER.lower().encode("latin-1"), b"").decode("latin-1")
+        trace_id = incoming if TRACE_ID_PATTERN.match(incoming) else new_trace_id()
+        token = _trace_id.set(trace_id)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_trace_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", trace_id.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope.get("method", ""),
+                path=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
+            _trace_id.reset(token)
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.config import VECTOR_INDEX_HEALTH_INTERVAL, VECTOR_INDEX_HEALTH_TIMEOUT
+from app.services.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# First reconnect attempt after a failure; doubled per failure up to the health interval
+RECONNECT_BASE_DELAY = 1.0
+
+class IndexManager:
+    """
+    Owns one long-lived vector index handle for the whole process
+
+    The handle is created and warmed up once (at app startup when running
+    under FastAPI, or lazily on first use), health-checked in the background,
+    and replaced when it fails.
+    """
+
+    def __init__(
+        self,
+        connect_fn: Callable[[], Any],
+        health_interval: float = VECTOR_INDEX_HEALTH_INTERVAL,
+        health_timeout: float = VECTOR_INDEX_HEALTH_TIMEOUT,
+    ):
+        """
+        Initialize the manager without connecting
+
+        Args:
+            connect_fn: Blocking function that returns a new index handle
+            health_interval: Seconds between background health checks
+            health_timeout: Seconds before a health check counts as failed
+        """
+        self.connect_fn = connect_fn
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+
+        self._index = None
+        self._healthy = False
+        self._last_error: Optional[str] = None
+        self._last_check: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.reconnects = 0
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether a connected, healthy index handle is available
+        """
+        return self._index is not None and self._healthy
+
+    async def start(self) -> None:
+        """
+        Connect, warm up the index and start background health checks
+
+        A failed first connection is logged rather than raised so the app can
+        still start; the health loop keeps retrying and readiness reports it.
+        """
+        self._wake = asyncio.Event()
+
+        try:
+            await self.connect()
+            logger.info("Vector index connected and warmed up")
+        except Exception as e:
+            logger.error(f"Vector index unavailable at startup, will keep retrying: {str(e)}")
+
+        self._task = asyncio.create_task(self._health_loop())
+
+    async def stop(self) -> None:
+        """
+        Stop background health checks and drop the index handle
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Backends that buffer writes (the local index) persist them before exit
+        flush = getattr(self._index, "flush", None)
+        if flush:
+            try:
+                await run_blocking(flush)
+            except Exception as e:
+                logger.error(f"Error flushing vector index: {str(e)}")
+
+        self.invalidate()
+
+    async def connect(self, force: bool = False):
+        """
+        Create and warm up a new index handle unless a healthy one already exists
+
+        Args:
+            force: Replace the current handle even if it looks healthy
+
+        Returns:
+            The connected index handle
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            # Another caller may have connected while we waited for the lock
+            if self._index is not None and self._healthy and not force:
+                return self._index
+
+            try:
+                index = await run_blocking(self.connect_fn)
+                # Warm-up: the first call opens the channel so user queries don't pay for it
+                await asyncio.wait_for(run_blocking(index.describe_index_stats), self.health_timeout)
+            except Exception as e:
+                self._healthy = False
+                self._last_error = str(e)
+                raise
+
+            self._index = index
+            self._healthy = True
+            self._last_error = None
+            self._last_check = time.time()
+            return index
+
+    async def get_index(self):
+        """
+        Return the shared index handle, connecting first if there is none
+
+        Returns:
+            The index handle
+        """
+        if self._index is not None:
+            return self._index
+        return await self.connect()
+
+    async def check(self) -> bool:
+        """
+        Run a health check against the current handle
+
+        Returns:
+            bool: True if the index answered within the health timeout
+        """
+        index = self._index
+        if index is None:
+            return False
+
+        try:
+            await asyncio.wait_for(run_blocking(index.describe_index_stats), self.health_timeout)
+        except Exception as e:
+            self.report_failure(e)
+            return False
+
+        self._healthy = True
+        self._last_error = None
+        self._last_check = time.time()
+        return True
+
+    def report_failure(self, error: Exception) -> None:
+        """
+        Mark the handle unhealthy after a failed call so it gets replaced
+
+        Args:
+            error: The exception raised by the index call
+        """
+        logger.warning(f"Vector index call failed: {str(error)}")
+        self._healthy = False
+        self._last_error = str(error)
+
+        if self._task and self._wake:
+            # Let the health loop reconnect right away
+            self._wake.set()
+        else:
+            # No background loop (e.g. a CLI run): reconnect on next use
+            self._index = None
+
+    def invalidate(self) -> None:
+        """
+        Drop the current handle so the next use reconnects
+        """
+        self._index = None
+        self._healthy = False
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Describe the connection for the readiness endpoint
+
+        Returns:
+            Dict: Readiness, health, last error, last successful check and reconnect count
+        """
+        return {
+            "ready": self.ready,
+            "connected": self._index is not None,
+            "healthy": self._healthy,
+            "last_error": self._last_error,
+            "last_check": self._last_check,
+            "reconnects": self.reconnects
+        }
+
+    async def _health_loop(self) -> None:
+        failures = 0
+
+        while True:
+            delay = self.health_interval if failures == 0 else min(self.health_interval, RECONNECT_BASE_DELAY * 2 ** (failures - 1))
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            try:
+                if self._index is None or not self._healthy:
+                    await self.connect(force=True)
+                    self.reconnects += 1
+                    logger.info("Vector index reconnected")
+                elif not await self.check():
+                    failures += 1
+                    continue
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                logger.warning(f"Vector index reconnect attempt {failures} failed: {str(e)}")
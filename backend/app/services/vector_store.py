@@ -0,0 +1,388 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.metadata_filters import matches_filter
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class QueryMatch:
+    """
+    One query result, shaped like a Pinecone match
+    """
+    id: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    values: List[float] = field(default_factory=list)
+
+@dataclass
+class Vector:
+    """
+    A stored vector, shaped like a Pinecone fetch result entry
+    """
+    id: str
+    values: List[float]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class FetchResponse:
+    """
+    Fetch results, shaped like a Pinecone fetch response
+    """
+    vectors: Dict[str, Vector]
+    namespace: str = ""
+
+@dataclass
+class QueryResponse:
+    """
+    Query results, shaped like a Pinecone query response
+    """
+    matches: List[QueryMatch]
+    namespace: str = ""
+
+class _Namespace:
+    """
+    Vectors of one namespace: a contiguous, L2-normalized matrix plus ids and metadata
+    """
+
+    def __init__(self, dimension: int, dtype: np.dtype):
+        self.dimension = dimension
+        self.dtype = dtype
+        self.matrix = np.zeros((0, dimension), dtype=dtype)
+        self.size = 0
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.positions: Dict[str, int] = {}
+
+    def _reserve(self, rows: int) -> None:
+        # Grow geometrically so repeated upserts stay amortized O(1) per vector
+        if rows <= self.matrix.shape[0]:
+            return
+        capacity = max(rows, self.matrix.shape[0] * 2, 64)
+        grown = np.zeros((capacity, self.dimension), dtype=self.dtype)
+        grown[:self.size] = self.matrix[:self.size]
+        self.matrix = grown
+
+    def upsert(self, ids: List[str], values: np.ndarray, metadata: List[Dict[str, Any]]) -> None:
+        self._reserve(self.size + len(ids))
+
+        for vector_id, row, meta in zip(ids, values, metadata):
+            position = self.positions.get(vector_id)
+            if position is None:
+                position = self.size
+                self.size += 1
+                self.ids.append(vector_id)
+                self.metadata.append(meta)
+                self.positions[vector_id] = position
+            else:
+                self.metadata[position] = meta
+            self.matrix[position] = row
+
+    def delete(self, ids: List[str]) -> int:
+        deleted = 0
+        for vector_id in ids:
+            position = self.positions.pop(vector_id, None)
+            if position is None:
+                continue
+
+            # Move the last row into the hole to keep the matrix contiguous
+            last = self.size - 1
+            if position != last:
+                self.matrix[position] = self.matrix[last]
+                self.ids[position] = self.ids[last]
+                self.metadata[position] = self.metadata[last]
+                self.positions[self.ids[position]] = position
+            self.ids.pop()
+            self.metadata.pop()
+            self.size -= 1
+            deleted += 1
+        return deleted
+
+class LocalVectorIndex:
+    """
+    In-process vector index with the same upsert/query/delete interface as a Pinecone index
+
+    Vectors are stored L2-normalized in one contiguous float32 (or float16)
+    matrix per namespace, so a query is a single matrix-vector product
+    followed by a partial sort. The index is persisted to a directory and
+    reloaded when another process (e.g. a CLI ingest) writes a newer copy.
+    """
+
+    def __init__(self, path: Optional[str] = None, dtype: str = "float32"):
+        """
+        Open the index, loading any persisted namespaces
+
+        Args:
+            path: Directory to persist to, or None for a memory-only index
+            dtype: Storage dtype for vectors, "float32" or "float16"
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._dirty = False
+        self._loaded_mtime: Optional[float] = None
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = "", **kwargs) -> Dict[str, int]:
+        """
+        Insert vectors or replace existing vectors with the same ID
+
+        Args:
+            vectors: Dicts with "id", "values" and optional "metadata"
+            namespace: Namespace to write to
+
+        Returns:
+            Dict[str, int]: The number of vectors upserted
+        """
+        if not vectors:
+            return {"upserted_count": 0}
+
+        values = _normalize(np.asarray([vector["values"] for vector in vectors], dtype=np.float32))
+
+        with self._lock:
+            store = self._namespaces.get(namespace)
+            if store is None:
+                store = self._namespaces[namespace] = _Namespace(values.shape[1], self.dtype)
+            elif values.shape[1] != store.dimension:
+                raise ValueError(f"Vector dimension {values.shape[1]} does not match index dimension {store.dimension}")
+
+            store.upsert(
+                [vector["id"] for vector in vectors],
+                values.astype(self.dtype),
+                [dict(vector.get("metadata") or {}) for vector in vectors]
+            )
+            self._dirty = True
+
+        return {"upserted_count": len(vectors)}
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        namespace: str = "",
+        include_metadata: bool = False,
+        include_values: bool = False,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ) -> QueryResponse:
+        """
+        Return the top_k vectors by cosine similarity
+
+        Args:
+            vector: The query vector
+            top_k: Number of matches to return
+            namespace: Namespace to search
+            include_metadata: Include each match's metadata
+            include_values: Include each match's stored vector
+            filter: Optional Pinecone-style metadata filter
+
+        Returns:
+            QueryResponse: Matches ordered by descending score
+        """
+        with self._lock:
+            store = self._namespaces.get(namespace)
+            if store is None or store.size == 0 or top_k <= 0:
+                return QueryResponse(matches=[], namespace=namespace)
+
+            query = _normalize(np.asarray(vector, dtype=np.float32)[None, :])[0].astype(self.dtype)
+            scores = (store.matrix[:store.size] @ query).astype(np.float32)
+
+            if filter:
+                mask = np.fromiter(
+                    (matches_filter(meta, filter) for meta in store.metadata),
+                    dtype=bool,
+                    count=store.size
+                )
+                scores[~mask] = -np.inf
+                candidates = int(mask.sum())
+            else:
+                candidates = store.size
+
+            k = min(top_k, candidates)
+            if k == 0:
+                return QueryResponse(matches=[], namespace=namespace)
+
+            # Partial sort: only the top k scores need ordering
+            top = np.argpartition(-scores, k - 1)[:k] if k < store.size else np.arange(store.size)
+            top = top[np.argsort(-scores[top], kind="stable")][:k]
+
+            matches = [
+                QueryMatch(
+                    id=store.ids[i],
+                    score=float(scores[i]),
+                    metadata=dict(store.metadata[i]) if include_metadata else {},
+                    values=store.matrix[i].astype(np.float32).tolist() if include_values else []
+                )
+                for i in top
+            ]
+
+        return QueryResponse(matches=matches, namespace=namespace)
+
+    def fetch(self, ids: List[str], namespace: str = "", **kwargs) -> FetchResponse:
+        """
+        Return stored vectors and metadata by ID
+
+        Args:
+            ids: Vector IDs to look up
+            namespace: Namespace to read from
+
+        Returns:
+            FetchResponse: The vectors that exist, keyed by ID
+        """
+        vectors = {}
+        with self._lock:
+            store = self._namespaces.get(namespace)
+            if store:
+                for vector_id in ids:
+                    position = store.positions.get(vector_id)
+                    if position is not None:
+                        vectors[vector_id] = Vector(
+                            id=vector_id,
+                            values=store.matrix[position].astype(np.float32).tolist(),
+                            metadata=dict(store.metadata[position])
+                        )
+        return FetchResponse(vectors=vectors, namespace=namespace)
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: str = "", delete_all: bool = False, **kwargs) -> Dict:
+        """
+        Delete vectors by ID, or every vector in a namespace
+
+        Args:
+            ids: Vector IDs to delete
+            namespace: Namespace to delete from
+            delete_all: Delete the whole namespace
+
+        Returns:
+            Dict: Empty dict, like Pinecone
+        """
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+                self._dirty = True
+            elif ids and namespace in self._namespaces:
+                if self._namespaces[namespace].delete(ids):
+                    self._dirty = True
+        return {}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        """
+        Report vector counts per namespace
+
+        Also reloads the index if another process persisted a newer copy,
+        which lets the API pick up vectors written by a CLI ingest.
+
+        Returns:
+            Dict: Dimension, total vector count and per-namespace counts
+        """
+        self._reload_if_changed()
+
+        with self._lock:
+            namespaces = {name: {"vector_count": store.size} for name, store in self._namespaces.items()}
+            dimension = next((store.dimension for store in self._namespaces.values()), 0)
+
+        return {
+            "dimension": dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values())
+        }
+
+    def flush(self) -> None:
+        """
+        Persist the index to disk if it changed since the last flush
+        """
+        if not self.path:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+
+            for name in list(os.listdir(self.path)):
+                if name.endswith(".npy") or name.endswith(".json"):
+                    namespace = _decode_namespace(name.rsplit(".", 1)[0])
+                    if namespace not in self._namespaces:
+                        os.remove(os.path.join(self.path, name))
+
+            for namespace, store in self._namespaces.items():
+                base = os.path.join(self.path, _encode_namespace(namespace))
+                # Write to temporary files and rename so readers never see partial files
+                with open(base + ".npy.tmp", "wb") as f:
+                    np.save(f, store.matrix[:store.size])
+                with open(base + ".json.tmp", "w", encoding="utf-8") as f:
+                    json.dump({"ids": store.ids, "metadata": store.metadata}, f)
+                os.replace(base + ".npy.tmp", base + ".npy")
+                os.replace(base + ".json.tmp", base + ".json")
+
+            self._touch_manifest()
+            self._dirty = False
+
+        logger.info(f"Persisted local vector index to {self.path}")
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, "MANIFEST")
+
+    def _touch_manifest(self) -> None:
+        with open(self._manifest_path(), "w", encoding="utf-8") as f:
+            json.dump({"namespaces": sorted(self._namespaces)}, f)
+        self._loaded_mtime = os.path.getmtime(self._manifest_path())
+
+    def _reload_if_changed(self) -> None:
+        if not self.path or not os.path.exists(self._manifest_path()):
+            return
+        if os.path.getmtime(self._manifest_path()) != self._loaded_mtime:
+            with self._lock:
+                if self._dirty:
+                    # Local unsaved writes win; they'll be persisted on the next flush
+                    return
+                self._load()
+                logger.info("Reloaded local vector index after an external update")
+
+    def _load(self) -> None:
+        if not os.path.exists(self._manifest_path()):
+            return
+
+        with open(self._manifest_path(), encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        namespaces = {}
+        for namespace in manifest.get("namespaces", []):
+            base = os.path.join(self.path, _encode_namespace(namespace))
+            matrix = np.load(base + ".npy").astype(self.dtype)
+            with open(base + ".json", encoding="utf-8") as f:
+                data = json.load(f)
+
+            store = _Namespace(matrix.shape[1] if matrix.ndim == 2 else 0, self.dtype)
+            store.matrix = matrix
+            store.size = matrix.shape[0]
+            store.ids = data["ids"]
+            store.metadata = data["metadata"]
+            store.positions = {vector_id: i for i, vector_id in enumerate(store.ids)}
+            namespaces[namespace] = store
+
+        self._namespaces = namespaces
+        self._loaded_mtime = os.path.getmtime(self._manifest_path())
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _encode_namespace(namespace: str) -> str:
+    # Namespaces become file names; "" is Pinecone's default namespace
+    return "ns-" + namespace.encode("utf-8").hex()
+
+def _decode_namespace(name: str) -> str:
+    return bytes.fromhex(name[3:]).decode("utf-8") if name.startswith("ns-") else name
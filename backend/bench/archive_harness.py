@@ -0,0 +1,227 @@
+"""
+Harness for the raw HTML archive and offline replay
+
+Ingests a week of synthetic articles from the local defense.gov stand-in
+into the fake Gemini and Pinecone clients with archiving on, then replays
+the same week from the archive. It checks that:
+
+- every fetched listing and article is archived, identical pages are stored
+  once, and they are stored compressed
+- a replay makes no requests and stores exactly the vectors the live run stored
+- replaying every archived article re-parses all of them instead of
+  skipping them on their article hash, and embeds nothing when the records
+  are unchanged
+- bumping EXTRACTOR_VERSION makes the next live ingest download and
+  re-process every article instead of skipping it on a 304
+- the first ingest of an article the ingest state has no record of deletes
+  the one-vector-per-section IDs stored before awards were split out, and
+  keeps a section stored under that ID because it has no awards
+- re-parsing full-size archived pages is about as fast as parsing them from
+  memory, across HTML_ARCHIVE_PARSE_WORKERS processes (each rate is the best
+  of three runs after a warm-up)
+
+The archive and state files are written to a temporary directory.
+
+Usage (from the backend directory):
+    python -m bench.archive_harness [--pages 300]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+from bench.fixture_server import fixture_contracts, serve_fixtures
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+def check(condition: bool, message: str) -> bool:
+    print(f"[{'PASS' if condition else 'FAIL'}] {message}")
+    return condition
+
+async def check_replay(server) -> bool:
+    from app.routes.contracts import process_contract_embeddings, replay_archived_articles
+    from app.services.html_archive import get_html_archive
+
+    live_index = FakeIndex()
+    install_fakes(FakeGenaiClient(), live_index)
+    live = await process_contract_embeddings(full=True)
+    articles = live["stats"]["successfully_processed"]
+
+    archive = get_html_archive()
+    stats = archive.stats()
+    ok = check(stats["fetches"] == {"listing": 1, "article": articles} and articles > 0,
+               f"archived the listing and {articles} articles")
+    ok &= check(stats["objects"] < 1 + articles, f"identical pages stored once: {stats['objects']} objects for {1 + articles} fetches")
+    ok &= check(stats["compressed_bytes"] < stats["size_bytes"] / 2,
+                f"pages compressed {stats['size_bytes'] / 1024:.1f} KB -> {stats['compressed_bytes'] / 1024:.1f} KB")
+
+    # A second fetch of the same pages adds fetch records but no objects
+    await process_contract_embeddings(full=True)
+    again = archive.stats()
+    ok &= check(sum(again["fetches"].values()) == 2 * sum(stats["fetches"].values()) and again["objects"] == stats["objects"],
+                f"refetch recorded {sum(again['fetches'].values())} fetches in {again['objects']} objects")
+
+    # Replay the week into an empty index without touching the network
+    requests_before = sum(server.hits.values())
+    replay_index = FakeIndex()
+    install_fakes(FakeGenaiClient(), replay_index)
+    replayed = await process_contract_embeddings(full=True, replay=True)
+    ok &= check(sum(server.hits.values()) == requests_before, "replay made no requests")
+    ok &= check(replayed["stats"] == live["stats"], f"replay stats match the live run: {replayed['stats']}")
+    ok &= check(replay_index.namespaces == live_index.namespaces,
+                f"replay stored the same {len(live_index.namespaces.get('contracts', {}))} vectors as the live run")
+
+    # Re-parsing every archived article compares its records and finds nothing changed
+    everything = await replay_archived_articles()
+    ok &= check(everything["stats"]["unchanged_skipped"] == 0 and everything["stats"]["successfully_processed"] == articles
+                and everything["stats"]["vectors_upserted"] == 0,
+                f"replay of the whole archive re-parsed all {everything['stats']['successfully_processed']} articles "
+                f"and upserted {everything['stats']['vectors_upserted']} vectors")
+    return ok
+
+async def check_extractor_version(server) -> bool:
+    from app.routes.contracts import process_contract_embeddings
+    from app.services import ingest_state
+
+    # The live and replay runs recorded every article, so an incremental ingest gets 304s
+    not_modified = server.not_modified
+    unchanged = await process_contract_embeddings()
+    articles = unchanged["stats"]["total_links_found"]
+    ok = check(unchanged["stats"]["unchanged_skipped"] == articles and server.not_modified - not_modified == articles,
+               f"incremental ingest skipped all {articles} articles on 304s")
+
+    # A new extractor version drops the validators recorded under the old one
+    version = ingest_state.EXTRACTOR_VERSION
+    ingest_state.EXTRACTOR_VERSION = version + 1
+    try:
+        not_modified = server.not_modified
+        bumped = await process_contract_embeddings()
+        ok &= check(bumped["stats"]["successfully_processed"] == articles and server.not_modified == not_modified,
+                    f"after an extractor version bump all {bumped['stats']['successfully_processed']} articles were downloaded and re-processed")
+        again = await process_contract_embeddings()
+        ok &= check(again["stats"]["unchanged_skipped"] == articles,
+                    f"the next ingest skips all {again['stats']['unchanged_skipped']} articles again")
+    finally:
+        ingest_state.EXTRACTOR_VERSION = version
+    return ok
+
+async def check_legacy_ids(state_dir: str) -> bool:
+    from app.services.embeddings import generate_embeddings
+    from app.services.ingest_state import IngestStateStore
+    from app.services.scraper import article_id_from_url
+
+    # Vectors as stored before awards were split out: one per section, no ingest state
+    index = FakeIndex()
+    install_fakes(FakeGenaiClient(), index)
+    contracts = fixture_contracts()
+    legacy = {f"{article_id_from_url(contract['url'])}_{name.replace(' ', '_')}": contract
+              for contract in contracts for name in contract["sections"]}
+    index.upsert([{"id": vector_id, "values": [1.0], "metadata": {}} for vector_id in legacy], namespace="contracts")
+
+    # The last article has no parsed awards, so its sections keep their one-per-section IDs
+    sections_only = {**contracts[-1], "awards": []}
+    kept = {vector_id for vector_id, contract in legacy.items() if contract["url"] == sections_only["url"]}
+    state = IngestStateStore(os.path.join(state_dir, "legacy.sqlite3"))
+    try:
+        await generate_embeddings(contracts[:-1] + [sections_only], ingest_state=state)
+        stored = set(index.namespaces["contracts"])
+        ok = check(not (set(legacy) - kept) & stored and kept <= stored,
+                   f"first ingest deleted {len(set(legacy) - kept)} legacy section vectors and kept the {len(kept)} still in use")
+    finally:
+        state.close()
+    return ok
+
+def check_reparse_speed(args, archive_dir: str) -> bool:
+    from app.config import HTML_ARCHIVE_PARSE_WORKERS
+    from app.services.html_archive import ArchiveFetcher, HtmlArchive
+    from app.services.scraper import ContractScraper
+    from bench.html_parsing import full_size_page, site_chrome
+
+    chrome = site_chrome(args.chrome_kb)
+    fixtures = [full_size_page(path.read_text(encoding="utf-8"), chrome, 8) for path in sorted(FIXTURES_DIR.glob("article_*.html"))]
+
+    # Distinct pages, so every one is its own object
+    archive = HtmlArchive(archive_dir)
+    urls = []
+    pages = []
+    for i in range(args.pages):
+        url = f"https://www.defense.gov/News/Contracts/Contract/Article/{6000000 + i}/"
+        page = fixtures[i % len(fixtures)].replace("</body>", f"<!-- {i} --></body>", 1)
+        archive.put(url, page)
+        urls.append(url)
+        pages.append(page)
+
+    # Both rates are the best of several timed runs after a warm-up, so one slow run on a busy machine doesn't decide the check
+    runs = 3
+    sample = pages[:max(1, args.pages // (5 * runs))]
+    ContractScraper().parse(sample[0])
+    in_memory = 0.0
+    for _ in range(runs):
+        started = time.perf_counter()
+        for page in sample:
+            ContractScraper().parse(page)
+        in_memory = max(in_memory, len(sample) / (time.perf_counter() - started))
+
+    workers = HTML_ARCHIVE_PARSE_WORKERS
+    results = []
+    rate = 0.0
+    elapsed = 0.0
+    with ArchiveFetcher(archive, parse_workers=workers) as fetcher:
+        # Start the worker processes before timing
+        fetcher.scrape(urls[0])
+        with ThreadPoolExecutor(fetcher.max_workers) as pool:
+            for i in range(runs):
+                chunk = urls[i * len(urls) // runs:(i + 1) * len(urls) // runs]
+                started = time.perf_counter()
+                results += pool.map(fetcher.scrape, chunk)
+                seconds = time.perf_counter() - started
+                elapsed += seconds
+                rate = max(rate, len(chunk) / seconds)
+    archive.close()
+
+    expected = 0.7 * in_memory * min(workers, os.cpu_count() or 1)
+    print(
+        f"re-parsed {len(urls)} archived {sum(map(len, pages)) / len(pages) / 1024:.0f} KB pages in {elapsed:.1f}s "
+        f"(best of {runs} runs {rate:.1f} pages/s, {workers} parse processes); "
+        f"parsing from memory in one process: best of {runs} runs {in_memory:.1f} pages/s"
+    )
+    ok = check(all("error" not in result and result["sections"] for result in results), "every archived page re-parsed")
+    ok &= check(rate >= expected, f"archive re-parse keeps up with in-memory parsing (at least {expected:.1f} pages/s)")
+    return ok
+
+async def main_async(args) -> int:
+    state_dir = tempfile.mkdtemp(prefix="archive-harness-")
+    os.environ.update({
+        "HTML_ARCHIVE_PATH": os.path.join(state_dir, "archive"),
+        "INGEST_STATE_PATH": os.path.join(state_dir, "ingest.sqlite3"),
+        "FETCH_MIN_HOST_INTERVAL": "0",
+        # The replay must store exactly what the live run stored, so every section is embedded
+        "NEAR_DUPLICATE_MODE": "off",
+    })
+
+    with serve_fixtures(listing_page_size=10) as server:
+        os.environ["DEFENSE_GOV_BASE_URL"] = server.base_url
+        ok = await check_replay(server)
+        ok &= await check_extractor_version(server)
+
+    ok &= await check_legacy_ids(state_dir)
+    ok &= check_reparse_speed(args, os.path.join(state_dir, "speed-archive"))
+    return 0 if ok else 1
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300, help="Full-size pages archived for the re-parse timing")
+    parser.add_argument("--chrome-kb", type=int, default=150, help="Site chrome around each of those pages")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Harness for the sharded historical backfill
+
+Backfills a date range from the local defense.gov stand-in, which serves
+paged synthetic listings with one article per day, into the fake Gemini and
+Pinecone clients (installed in every worker process). It checks that:
+
+- every listing page is followed and every article is ingested
+- a run whose worker process crashes mid-shard resumes from its checkpoints
+  without re-processing finished articles, and without losing their keyword
+  index updates
+- running the shards across worker processes is faster than running them one
+  at a time (each worker imports the app on start, so the expected speedup is
+  capped by the CPU count)
+
+State files are written to a temporary directory.
+
+Usage (from the backend directory):
+    python -m bench.backfill_harness [--days 480] [--shard-days 60] [--workers 4]
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from bench.fixture_server import serve_fixtures
+
+START = date(2024, 1, 1)
+
+_upserts = 0
+
+def install_worker_fakes(embed_latency: float, index_latency: float, crash_after: int = 0) -> None:
+    """
+    Process initializer: point the app at the fakes, optionally crashing after some upserts
+
+    Args:
+        embed_latency: Fake embedding latency in seconds
+        index_latency: Fake index latency in seconds
+        crash_after: Kill the process on this many'th upsert (0 = never)
+    """
+    from app.services import bm25
+    from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+
+    index = FakeIndex(latency=index_latency)
+    install_fakes(FakeGenaiClient(embed_latency=embed_latency), index)
+    # Keep the configured keyword index file; the harness checks what reaches it
+    bm25._index = None
+
+    if crash_after:
+        upsert = index.upsert
+
+        def crashing_upsert(*args, **kwargs):
+            global _upserts
+            _upserts += 1
+            if _upserts >= crash_after:
+                os._exit(1)
+            return upsert(*args, **kwargs)
+
+        index.upsert = crashing_upsert
+
+def count(path: str, table: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def check(condition: bool, message: str) -> bool:
+    print(f"[{'PASS' if condition else 'FAIL'}] {message}")
+    return condition
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=480, help="Days in the backfilled range (one article per day)")
+    parser.add_argument("--shard-days", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=10, help="Articles per listing page")
+    parser.add_argument("--fetch-latency", type=float, default=0.2, help="Fixture server latency per page in seconds")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--index-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    end = START + timedelta(days=args.days - 1)
+    state_dir = tempfile.mkdtemp(prefix="backfill-harness-")
+    ok = True
+
+    with serve_fixtures(latency=args.fetch_latency, listing_page_size=args.page_size) as server:
+        # Worker processes are spawned and read their configuration from the environment
+        os.environ.update({
+            "DEFENSE_GOV_BASE_URL": server.base_url,
+            "INGEST_STATE_PATH": os.path.join(state_dir, "ingest.sqlite3"),
+            "BACKFILL_STATE_PATH": os.path.join(state_dir, "backfill.sqlite3"),
+            "BM25_INDEX_PATH": os.path.join(state_dir, "bm25.pkl"),
+            "HTML_ARCHIVE_PATH": os.path.join(state_dir, "archive"),
+            "EMBEDDING_CACHE_ENABLED": "false",
+            "FETCH_MIN_HOST_INTERVAL": "0",
+            # The fake Gemini has no quota; with one, workers split it and throughput can't scale
+            "GEMINI_REQUESTS_PER_MINUTE": "0",
+            "GEMINI_TOKENS_PER_MINUTE": "0",
+            # The synthetic articles repeat the same awards; store every one so vector counts are predictable
+            "NEAR_DUPLICATE_MODE": "off",
+        })
+        logging.disable(logging.CRITICAL)
+
+        from app.services.backfill import run_backfill
+        from app.services.bm25 import BM25Index
+
+        fakes = (args.embed_latency, args.index_latency)
+
+        # A worker dies part way through its shard; the run reports incomplete shards
+        crashed = run_backfill(START, end, args.shard_days, workers=2, full=True, restart=True,
+                               initializer=install_worker_fakes, initargs=fakes + (4,))
+        checkpointed = count(os.environ["BACKFILL_STATE_PATH"], "articles")
+        ok &= check(crashed["completed_shards"] < crashed["shards"], f"crashed run left {crashed['shards'] - crashed['completed_shards']} shards incomplete")
+        ok &= check(0 < checkpointed < args.days, f"{checkpointed} of {args.days} articles checkpointed before the crash")
+
+        # The next run resumes instead of starting over
+        resumed = run_backfill(START, end, args.shard_days, workers=2, full=True,
+                               initializer=install_worker_fakes, initargs=fakes)
+        resumed_articles = sum(result.get("resumed", 0) for result in resumed["results"])
+        ok &= check(resumed["completed_shards"] == resumed["shards"], "resumed run completes every shard")
+        ok &= check(resumed_articles == checkpointed and resumed["articles"] == args.days - checkpointed,
+                    f"{resumed_articles} checkpointed articles skipped, {resumed['articles']} processed")
+        ok &= check(count(os.environ["BACKFILL_STATE_PATH"], "articles") == args.days, f"all {args.days} articles across listing pages checkpointed")
+
+        stored_vectors = count(os.environ["INGEST_STATE_PATH"], "vectors")
+        keyword_docs = len(BM25Index(os.environ["BM25_INDEX_PATH"]))
+        ok &= check(keyword_docs == stored_vectors > 0, f"keyword index has all {stored_vectors} vectors' documents despite the crash")
+
+        # Throughput: one process versus a pool
+        serial = run_backfill(START, end, args.shard_days, workers=1, full=True, restart=True,
+                              initializer=install_worker_fakes, initargs=fakes)
+        parallel = run_backfill(START, end, args.shard_days, workers=args.workers, full=True, restart=True,
+                                initializer=install_worker_fakes, initargs=fakes)
+        speedup = parallel["articles_per_second"] / serial["articles_per_second"]
+        print(
+            f"1 worker: {serial['articles_per_second']:.1f} articles/s, "
+            f"{args.workers} workers: {parallel['articles_per_second']:.1f} articles/s ({speedup:.1f}x)"
+        )
+        ok &= check(serial["articles"] == parallel["articles"] == args.days, "both runs process every article")
+        expected = max(1.1, 0.5 * min(args.workers, len(crashed["results"]), os.cpu_count() or 1))
+        ok &= check(speedup >= expected, f"worker processes scale throughput (expected at least {expected:.1f}x)")
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
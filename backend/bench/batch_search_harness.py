@@ -0,0 +1,179 @@
+"""
+Harness for POST /contracts/search/batch
+
+Runs the FastAPI app in-process against the fake Gemini and Pinecone clients
+(with the query-embedding and answer caches off) and compares a batch of
+distinct searches sent one by one to POST /contracts/search with the same
+searches sent as one batch. It checks that:
+
+- the batch makes one embedding request instead of one per query
+- every search gets the same answer and sources as on its own
+- results stream back as each search finishes, not all at the end
+- no more than SEARCH_BATCH_GENERATION_CONCURRENCY answers are generated at once
+- generate=false returns the same sources without calling the model
+- the batch finishes several times faster than the serial searches
+- malformed batches are rejected with a 400
+
+Usage (from the backend directory):
+    python -m bench.batch_search_harness [--queries 20]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+from bench.fixture_server import fixture_contracts
+from bench.perf_suite import serve_app
+
+SUBJECTS = [
+    "Navy submarine",
+    "Army aviation maintenance",
+    "Lockheed Martin rocket production",
+    "medical supplies Defense Logistics Agency",
+    "Air Force missile",
+    "pier repairs",
+    "destroyer construction",
+    "surgical supplies",
+    "launcher engineering",
+    "missile defense",
+]
+KINDS = ["contracts", "awards", "modifications", "orders"]
+
+def check(condition: bool, message: str) -> bool:
+    print(f"[{'PASS' if condition else 'FAIL'}] {message}")
+    return condition
+
+def batch_queries(count: int) -> List[str]:
+    return [f"{SUBJECTS[i % len(SUBJECTS)]} {KINDS[i // len(SUBJECTS) % len(KINDS)]}" for i in range(count)]
+
+class GenerationCounter:
+    """
+    Wraps the fake model's generate_content to count calls and the most in flight at once
+    """
+
+    def __init__(self, models):
+        self.generate_content = models.generate_content
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        models.generate_content = self
+
+    async def __call__(self, *args, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await self.generate_content(*args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+async def stream_batch(client: httpx.AsyncClient, body: Dict[str, Any]) -> Tuple[List[Tuple[float, str, Dict]], float]:
+    """
+    POST a batch and collect its server-sent events with their arrival times
+    """
+    events = []
+    started = time.perf_counter()
+    async with client.stream("POST", "/contracts/search/batch", json=body) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((time.perf_counter() - started, event, json.loads(line[len("data: "):])))
+    return events, time.perf_counter() - started
+
+async def main_async(args) -> int:
+    genai_client = FakeGenaiClient(embed_latency=args.embed_latency, generate_latency=args.generate_latency)
+    install_fakes(genai_client, FakeIndex(latency=args.index_latency))
+
+    from app.config import SEARCH_BATCH_GENERATION_CONCURRENCY, SEARCH_BATCH_MAX_QUERIES
+    from app.services import embeddings
+    from app.services.query_cache import get_query_embedding_cache
+
+    await embeddings.generate_embeddings(fixture_contracts())
+    # Every search should do the full work, not hit a cache filled by an earlier one
+    embeddings.ANSWER_CACHE_ENABLED = False
+    get_query_embedding_cache().max_entries = 0
+    generations = GenerationCounter(genai_client.aio.models)
+
+    queries = batch_queries(args.queries)
+    # Served over HTTP so streamed events arrive as they are sent
+    async with serve_app() as base_url, httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        embed_calls = genai_client.embed_latency.calls
+        started = time.perf_counter()
+        serial = []
+        for query in queries:
+            response = await client.post("/contracts/search", params={"query": query})
+            response.raise_for_status()
+            serial.append(response.json())
+        serial_seconds = time.perf_counter() - started
+        serial_embeds = genai_client.embed_latency.calls - embed_calls
+
+        embed_calls = genai_client.embed_latency.calls
+        generations.peak = 0
+        events, batch_seconds = await stream_batch(client, {"queries": queries})
+        batch_embeds = genai_client.embed_latency.calls - embed_calls
+        results = {data["index"]: data for _, event, data in events if event == "result"}
+        done = [data for _, event, data in events if event == "done"]
+
+        print(f"   {len(queries)} searches one by one: {serial_seconds:.2f}s, {serial_embeds} embedding requests; "
+              f"as a batch: {batch_seconds:.2f}s, {batch_embeds} embedding requests")
+        ok = check(batch_embeds == 1 and serial_embeds == len(queries), f"batch embedded {len(queries)} queries in {batch_embeds} request")
+        ok &= check(
+            sorted(results) == list(range(len(queries))) and done and done[0]["errors"] == 0
+            and all(results[i]["query"] == query for i, query in enumerate(queries)),
+            f"{len(results)} result events, one per query, then done"
+        )
+        ok &= check(all(results[i]["answer"] == serial[i]["answer"] and results[i]["sources"] == serial[i]["sources"] for i in results),
+                    "batch answers and sources match the single searches")
+
+        arrivals = [at for at, event, _ in events if event == "result"]
+        ok &= check(arrivals and arrivals[0] < batch_seconds / 2,
+                    f"first result streamed after {arrivals[0]:.2f}s of {batch_seconds:.2f}s")
+        ok &= check(1 < generations.peak <= SEARCH_BATCH_GENERATION_CONCURRENCY,
+                    f"at most {generations.peak} answers generated at once (limit {SEARCH_BATCH_GENERATION_CONCURRENCY})")
+        ok &= check(serial_seconds / batch_seconds >= args.min_speedup,
+                    f"batch {serial_seconds / batch_seconds:.1f}x faster than serial searches (expected at least {args.min_speedup}x)")
+
+        calls = generations.calls
+        sources_only, sources_seconds = await stream_batch(client, {"queries": queries, "generate": False})
+        retrieved = {data["index"]: data for _, event, data in sources_only if event == "result"}
+        ok &= check(generations.calls == calls and len(retrieved) == len(queries)
+                    and all("answer" not in data and data["sources"] == serial[i]["sources"] for i, data in retrieved.items()),
+                    f"generate=false returned the same sources in {sources_seconds:.2f}s without generating")
+
+        filtered = await stream_batch(client, {"queries": [{"query": "Navy contracts", "agency": ["navy"]}], "generate": False})
+        sections = {source["section"] for _, event, data in filtered[0] if event == "result" for source in data["sources"]}
+        ok &= check(sections == {"NAVY"}, f"per-query filters applied: sections {sorted(sections)}")
+
+        rejected = [
+            await client.post("/contracts/search/batch", json={"queries": []}),
+            await client.post("/contracts/search/batch", json={"queries": ["ok query", "no"]}),
+            await client.post("/contracts/search/batch", json={"queries": [{"query": "Navy contracts", "date_from": "June"}]}),
+            await client.post("/contracts/search/batch", json={"queries": ["Navy contracts"] * (SEARCH_BATCH_MAX_QUERIES + 1)}),
+        ]
+        ok &= check(all(response.status_code == 400 for response in rejected),
+                    f"malformed batches rejected: {[response.status_code for response in rejected]}")
+    return 0 if ok else 1
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20, help="Searches in the batch")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Fake embedding latency in seconds")
+    parser.add_argument("--index-latency", type=float, default=0.02, help="Fake index query latency in seconds")
+    parser.add_argument("--generate-latency", type=float, default=0.2, help="Fake generation latency in seconds")
+    parser.add_argument("--min-speedup", type=float, default=3.0, help="Required batch speedup over serial searches")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Harness for token-budgeted prompt context assembly
+
+Builds candidate sets from the fixture awards, each re-announced on later
+days as a near-identical modification (new modification number, amount and
+date), and checks that:
+
+- near-duplicates are dropped and the chosen passages fit CONTEXT_TOKEN_BUDGET
+- the budgeted context covers more distinct awards per token than joining
+  the top five previews, as searches did before
+- MMR picks passages less alike than ranking by relevance alone
+- a long section is trimmed to the sentences about the queried award, even
+  when that award starts past the old 1,000-character preview
+- end to end, with the fake Gemini and Pinecone clients, prompts carry no
+  duplicate awards, stay within the budget, return at most top_k sources,
+  and each search logs the context tokens it used
+
+Usage (from the backend directory):
+    python -m bench.context_harness
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import re
+import sys
+import tempfile
+from types import SimpleNamespace
+from typing import Dict, List
+
+from bench.fakes import FakeGenaiClient, FakeIndex, fake_embedding, install_fakes
+from bench.fixture_server import fixture_contracts
+
+QUERIES = [
+    "Lockheed Martin rocket system production",
+    "Navy destroyer construction contracts",
+    "Air Force missile procurement",
+    "Army aviation maintenance awards",
+    "Defense Logistics Agency fuel contracts",
+]
+
+def check(condition: bool, message: str) -> bool:
+    print(f"[{'PASS' if condition else 'FAIL'}] {message}")
+    return condition
+
+def reannounce(text: str, day: int) -> str:
+    """
+    The same award as a later modification: new modification number, amount and completion year
+    """
+    text = re.sub(r"\$([\d,]+)", lambda m: f"${int(m.group(1).replace(',', '')) + 137000 * day:,}", text)
+    text = re.sub(r"\(P\d{5}\)", f"(P{40 + day:05d})", text)
+    if "(P" not in text:
+        text = text.replace(" modification ", f" modification (P{40 + day:05d}) ", 1)
+    return re.sub(r"20(2\d)\b", lambda m: f"20{int(m.group(1)) + day % 2}", text, count=1)
+
+def award_key(text: str) -> str:
+    # Re-announcements keep the company and contract number
+    contract = re.search(r"\b[A-Z0-9]{6}-?\d{2}-[A-Z]-\d{4}\b", text)
+    return f"{text.split(',', 1)[0]} {contract.group() if contract else ''}"
+
+def candidate_pool(query: str, awards: List[Dict], copies: int) -> List[SimpleNamespace]:
+    """
+    Every award plus `copies` re-announcements, scored by fake-embedding similarity to the query, best first
+    """
+    query_vector = fake_embedding(query)
+    pool = []
+    for i, award in enumerate(awards):
+        for day in range(copies + 1):
+            text = f"{award['section']}: {award['text'] if day == 0 else reannounce(award['text'], day)}"
+            score = sum(a * b for a, b in zip(query_vector, fake_embedding(text)))
+            pool.append(SimpleNamespace(id=f"award{i}_day{day}", score=score, metadata={"text": text}))
+    return sorted(pool, key=lambda match: match.score, reverse=True)
+
+def mean_similarity(texts: List[str]) -> float:
+    from app.services.bm25 import tokenize
+    from app.services.context_builder import cosine, term_vector
+
+    vectors = [term_vector(tokenize(text)) for text in texts]
+    pairs = list(itertools.combinations(vectors, 2))
+    return sum(cosine(a, b) for a, b in pairs) / len(pairs) if pairs else 0.0
+
+def check_selection(awards: List[Dict]) -> bool:
+    from app.config import CONTEXT_CANDIDATES, CONTEXT_DEDUP_THRESHOLD, CONTEXT_TOKEN_BUDGET
+    from app.services.bm25 import tokenize
+    from app.services.context_builder import build_context, jaccard, passthrough_context, shingles
+
+    ok = True
+    for query in QUERIES[:3]:
+        pool = candidate_pool(query, awards, copies=2)[:CONTEXT_CANDIDATES]
+        context = build_context(query, pool)
+        before = passthrough_context(pool[:5])
+
+        pairs = itertools.combinations([shingles(tokenize(text)) for text in context.texts], 2)
+        ok &= check(context.duplicates > 0 and all(jaccard(a, b) < CONTEXT_DEDUP_THRESHOLD for a, b in pairs),
+                    f"{query!r}: dropped {context.duplicates} of {len(pool)} candidates as near-duplicates")
+        ok &= check(context.tokens <= CONTEXT_TOKEN_BUDGET, f"{query!r}: {context.tokens} of {CONTEXT_TOKEN_BUDGET} budgeted tokens used")
+
+        distinct = len({award_key(text) for text in context.texts})
+        distinct_before = len({award_key(text) for text in before.texts})
+        print(f"   budgeted: {distinct} awards in {context.tokens} tokens; top five previews: {distinct_before} awards in {before.tokens} tokens")
+        ok &= check(distinct == len(context.texts) and distinct / context.tokens > distinct_before / before.tokens,
+                    f"{query!r}: more distinct awards per token than the top five previews")
+    return ok
+
+def check_diversity(awards: List[Dict]) -> bool:
+    from app.config import CONTEXT_TOKEN_BUDGET
+    from app.services.context_builder import build_context
+
+    # Separate awards to one company for related work rank highest; other companies' awards a little lower
+    lockheed = next(award for award in awards if award["text"].startswith("Lockheed Martin"))
+    pool = []
+    for i, work in enumerate(["Guided Multiple Launch Rocket System production", "rocket system spare parts", "launcher engineering services",
+                              "rocket pod production", "fire control system upgrades"]):
+        text = reannounce(lockheed["text"], i).replace("Guided Multiple Launch Rocket System production", work)
+        text = text.replace("W31P4Q-23-C-0045", f"W31P4Q-2{i}-C-00{50 + i}")
+        pool.append(SimpleNamespace(id=f"lockheed{i}", score=0.9 - 0.01 * i, metadata={"text": f"ARMY: {text}"}))
+    others = [award for award in awards if not award["text"].startswith("Lockheed Martin")]
+    pool += [SimpleNamespace(id=f"other{i}", score=0.8 - 0.01 * i, metadata={"text": f"{award['section']}: {award['text']}"})
+             for i, award in enumerate(others)]
+
+    query = "Lockheed Martin rocket system production"
+    budget = CONTEXT_TOKEN_BUDGET // 3
+    diverse = build_context(query, pool, token_budget=budget)
+    ranked = build_context(query, pool, token_budget=budget, mmr_lambda=1.0)
+    companies = lambda context: len({text.split(": ", 1)[1].split(",", 1)[0] for text in context.texts})
+    ok = check(diverse.duplicates == ranked.duplicates == 0, "related awards to one company are not treated as duplicates")
+    ok &= check(companies(diverse) > companies(ranked) and mean_similarity(diverse.texts) < mean_similarity(ranked.texts),
+                f"MMR covers {companies(diverse)} companies in {len(diverse.texts)} passages, relevance order {companies(ranked)} in {len(ranked.texts)} "
+                f"(mean term similarity {mean_similarity(diverse.texts):.2f} vs {mean_similarity(ranked.texts):.2f})")
+    return ok
+
+def check_trimming(awards: List[Dict]) -> bool:
+    from app.services.context_builder import build_context
+
+    # One long section: several awards, the queried one last and past the old preview length
+    target = next(award for award in awards if award["text"].startswith("Huntington Ingalls"))
+    others = [award["text"] for award in awards if award is not target]
+    section = " ".join(others + [target["text"]])
+    start = section.index(target["text"])
+    long_match = SimpleNamespace(id="long", score=1.0, metadata={"text": section})
+    filler = [SimpleNamespace(id=f"other{i}", score=0.5, metadata={"text": text}) for i, text in enumerate(others[:3])]
+
+    context = build_context("Huntington Ingalls destroyer", [long_match, *filler], token_budget=150, min_passage_tokens=40)
+    trimmed = context.texts[0] if context.texts else ""
+    ok = check(start > 1000 and "Huntington Ingalls" in trimmed and "DDG 51" in trimmed,
+               f"award starting at character {start} of a {len(section)}-character section kept after trimming")
+    ok &= check(trimmed.startswith("...") and context.tokens <= 150,
+                f"section trimmed to the queried award, {context.tokens} of 150 tokens used: {trimmed[:100]}...")
+    return ok
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+async def check_search(contracts: List[Dict]) -> bool:
+    from app.config import CONTEXT_TOKEN_BUDGET
+    from app.services import embeddings
+    from app.services.metrics import GEMINI_TOKENS
+
+    # Each article re-published on two later days, as modifications
+    articles = list(contracts)
+    for day in (1, 2):
+        for contract in contracts:
+            article_id = re.search(r"/Article/(\d+)/", contract["url"]).group(1)
+            articles.append({
+                **contract,
+                "url": contract["url"].replace(article_id, str(int(article_id) + 1000 * day)),
+                "awards": [{**award, "text": reannounce(award["text"], day)} for award in contract["awards"]],
+            })
+
+    install_fakes(FakeGenaiClient(), FakeIndex())
+    await embeddings.generate_embeddings(articles)
+    embeddings.ANSWER_CACHE_ENABLED = False
+
+    capture = CaptureHandler()
+    context_logger = logging.getLogger("app.services.context_builder")
+    context_logger.setLevel(logging.INFO)
+    context_logger.addHandler(capture)
+
+    results = {}
+    for enabled in (False, True):
+        embeddings.CONTEXT_BUILDER_ENABLED = enabled
+        prompt_tokens = GEMINI_TOKENS.value(operation="search", direction="prompt")
+        duplicates = distinct = most_sources = 0
+        for query in QUERIES:
+            result = await embeddings.search_with_gemini(query)
+            most_sources = max(most_sources, len(result["sources"]))
+            keys = [f"{source.get('company')} {source.get('contract_number')}" for source in result["sources"]]
+            duplicates += len(keys) - len(set(keys))
+            distinct += len(set(keys))
+        results[enabled] = {
+            "prompt_tokens": (GEMINI_TOKENS.value(operation="search", direction="prompt") - prompt_tokens) / len(QUERIES),
+            "duplicates": duplicates,
+            "distinct": distinct / len(QUERIES),
+            "most_sources": most_sources,
+        }
+    embeddings.CONTEXT_BUILDER_ENABLED = True
+
+    before, after = results[False], results[True]
+    print(
+        f"   top five previews: {before['prompt_tokens']:.0f} prompt tokens, {before['distinct']:.1f} awards, {before['duplicates']} duplicates; "
+        f"budgeted: {after['prompt_tokens']:.0f} prompt tokens, {after['distinct']:.1f} awards, {after['duplicates']} duplicates"
+    )
+    ok = check(before["duplicates"] > 0 and after["duplicates"] == 0, "searches no longer put re-announced awards in the prompt twice")
+    ok &= check(after["distinct"] > before["distinct"], "budgeted prompts cover more distinct awards")
+    ok &= check(after["most_sources"] <= 5, f"at most top_k=5 sources per search: {after['most_sources']}")
+
+    used = [int(m.group(1)) for m in (re.search(r"(\d+) of \d+ tokens", message) for message in capture.messages) if m]
+    ok &= check(len(used) == len(QUERIES) and max(used) <= CONTEXT_TOKEN_BUDGET,
+                f"every search logged its context tokens: {used} (budget {CONTEXT_TOKEN_BUDGET})")
+    return ok
+
+async def main_async(args) -> int:
+    state_dir = tempfile.mkdtemp(prefix="context-harness-")
+    os.environ.update({
+        "INGEST_STATE_PATH": os.path.join(state_dir, "ingest.sqlite3"),
+        "CONTEXT_TOKEN_BUDGET": str(args.budget),
+    })
+    contracts = fixture_contracts()
+    awards = [award for contract in contracts for award in contract["awards"]]
+
+    ok = check_selection(awards)
+    ok &= check_diversity(awards)
+    ok &= check_trimming(awards)
+    ok &= await check_search(contracts)
+    return 0 if ok else 1
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=1200, help="CONTEXT_TOKEN_BUDGET for the run")
+    args = parser.parse_args()
+
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Harness for near-duplicate section detection before embedding
+
+Ingests the fixture articles, then, one day at a time, the same articles
+re-published under new article IDs: once verbatim, once with an editorial
+correction, and once as modifications with new amounts. It checks that:
+
+- verbatim and corrected copies are neither embedded nor stored, and are
+  linked to the vector they copy
+- modifications with new amounts are embedded like any new award
+- the dedup ratio is reported in the ingest stats
+- deleting a stored award releases its copies, and the next ingest of the
+  copying article embeds them
+- verbatim copies announced under a later date are linked too, and a search
+  filtered on that date or an agency returns them under their own URL and date
+- NEAR_DUPLICATE_MODE=off embeds every section
+- numpy and pure-Python signatures are identical
+
+The ingest state is written to a temporary directory.
+
+Usage (from the backend directory):
+    python -m bench.dedup_harness
+"""
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from datetime import date
+from typing import Dict, List
+
+from bench.context_harness import reannounce
+from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+from bench.fixture_server import fixture_contracts
+
+def check(condition: bool, message: str) -> bool:
+    print(f"[{'PASS' if condition else 'FAIL'}] {message}")
+    return condition
+
+def corrected(text: str) -> str:
+    return text.replace("is the contracting activity", "is the contracting activity (corrected)")
+
+def republish(contract: Dict, day: int, edit) -> Dict:
+    """
+    The same article under a new article ID, with every award text passed through `edit`
+    """
+    article_id = re.search(r"/Article/(\d+)/", contract["url"]).group(1)
+    return {
+        **contract,
+        "url": contract["url"].replace(article_id, str(int(article_id) + 1000 * day)),
+        "content_hash": f"day{day}",
+        "awards": [{**award, "text": edit(award["text"])} for award in contract["awards"]],
+    }
+
+def vector_ids(index: FakeIndex) -> List[str]:
+    return sorted(index.namespaces.get("contracts", {}))
+
+async def check_dedup(contracts: List[Dict], state_dir: str) -> bool:
+    from app.services.embeddings import contract_records, generate_embeddings
+    from app.services.ingest_state import IngestStateStore
+    from app.services.near_duplicates import NearDuplicateIndex
+    from app.services.scraper import article_id_from_url
+
+    index = FakeIndex()
+    install_fakes(FakeGenaiClient(), index)
+    state = IngestStateStore(os.path.join(state_dir, "ingest.sqlite3"))
+    awards = sum(len(contract["awards"]) for contract in contracts)
+
+    first = await generate_embeddings(contracts, ingest_state=state)
+    ok = check(first["successful_embeddings"] == awards and len(vector_ids(index)) == awards,
+               f"day 0: {awards} awards embedded ({first['near_duplicate_sections']} near copies within the first run)")
+
+    days = [("verbatim copies", lambda text: text), ("corrected copies", corrected), ("modifications with new amounts", lambda text: reannounce(text, 1))]
+    runs = {}
+    for day, (label, edit) in enumerate(days, start=1):
+        before = len(vector_ids(index))
+        stats = await generate_embeddings([republish(contract, day, edit) for contract in contracts], ingest_state=state)
+        runs[label] = stats
+        print(f"   day {day}, {label}: {stats['embedded_sections']} embedded, {stats['near_duplicate_sections']} near copies, "
+              f"dedup ratio {stats['dedup_ratio']:.2f}, {len(vector_ids(index)) - before} vectors added")
+
+    for label in ("verbatim copies", "corrected copies"):
+        stats = runs[label]
+        ok &= check(stats["near_duplicate_sections"] == awards and stats["embedded_sections"] == 0 and stats["dedup_ratio"] == 1.0,
+                    f"{label}: all {awards} sections skipped, dedup ratio {stats['dedup_ratio']:.2f}")
+    modified = runs["modifications with new amounts"]
+    ok &= check(modified["near_duplicate_sections"] == 0 and modified["embedded_sections"] == awards,
+                f"modifications with new amounts: all {modified['embedded_sections']} sections embedded")
+    ok &= check(len(vector_ids(index)) == 2 * awards, f"index holds {len(vector_ids(index))} vectors for {4 * awards} announced sections")
+
+    # Each copy is linked to the day-0 vector it copies
+    near = NearDuplicateIndex(state.path)
+    original = contracts[0]
+    canonical = f"{article_id_from_url(original['url'])}_{list(contract_records(original))[-1]['key']}"
+    copies = near.copies(canonical)
+    ok &= check(len(copies) == 2 and all(copy["similarity"] >= near.threshold for copy in copies),
+                f"{canonical} has {len(copies)} linked copies: {[copy['vector_id'] for copy in copies]}")
+
+    # Drop that award from its day-0 article: its copies are embedded when their articles are next ingested
+    changed = await generate_embeddings([{**original, "content_hash": "edited", "awards": original["awards"][:-1]}], ingest_state=state)
+    ok &= check(canonical not in vector_ids(index) and not near.copies(canonical),
+                f"deleting {canonical} ({changed['deleted_vectors']} vectors deleted) released its copies")
+
+    copied_articles = [republish(original, day, edit) for day, (_, edit) in enumerate(days[:2], start=1)]
+    again = await generate_embeddings(copied_articles, ingest_state=state)
+    ok &= check(again["embedded_sections"] == 2 and again["unchanged_sections"] == again["total_sections"] - 2
+                and all(copy["vector_id"] in vector_ids(index) for copy in copies),
+                f"re-ingesting the copying articles embedded the {again['embedded_sections']} released copies and nothing else")
+
+    # Verbatim copies announced a year later are still linked, not embedded
+    redated = [{**republish(contract, 4, lambda text: text), "date": contract["date"].replace("2025", "2026")} for contract in contracts]
+    later = await generate_embeddings(redated, ingest_state=state)
+    ok &= check(later["near_duplicate_sections"] == awards and later["embedded_sections"] == 0,
+                f"copies under another date: all {later['near_duplicate_sections']} sections linked, none embedded")
+    ok &= await check_filtered_search(redated, state.path)
+    near.close()
+    state.close()
+    return ok
+
+async def check_filtered_search(redated: List[Dict], state_path: str) -> bool:
+    from app.services import near_duplicates
+    from app.services.embeddings import retrieve_for_query
+    from app.services.query_filters import QueryFilters
+
+    # Searches read the links from the global index, which defaults to INGEST_STATE_PATH
+    near_duplicates._index = near_duplicates.NearDuplicateIndex(state_path)
+    urls = {contract["url"] for contract in redated}
+    navy = sum(1 for contract in redated for award in contract["awards"] if award["section"] == "NAVY")
+    try:
+        filters = QueryFilters(date_from=date(2026, 1, 1), date_to=date(2026, 12, 31))
+        matches, _ = await retrieve_for_query("contract awarded", top_k=50, filters=filters)
+        ok = check(len(matches) == sum(len(contract["awards"]) for contract in redated)
+                   and all(match.metadata["contract_url"] in urls and match.metadata["date"].startswith("2026") for match in matches),
+                   f"a search filtered on the later date returns {len(matches)} linked copies under their own URL and date")
+
+        filters = QueryFilters(date_from=date(2026, 1, 1), date_to=date(2026, 12, 31), sections=["NAVY"])
+        matches, _ = await retrieve_for_query("contract awarded", top_k=50, filters=filters)
+        ok &= check(len(matches) == navy and all(match.metadata["section"] == "NAVY" for match in matches),
+                    f"adding an agency filter returns only the {len(matches)} NAVY copies")
+    finally:
+        near_duplicates._index.close()
+        near_duplicates._index = None
+    return ok
+
+async def check_off(contracts: List[Dict], state_dir: str) -> bool:
+    from app.services.ingest_pipeline import IngestPipeline
+    from app.services.ingest_state import IngestStateStore
+
+    index = FakeIndex()
+    install_fakes(FakeGenaiClient(), index)
+    state = IngestStateStore(os.path.join(state_dir, "off.sqlite3"))
+    awards = sum(len(contract["awards"]) for contract in contracts)
+
+    embedded = 0
+    for day in range(3):
+        articles = contracts if day == 0 else [republish(contract, day, lambda text: text) for contract in contracts]
+        stats = await IngestPipeline(ingest_state=state, near_duplicate_mode="off").run_articles(articles)
+        embedded += stats["embedded_sections"]
+    state.close()
+    return check(embedded == 3 * awards and len(vector_ids(index)) == 3 * awards,
+                 f"NEAR_DUPLICATE_MODE=off: {embedded} sections embedded for {awards} distinct awards")
+
+def check_signatures(contracts: List[Dict]) -> bool:
+    from app.services import near_duplicates
+
+    if not near_duplicates.NUMPY_AVAILABLE:
+        print("[SKIP] numpy is not installed, only the pure-Python signatures are used")
+        return True
+    texts = [award["text"] for contract in contracts for award in contract["awards"]]
+    with_numpy = [near_duplicates.minhash_signature(text) for text in texts]
+    near_duplicates.NUMPY_AVAILABLE = False
+    try:
+        without = [near_duplicates.minhash_signature(text) for text in texts]
+    finally:
+        near_duplicates.NUMPY_AVAILABLE = True
+    return check(with_numpy == without, f"numpy and pure-Python signatures agree for {len(texts)} sections")
+
+async def main_async() -> int:
+    state_dir = tempfile.mkdtemp(prefix="dedup-harness-")
+    contracts = fixture_contracts()
+
+    ok = await check_dedup(contracts, state_dir)
+    ok &= await check_off(contracts, state_dir)
+    ok &= check_signatures(contracts)
+    return 0 if ok else 1
+
+def main() -> int:
+    return asyncio.run(main_async())
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Local stand-ins for the Gemini and Pinecone clients used by app.services.embeddings
+
+The fakes mirror the small slice of each client API the app calls, with
+configurable latency, jitter, error rates and quotas, so ingest and search can be
+exercised and timed without network access or API keys.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from app.services.metadata_filters import matches_filter
+
+EMBEDDING_DIMENSION = 256
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def fake_embedding(text: str, dimension: int = EMBEDDING_DIMENSION) -> List[float]:
+    """
+    Deterministic bag-of-words embedding: texts sharing words get similar vectors
+
+    Args:
+        text: The text to embed
+        dimension: Vector length
+
+    Returns:
+        List[float]: Unit-length embedding
+    """
+    vector = [0.0] * dimension
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimension
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[bucket] += sign
+
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+class FakeAPIError(Exception):
+    """
+    Raised by the fakes to simulate an API failure; code mirrors the HTTP status
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.status = code
+
+class QuotaWindow:
+    """
+    Server-side quota: at most `per_second` calls in any one-second window
+
+    Shared by every surface of a fake client, like a per-project Gemini quota.
+    Calls over the quota fail with 429 RESOURCE_EXHAUSTED.
+    """
+
+    def __init__(self, per_second: float = 0.0):
+        """
+        Args:
+            per_second: Calls allowed per second (0 = unlimited)
+        """
+        self.per_second = per_second
+        self._lock = threading.Lock()
+        self._calls: List[float] = []
+        self.accepted = 0
+        self.throttled = 0
+
+    def check(self) -> None:
+        if not self.per_second:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._calls = [at for at in self._calls if now - at < 1.0]
+            throttled = len(self._calls) >= self.per_second
+            if throttled:
+                self.throttled += 1
+            else:
+                self._calls.append(now)
+                self.accepted += 1
+        if throttled:
+            raise FakeAPIError(429, "RESOURCE_EXHAUSTED: quota exceeded")
+
+class LatencyModel:
+    """
+    Latency, jitter and failure injection shared by the fakes
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        quota: Optional[QuotaWindow] = None,
+    ):
+        """
+        Args:
+            latency: Base latency per call in seconds
+            jitter: Uniform random extra latency in seconds
+            error_rate: Probability that a call fails with a 503
+            seed: Optional seed for reproducible runs
+            quota: Optional quota the calls count against
+        """
+        self.latency = latency
+        self.quota = quota
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def next_delay(self) -> float:
+        with self._lock:
+            self.calls += 1
+            return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def maybe_fail(self) -> None:
+        if self.quota is not None:
+            self.quota.check()
+        with self._lock:
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if failed:
+            raise FakeAPIError(503, "UNAVAILABLE: injected failure")
+
+class FakeModels:
+    """
+    Synchronous genai_client.models stand-in
+    """
+
+    def __init__(self, embed: LatencyModel, generate: LatencyModel, tokens_per_second: float):
+        self.embed = embed
+        self.generate = generate
+        self.tokens_per_second = tokens_per_second
+
+    def embed_content(self, model: str, contents, config=None):
+        time.sleep(self.embed.next_delay())
+        self.embed.maybe_fail()
+        return _embed_response(contents)
+
+    def generate_content(self, model: str, contents, config=None):
+        time.sleep(self.generate.next_delay() + _generation_time(self.tokens_per_second))
+        self.generate.maybe_fail()
+        return SimpleNamespace(text=_answer(contents), usage_metadata=_usage(contents))
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        time.sleep(self.generate.next_delay())
+        self.generate.maybe_fail()
+        for chunk in _answer_chunks(contents):
+            time.sleep(_generation_time(self.tokens_per_second) / ANSWER_CHUNKS)
+            yield SimpleNamespace(text=chunk, usage_metadata=None)
+
+class FakeAsyncModels:
+    """
+    genai_client.aio.models stand-in; latency is awaited so the event loop stays free
+    """
+
+    def __init__(self, embed: LatencyModel, generate: LatencyModel, tokens_per_second: float):
+        self.embed = embed
+        self.generate = generate
+        self.tokens_per_second = tokens_per_second
+
+    async def embed_content(self, model: str, contents, config=None):
+        await asyncio.sleep(self.embed.next_delay())
+        self.embed.maybe_fail()
+        return _embed_response(contents)
+
+    async def generate_content(self, model: str, contents, config=None):
+        await asyncio.sleep(self.generate.next_delay() + _generation_time(self.tokens_per_second))
+        self.generate.maybe_fail()
+        return SimpleNamespace(text=_answer(contents), usage_metadata=_usage(contents))
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        await asyncio.sleep(self.generate.next_delay())
+        self.generate.maybe_fail()
+        return self._stream(contents)
+
+    async def _stream(self, contents):
+        for chunk in _answer_chunks(contents):
+            await asyncio.sleep(_generation_time(self.tokens_per_second) / ANSWER_CHUNKS)
+            yield SimpleNamespace(text=chunk, usage_metadata=None)
+
+class FakeGenaiClient:
+    """
+    Stand-in for google.genai.Client with sync (.models) and async (.aio.models) surfaces
+    """
+
+    def __init__(
+        self,
+        embed_latency: float = 0.0,
+        generate_latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        tokens_per_second: float = 0.0,
+        blocking: bool = False,
+        seed: Optional[int] = None,
+        quota_per_second: float = 0.0,
+    ):
+        """
+        Args:
+            embed_latency: Seconds per embedding request
+            generate_latency: Seconds before the first generated token
+            jitter: Uniform random extra latency in seconds
+            error_rate: Probability that a call fails with a 503
+            tokens_per_second: Generation speed for the fixed-size fake answer (0 = instant)
+            blocking: Make the async surface sleep synchronously, like calling a sync client from async code
+            seed: Optional seed for reproducible runs
+            quota_per_second: Calls per second across embedding and generation before
+                the fake answers 429 RESOURCE_EXHAUSTED (0 = unlimited)
+        """
+        self.quota = QuotaWindow(quota_per_second)
+        self.embed_latency = LatencyModel(embed_latency, jitter, error_rate, seed, self.quota)
+        self.generate_latency = LatencyModel(generate_latency, jitter, error_rate, seed, self.quota)
+        self.models = FakeModels(self.embed_latency, self.generate_latency, tokens_per_second)
+        async_models = FakeAsyncModels(self.embed_latency, self.generate_latency, tokens_per_second)
+        if blocking:
+            async_models = _BlockingAsyncModels(self.models)
+        self.aio = SimpleNamespace(models=async_models)
+
+class _BlockingAsyncModels:
+    """
+    Async surface that blocks the loop, reproducing sync client calls inside coroutines
+    """
+
+    def __init__(self, models: FakeModels):
+        self._models = models
+
+    async def embed_content(self, model: str, contents, config=None):
+        return self._models.embed_content(model=model, contents=contents, config=config)
+
+    async def generate_content(self, model: str, contents, config=None):
+        return self._models.generate_content(model=model, contents=contents, config=config)
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        chunks = list(self._models.generate_content_stream(model=model, contents=contents, config=config))
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+        return stream()
+
+ANSWER_CHUNKS = 8
+ANSWER_TOKENS = 200
+
+def _contents_list(contents) -> List[str]:
+    return [contents] if isinstance(contents, str) else list(contents)
+
+def _embed_response(contents):
+    return SimpleNamespace(
+        embeddings=[SimpleNamespace(values=fake_embedding(str(text))) for text in _contents_list(contents)]
+    )
+
+def _generation_time(tokens_per_second: float) -> float:
+    return ANSWER_TOKENS / tokens_per_second if tokens_per_second else 0.0
+
+def _answer(contents) -> str:
+    prompt = str(contents)
+    return f"Fake answer based on {len(prompt)} prompt characters."
+
+def _answer_chunks(contents) -> List[str]:
+    answer = _answer(contents)
+    size = max(1, math.ceil(len(answer) / ANSWER_CHUNKS))
+    return [answer[i:i+size] for i in range(0, len(answer), size)]
+
+def _usage(contents):
+    prompt_tokens = len(str(contents)) // 4
+    return SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=ANSWER_TOKENS, total_token_count=prompt_tokens + ANSWER_TOKENS)
+
+class FakeIndex:
+    """
+    In-memory stand-in for a Pinecone gRPC index handle
+
+    Calls are synchronous and sleep for the configured latency, like the real
+    gRPC client. Queries support Pinecone-style metadata filters.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = LatencyModel(latency, jitter, error_rate, seed)
+        self._lock = threading.Lock()
+        self.namespaces: Dict[str, Dict[str, Dict]] = {}
+
+    def upsert(self, vectors: List[Dict], namespace: str = ""):
+        time.sleep(self.latency.next_delay())
+        self.latency.maybe_fail()
+        with self._lock:
+            store = self.namespaces.setdefault(namespace, {})
+            for vector in vectors:
+                store[vector["id"]] = {"values": list(vector["values"]), "metadata": dict(vector.get("metadata") or {})}
+        return SimpleNamespace(upserted_count=len(vectors))
+
+    def delete(self, ids: List[str], namespace: str = ""):
+        time.sleep(self.latency.next_delay())
+        with self._lock:
+            store = self.namespaces.get(namespace, {})
+            for vector_id in ids:
+                store.pop(vector_id, None)
+
+    def fetch(self, ids: List[str], namespace: str = "", **kwargs):
+        time.sleep(self.latency.next_delay())
+        with self._lock:
+            store = self.namespaces.get(namespace, {})
+            vectors = {
+                vector_id: SimpleNamespace(id=vector_id, values=store[vector_id]["values"], metadata=store[vector_id]["metadata"])
+                for vector_id in ids if vector_id in store
+            }
+        return SimpleNamespace(vectors=vectors, namespace=namespace)
+
+    def query(self, vector: List[float], top_k: int = 10, namespace: str = "", include_metadata: bool = False, filter=None, **kwargs):
+        time.sleep(self.latency.next_delay())
+        self.latency.maybe_fail()
+        with self._lock:
+            items = list(self.namespaces.get(namespace, {}).items())
+
+        scored = []
+        for vector_id, item in items:
+            if filter and not matches_filter(item["metadata"], filter):
+                continue
+            score = sum(a * b for a, b in zip(vector, item["values"]))
+            scored.append((score, vector_id, item["metadata"]))
+        scored.sort(key=lambda entry: entry[0], reverse=True)
+
+        return SimpleNamespace(matches=[
+            SimpleNamespace(id=vector_id, score=score, metadata=metadata if include_metadata else {})
+            for score, vector_id, metadata in scored[:top_k]
+        ])
+
+    def describe_index_stats(self, **kwargs):
+        with self._lock:
+            namespaces = {name: {"vector_count": len(store)} for name, store in self.namespaces.items()}
+        return SimpleNamespace(namespaces=namespaces, total_vector_count=sum(ns["vector_count"] for ns in namespaces.values()))
+
+def install_fakes(genai_client: FakeGenaiClient, index: FakeIndex) -> None:
+    """
+    Point app.services.embeddings at the fakes instead of the real clients
+
+    Args:
+        genai_client: Fake Gemini client
+        index: Fake vector index
+    """
+    from app.services import embeddings, ingest_pipeline
+
+    embeddings.genai_client = genai_client
+    embeddings.index_manager.connect_fn = lambda: index
+    embeddings.index_manager.invalidate()
+    # Benchmarks should not read or pollute the on-disk caches and indexes
+    ingest_pipeline.EMBEDDING_CACHE_ENABLED = False
+
+    from app.services import bm25
+
+    bm25._index = bm25.BM25Index(path=None)
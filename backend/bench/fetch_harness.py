@@ -0,0 +1,100 @@
+"""
+Harness for the concurrent article fetcher
+
+Serves the fixture pages from a local HTTP stand-in and checks that
+ContractFetcher returns exactly what the sequential ContractScraper returns,
+while respecting its concurrency cap, reusing connections, retrying
+transient failures and honoring conditional requests.
+
+Usage (from the backend directory):
+    python -m bench.fetch_harness [--latency 0.05] [--workers 4]
+"""
+import argparse
+import sys
+import time
+
+from app.services.fetcher import ContractFetcher
+from app.services.scraper import ContractScraper, extract_contract_links
+from bench.fixture_server import serve_fixtures
+
+LISTING_PATH = "/News/Contracts/StartDate/2025-02-18/EndDate/2025-03-14/"
+
+def sequential_scrape(urls):
+    """
+    Reference implementation: one ContractScraper.scrape call per URL
+    """
+    scraper = ContractScraper()
+    results = []
+    for url in urls:
+        info = scraper.scrape(url)
+        results.append({"url": url, "date": info["date"], "sections": info["sections"], "awards": info["awards"]})
+    return results
+
+def check(condition: bool, message: str) -> bool:
+    print(f"[{'PASS' if condition else 'FAIL'}] {message}")
+    return condition
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated server latency in seconds")
+    parser.add_argument("--workers", type=int, default=4, help="Fetcher concurrency cap")
+    args = parser.parse_args()
+
+    ok = True
+
+    with serve_fixtures(latency=args.latency) as server:
+        fetcher = ContractFetcher(max_workers=args.workers, min_host_interval=0)
+        listing_html = fetcher.fetch(server.base_url + LISTING_PATH)
+        ok &= check(listing_html is not None, "listing page fetched")
+        urls = extract_contract_links(listing_html or "", server.base_url)
+        # Repeat the article set so the pool has enough work to overlap
+        urls = urls * 4
+
+        start = time.perf_counter()
+        expected = sequential_scrape(urls)
+        sequential_time = time.perf_counter() - start
+
+        server.connections = 0
+        start = time.perf_counter()
+        with fetcher:
+            actual = fetcher.scrape_many(urls)
+        concurrent_time = time.perf_counter() - start
+
+        records = [{key: result[key] for key in ("url", "date", "sections", "awards")} for result in actual]
+        ok &= check(records == expected, f"{len(urls)} concurrent results match sequential scrape")
+        ok &= check(server.max_in_flight <= args.workers, f"peak in-flight requests {server.max_in_flight} <= cap {args.workers}")
+        ok &= check(server.connections <= args.workers, f"{server.connections} connections reused for {len(urls)} requests")
+        print(f"sequential: {sequential_time:.3f}s  concurrent: {concurrent_time:.3f}s  speedup: {sequential_time / concurrent_time:.1f}x")
+
+    with serve_fixtures(fail_first=2) as server:
+        with ContractFetcher(max_workers=args.workers, backoff_seconds=0.01, min_host_interval=0) as fetcher:
+            urls = extract_contract_links(fetcher.fetch(server.base_url + LISTING_PATH) or "", server.base_url)
+            results = fetcher.scrape_many(urls)
+        ok &= check(bool(urls) and all("error" not in r for r in results), "transient 503s are retried with backoff")
+
+    with serve_fixtures() as server:
+        interval = 0.05
+        with ContractFetcher(max_workers=args.workers, min_host_interval=interval) as fetcher:
+            urls = [server.base_url + f"/News/Contracts/Contract/Article/{article_id}/" for article_id in (4100001, 4100002, 4100003)] * 3
+            start = time.perf_counter()
+            fetcher.scrape_many(urls)
+            elapsed = time.perf_counter() - start
+        ok &= check(elapsed >= interval * (len(urls) - 1), f"per-host rate limit spaces {len(urls)} requests over {elapsed:.3f}s")
+
+    with serve_fixtures() as server:
+        with ContractFetcher(max_workers=args.workers, max_retries=0, min_host_interval=0) as fetcher:
+            result = fetcher.scrape(server.base_url + "/News/Contracts/Contract/Article/9999999/")
+        ok &= check(result.get("error") == "Failed to fetch page", "missing article reported as an error entry")
+
+    with serve_fixtures() as server:
+        with ContractFetcher(max_workers=args.workers, min_host_interval=0) as fetcher:
+            urls = [server.base_url + f"/News/Contracts/Contract/Article/{article_id}/" for article_id in (4100001, 4100002)]
+            first = fetcher.scrape_many(urls)
+            validators = {r["url"]: {"etag": r["etag"], "last_modified": r["last_modified"]} for r in first}
+            second = fetcher.scrape_many(urls, validators)
+        ok &= check(all(r.get("not_modified") for r in second) and server.not_modified == len(urls), "conditional requests skip unchanged articles")
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
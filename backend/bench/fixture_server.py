@@ -0,0 +1,239 @@
+"""
+Local stand-in for defense.gov that serves the saved fixture pages
+
+Listing URLs (/News/Contracts/StartDate/.../EndDate/.../) return listing.html and
+article URLs (/News/Contracts/Contract/Article/<id>/) return article_<id>.html.
+Responses carry ETag/Last-Modified headers and conditional requests get a
+304. Latency and transient failures can be injected to exercise the fetcher.
+With synthetic_articles any article ID is served, cycling through the fixture
+articles, so ingest can be run over arbitrarily many distinct URLs. With
+listing_page_size, listing URLs instead return paged synthetic listings with
+one article per day of the requested range, like a multi-year backfill sees.
+"""
+import hashlib
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+ARTICLE_PATH = re.compile(r"^/News/Contracts/Contract/Article/(\d+)/?$")
+LISTING_PATH = re.compile(r"^/News/Contracts/StartDate/([\d-]+)/EndDate/([\d-]+)/?$")
+
+# Synthetic listings give the article published on a day this ID plus the day's ordinal
+SYNTHETIC_ARTICLE_BASE = 4000000
+
+def fixture_contracts(fixtures_dir: Path = FIXTURES_DIR, base_url: str = "https://www.defense.gov") -> List[Dict]:
+    """
+    Parse every fixture article into the records process_contract_embeddings produces
+
+    Args:
+        fixtures_dir: Directory containing article_<id>.html files
+        base_url: Base URL used to build each record's article URL
+
+    Returns:
+        List[Dict]: One {url, date, sections, awards} record per fixture article
+    """
+    from app.services.scraper import ContractScraper
+
+    contracts = []
+    for path in sorted(fixtures_dir.glob("article_*.html")):
+        article_id = path.stem.split("_", 1)[1]
+        url = f"{base_url}/News/Contracts/Contract/Article/{article_id}/"
+        info = ContractScraper(url).parse(path.read_text(encoding="utf-8"))
+        contracts.append({"url": url, "date": info["date"], "sections": info["sections"], "awards": info["awards"]})
+    return contracts
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server that records request statistics for the harness
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        fixtures_dir: Path,
+        latency: float = 0.0,
+        fail_first: int = 0,
+        synthetic_articles: bool = False,
+        listing_page_size: int = 0,
+    ):
+        """
+        Initialize the server on a free localhost port
+
+        Args:
+            fixtures_dir: Directory containing listing.html and article_<id>.html files
+            latency: Seconds to sleep before answering each request
+            fail_first: Number of 503 responses returned for each path before serving it
+            synthetic_articles: Serve unknown article IDs from the fixture articles
+            listing_page_size: Serve paged synthetic listings with this many articles per page
+        """
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.fail_first = fail_first
+        self.synthetic_articles = synthetic_articles or listing_page_size > 0
+        self.listing_page_size = listing_page_size
+        self.article_fixtures = sorted(fixtures_dir.glob("article_*.html"))
+        self.lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.not_modified = 0
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up mid-response (e.g. a killed worker process) are expected
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Maps defense.gov paths onto fixture files
+    """
+
+    # HTTP/1.1 keeps connections open so session reuse is observable
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?", 1)[0]
+
+        with server.lock:
+            server.hits[path] = server.hits.get(path, 0) + 1
+            attempt = server.hits[path]
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+
+            if attempt <= server.fail_first:
+                self._send(503, b"Service Unavailable")
+                return
+
+            listing = LISTING_PATH.match(path)
+            if listing and server.listing_page_size:
+                self._send(200, self._synthetic_listing(listing.group(1), listing.group(2)))
+                return
+
+            fixture = self._resolve(path)
+            if fixture is None or not fixture.exists():
+                self._send(404, b"Not Found")
+                return
+
+            body = fixture.read_bytes()
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            last_modified = formatdate(fixture.stat().st_mtime, usegmt=True)
+
+            # Answer conditional requests the way defense.gov's CDN would
+            if self.headers.get("If-None-Match") == etag or (
+                not self.headers.get("If-None-Match") and self.headers.get("If-Modified-Since") == last_modified
+            ):
+                with server.lock:
+                    server.not_modified += 1
+                self._send(304, b"", {"ETag": etag, "Last-Modified": last_modified})
+                return
+
+            self._send(200, body, {"ETag": etag, "Last-Modified": last_modified})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _resolve(self, path: str) -> Optional[Path]:
+        article = ARTICLE_PATH.match(path)
+        if article:
+            fixture = self.server.fixtures_dir / f"article_{article.group(1)}.html"
+            if self.server.synthetic_articles and not fixture.exists() and self.server.article_fixtures:
+                fixtures = self.server.article_fixtures
+                return fixtures[int(article.group(1)) % len(fixtures)]
+            return fixture
+        if LISTING_PATH.match(path):
+            return self.server.fixtures_dir / "listing.html"
+        return None
+
+    def _synthetic_listing(self, start: str, end: str) -> bytes:
+        first, last = date.fromisoformat(start), date.fromisoformat(end)
+        days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+        query = parse_qs(self.path.split("?", 1)[1]) if "?" in self.path else {}
+        page = int(query.get("Page", ["1"])[0])
+        size = self.server.listing_page_size
+        page_days = days[(page - 1) * size:page * size]
+
+        items = "\n".join(
+            f'<listing-titles-only article-url-or-link="/News/Contracts/Contract/Article/{SYNTHETIC_ARTICLE_BASE + day.toordinal()}/" '
+            f'publish-date-ap="{day.isoformat()}" article-title=""></listing-titles-only>'
+            for day in page_days
+        )
+        pager = f'<a class="next" href="?Page={page + 1}">Next</a>' if page * size < len(days) else ""
+        return f"<html><body><div class=\"listing\">{items}</div>{pager}</body></html>".encode("utf-8")
+
+    def _send(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep harness output readable
+        pass
+
+@contextmanager
+def serve_fixtures(
+    fixtures_dir: Path = FIXTURES_DIR,
+    latency: float = 0.0,
+    fail_first: int = 0,
+    synthetic_articles: bool = False,
+    listing_page_size: int = 0,
+) -> Iterator[FixtureServer]:
+    """
+    Run a fixture server in a background thread for the duration of the block
+
+    Args:
+        fixtures_dir: Directory containing the fixture pages
+        latency: Seconds to sleep before answering each request
+        fail_first: Number of 503 responses returned for each path before serving it
+        synthetic_articles: Serve unknown article IDs from the fixture articles
+        listing_page_size: Serve paged synthetic listings with this many articles per page
+
+    Yields:
+        FixtureServer: The running server; use its base_url in place of defense.gov
+    """
+    server = FixtureServer(
+        fixtures_dir,
+        latency=latency,
+        fail_first=fail_first,
+        synthetic_articles=synthetic_articles,
+        listing_page_size=listing_page_size,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
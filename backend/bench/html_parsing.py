@@ -0,0 +1,181 @@
+"""
+Benchmark for contract article parsing
+
+Parses the saved fixture articles with ContractScraper.parse and with the
+original implementation (a full html.parser tree of the whole page and
+section text built with +=), and checks that every parser available here
+returns exactly the same date, sections and awards, only faster.
+
+The fixtures are small, so each is also padded to the size of a real
+defense.gov page: site chrome (menus, scripts, related articles) around the
+article, more award paragraphs per section, and the markup found in real
+bodies (&nbsp;, inline links, <br>, headers wrapped in <span>).
+
+Usage (from the backend directory):
+    python -m bench.html_parsing [--chrome-kb 150] [--paragraphs 8] [--seconds 2]
+"""
+import argparse
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from bs4 import BeautifulSoup
+
+from app.services.awards import is_award_paragraph, parse_award
+from app.services.scraper import LXML_AVAILABLE, ContractScraper
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+EXTRA_BODY = """
+      <p style="text-align: center;"><span><strong>AIR FORCE</strong></span></p>
+      <p>Acme Aerospace Inc.,&nbsp;Dayton, Ohio, has been awarded a <a href="/News/">$48,200,000</a> firm-fixed-price contract (FA8650-25-C-1234) for sensor integration.<br>Work will be performed at Wright-Patterson Air Force Base, Ohio, and is expected to be completed by Jan. 31, 2027. Air Force Research Laboratory, Wright-Patterson Air Force Base, Ohio, is the contracting activity.</p>
+      <p><span>This contract was a competitive acquisition and two offers were received.</span></p>
+      <p style="text-align: center;">Centered text without a header</p>
+"""
+
+def reference_parse(html: str) -> Dict:
+    """
+    The original parser: a full html.parser tree, one walk per extract method, and += concatenation
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    date = "Unknown Date"
+    maintitle = soup.find("h1", class_="maintitle")
+    if maintitle:
+        date_str = maintitle.get_text(strip=True).replace("Contracts For ", "")
+        for date_format in ("%b. %d, %Y", "%B %d, %Y", "%b %d, %Y", "%d %b %Y", "%d %B %Y"):
+            try:
+                date = datetime.strptime(date_str, date_format).strftime("%Y-%m-%d")
+                break
+            except ValueError:
+                continue
+
+    sections = {}
+    body_div = soup.find('div', class_='body')
+    current_section = None
+    for p in body_div.find_all('p') if body_div else []:
+        if p.has_attr('style') and 'text-align: center' in p['style']:
+            strong_tag = p.find('strong')
+            if strong_tag:
+                current_section = strong_tag.get_text(strip=True)
+                sections[current_section] = ""
+        elif current_section:
+            text = p.get_text(strip=True)
+            if text:
+                if sections[current_section]:
+                    sections[current_section] += " "
+                sections[current_section] += text
+
+    paragraphs = []
+    current_section = None
+    for p in body_div.find_all('p') if body_div else []:
+        if p.has_attr('style') and 'text-align: center' in p['style']:
+            strong_tag = p.find('strong')
+            if strong_tag:
+                current_section = strong_tag.get_text(strip=True)
+            continue
+        if not current_section:
+            continue
+        text = p.get_text(strip=True)
+        if not text or text.lstrip("*").strip().lower() == "small business":
+            continue
+        if is_award_paragraph(text) or not paragraphs or paragraphs[-1][0] != current_section:
+            paragraphs.append((current_section, text))
+        else:
+            paragraphs[-1] = (current_section, f"{paragraphs[-1][1]} {text}")
+
+    return {"date": date, "sections": sections, "awards": [parse_award(text, section) for section, text in paragraphs]}
+
+def site_chrome(size_kb: int) -> Dict[str, str]:
+    """
+    Build header and footer markup of roughly `size_kb` kilobytes, like the defense.gov page template
+    """
+    menu, related = [], []
+    i = 0
+    while sum(map(len, menu)) + sum(map(len, related)) < size_kb * 1024:
+        menu.append(f'<li class="menu-item"><a href="/News/Section/{i}/" data-id="{i}"><span>Menu entry {i}</span></a></li>')
+        related.append(
+            f'<div class="card"><a href="/News/Releases/Release/Article/{i}/"><img src="/img/{i}.jpg" alt="">'
+            f'<p class="title">Related release {i}</p></a><p class="summary">Summary of related release number {i}.</p></div>'
+        )
+        i += 1
+    script = "<script>" + "var config = {analytics: true, region: 'us'};" * 20 + "</script>"
+    return {
+        "head": script * 5,
+        "header": f'<header class="site-header"><nav><ul>{"".join(menu)}</ul></nav></header>',
+        "footer": f'<aside class="related">{"".join(related)}</aside><footer class="site-footer"><p>U.S. Department of Defense</p></footer>',
+    }
+
+def full_size_page(html: str, chrome: Dict[str, str], paragraphs: int) -> str:
+    """
+    Pad a fixture article to the size of a real page
+
+    Args:
+        html: The fixture article
+        chrome: Markup from site_chrome
+        paragraphs: Copies of each award paragraph, with a distinct contract amount each
+
+    Returns:
+        str: The padded page
+    """
+    def repeat(match: re.Match) -> str:
+        copies = [match.group(0).replace("$", f"${n + 1}", 1) for n in range(paragraphs - 1)]
+        return match.group(0) + "".join(copies)
+
+    html = re.sub(r"<p>[^<]*(?:awarded|award)[^<]*</p>", repeat, html)
+    html = html.replace("</head>", chrome["head"] + "</head>", 1)
+    html = html.replace('<div class="content">', chrome["header"] + '<div class="content">', 1)
+    html = html.replace("<p>*Small business</p>", EXTRA_BODY + "<p>*Small business</p>", 1)
+    return html.replace("</body>", chrome["footer"] + "</body>", 1)
+
+def pages_per_second(parse: Callable[[str], Dict], pages: List[str], seconds: float) -> float:
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for page in pages:
+            parse(page)
+        count += len(pages)
+    return count / (time.perf_counter() - started)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chrome-kb", type=int, default=150, help="Size of the site chrome added around each article")
+    parser.add_argument("--paragraphs", type=int, default=8, help="Copies of each award paragraph in the padded pages")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time spent parsing with each implementation")
+    args = parser.parse_args()
+
+    fixtures = [path.read_text(encoding="utf-8") for path in sorted(FIXTURES_DIR.glob("article_*.html"))]
+    chrome = site_chrome(args.chrome_kb)
+    pages = [full_size_page(html, chrome, args.paragraphs) for html in fixtures]
+    print(f"{len(pages)} fixture articles, padded to {sum(map(len, pages)) / len(pages) / 1024:.0f} KB each")
+
+    parsers = ["html.parser"] + (["lxml"] if LXML_AVAILABLE else [])
+    if not LXML_AVAILABLE:
+        print("lxml is not installed; only the html.parser path is measured")
+
+    ok = True
+    expected = [reference_parse(html) for html in fixtures + pages]
+    for name in parsers:
+        results = [ContractScraper(parser=name).parse(html) for html in fixtures + pages]
+        same = results == expected
+        ok &= same
+        print(f"[{'PASS' if same else 'FAIL'}] {name}: date, sections and awards identical to the original parser on {len(results)} pages")
+
+    # html.parser still tokenizes the whole page and only skips building the chrome's tree
+    minimum_speedup = {"html.parser": 1.5, "lxml": 2.5}
+    baseline = pages_per_second(reference_parse, pages, args.seconds)
+    print(f"{'original':>12}: {baseline:7.1f} pages/s")
+    for name in parsers:
+        rate = pages_per_second(lambda html: ContractScraper(parser=name).parse(html), pages, args.seconds)
+        print(f"{name:>12}: {rate:7.1f} pages/s ({rate / baseline:.1f}x)")
+        faster = rate >= minimum_speedup[name] * baseline
+        ok &= faster
+        print(f"[{'PASS' if faster else 'FAIL'}] {name} parses full-size pages at least {minimum_speedup[name]:g}x faster than the original")
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
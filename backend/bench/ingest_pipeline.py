@@ -0,0 +1,143 @@
+"""
+Benchmark for the streaming ingest pipeline
+
+Ingests synthetic articles from the local defense.gov stand-in into the fake
+Gemini and Pinecone clients twice: once in phases (scrape every article,
+then embed and upsert them) and once through IngestPipeline.run_urls, where
+scraping, embedding and upserting overlap. The pipelined run should take
+about as long as its slowest stage, and its peak memory should not grow with
+the number of articles while the phased run's does.
+
+Usage (from the backend directory):
+    python -m bench.ingest_pipeline [--articles 120] [--fetch-latency 0.05]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+from bench.fixture_server import serve_fixtures
+
+class DiscardingIndex(FakeIndex):
+    """
+    Fake index that keeps nothing, so memory measurements only see the pipeline
+    """
+
+    def upsert(self, vectors: List[Dict], namespace: str = ""):
+        time.sleep(self.latency.next_delay())
+        return None
+
+def article_urls(base_url: str, count: int) -> List[str]:
+    return [f"{base_url}/News/Contracts/Contract/Article/{5000000 + i}/" for i in range(count)]
+
+async def run_phased(urls: List[str], args) -> Dict[str, Any]:
+    """
+    Scrape every article first, then embed and store them
+    """
+    from app.services.executor import run_blocking
+    from app.services.fetcher import ContractFetcher
+    from app.services.ingest_pipeline import IngestPipeline
+
+    started = time.perf_counter()
+    with ContractFetcher(max_workers=args.fetch_workers, min_host_interval=0) as fetcher:
+        contracts = await run_blocking(fetcher.scrape_many, urls)
+    stats = await IngestPipeline(embed_workers=args.embed_workers).run_articles([contract for contract in contracts if "error" not in contract])
+    return {"elapsed_s": time.perf_counter() - started, "stored": stats["successful_embeddings"]}
+
+async def run_pipelined(urls: List[str], args) -> Dict[str, Any]:
+    """
+    Scrape, embed and store articles as one pipeline
+    """
+    from app.services.fetcher import ContractFetcher
+    from app.services.ingest_pipeline import IngestPipeline
+
+    started = time.perf_counter()
+    with ContractFetcher(max_workers=args.fetch_workers, min_host_interval=0) as fetcher:
+        stats = await IngestPipeline(embed_workers=args.embed_workers, pending_articles=args.pending_articles).run_urls(urls, fetcher)
+    return {
+        "elapsed_s": time.perf_counter() - started,
+        "stored": stats["successful_embeddings"],
+        "max_pending_articles": stats["max_pending_articles"],
+        "fetch_s": stats["stage_seconds"]["fetch"] / args.fetch_workers,
+        "embed_s": stats["stage_seconds"]["embed"],
+    }
+
+async def measure(run, urls: List[str], args) -> Dict[str, Any]:
+    tracemalloc.start()
+    try:
+        result = await run(urls, args)
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+    return result
+
+async def main_async(args) -> int:
+    from app.services import embeddings
+
+    genai_client = FakeGenaiClient(embed_latency=args.embed_latency)
+    install_fakes(genai_client, DiscardingIndex(latency=args.index_latency))
+    # The in-memory keyword index grows with the corpus; leave it out of the memory comparison
+    embeddings.HYBRID_SEARCH_ENABLED = False
+
+    with serve_fixtures(latency=args.fetch_latency, synthetic_articles=True) as server:
+        small = article_urls(server.base_url, args.articles)
+        large = article_urls(server.base_url, args.articles * 4)
+
+        # Warm up imports and clients so they don't count toward the first measurement
+        await run_pipelined(small[:args.fetch_workers], args)
+
+        phased = await measure(run_phased, small, args)
+        pipelined = await measure(run_pipelined, small, args)
+        # The smaller run is at its steady state only briefly, so its peak is the higher of two runs
+        small_peak_mb = max(pipelined["peak_mb"], (await measure(run_pipelined, small, args))["peak_mb"])
+        phased_large = await measure(run_phased, large, args)
+        pipelined_large = await measure(run_pipelined, large, args)
+
+    for name, result, count in (
+        ("phased", phased, len(small)),
+        ("pipelined", pipelined, len(small)),
+        ("phased", phased_large, len(large)),
+        ("pipelined", pipelined_large, len(large)),
+    ):
+        print(f"{name:>9} x{count:>4} articles: {result['elapsed_s']:6.2f}s, {result['stored']:>5} vectors, peak {result['peak_mb']:6.1f} MB")
+    print(
+        f"pipelined stages ({len(small)} articles): fetch ~{pipelined['fetch_s']:.2f}s, embed {pipelined['embed_s']:.2f}s busy; "
+        f"at most {pipelined['max_pending_articles']} articles in flight for {len(small)}, {pipelined_large['max_pending_articles']} for {len(large)}; "
+        f"higher pipelined peak of two runs of {len(small)}: {small_peak_mb:.1f} MB"
+    )
+
+    slowest_stage = max(pipelined["fetch_s"], pipelined["embed_s"])
+    checks = [
+        ("both runs store the same vectors", phased["stored"] == pipelined["stored"] > 0),
+        ("pipelining overlaps the stages", pipelined["elapsed_s"] < 0.8 * phased["elapsed_s"]),
+        ("pipelined wall time approaches the slowest stage", pipelined["elapsed_s"] < 1.5 * slowest_stage),
+        ("pipelined peak memory does not grow with the article count", pipelined_large["peak_mb"] < 1.2 * small_peak_mb),
+        ("phased peak memory grows with the article count", phased_large["peak_mb"] > 1.5 * phased["peak_mb"]),
+    ]
+
+    failed = 0
+    for description, passed in checks:
+        print(f"[{'PASS' if passed else 'FAIL'}] {description}")
+        failed += not passed
+    return 1 if failed else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=120, help="Articles in the smaller run; the larger run uses 4x")
+    parser.add_argument("--fetch-latency", type=float, default=0.05, help="Fixture server latency per page in seconds")
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--embed-workers", type=int, default=1, help="Embedding requests in flight at once")
+    parser.add_argument("--pending-articles", type=int, default=20, help="Articles parsed but not yet stored at once; the smaller run should reach it")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Fake embedding request latency in seconds")
+    parser.add_argument("--index-latency", type=float, default=0.02, help="Fake upsert latency in seconds")
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Harness for background ingest jobs
+
+Runs the FastAPI app in-process against the local defense.gov stand-in and
+the fake Gemini and Pinecone clients, and checks that:
+
+- triggering an ingest returns at once, and repeated triggers return the same job
+- job status reports progress while the ingest runs, and the result when it ends
+- searches stay as fast during an ingest as without one (the blocking executor
+  is kept small, so an ingest sharing it would hold up the searches)
+- a running job can be cancelled
+- schedulers in two processes sharing a job store run each scheduled job once
+  and never run two jobs of one kind at once
+- jobs left running by a dead process are marked failed on the next start
+
+State files are written to a temporary directory.
+
+Usage (from the backend directory):
+    python -m bench.job_harness [--fetch-latency 1.0]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+from bench.fixture_server import fixture_contracts, serve_fixtures
+
+def check(condition: bool, message: str) -> bool:
+    print(f"[{'PASS' if condition else 'FAIL'}] {message}")
+    return condition
+
+async def wait_for(client: httpx.AsyncClient, job_id: str, statuses, timeout: float = 30.0) -> Dict[str, Any]:
+    """
+    Poll a job until it reaches one of the given statuses
+
+    Returns:
+        Dict[str, Any]: The job's last reported state
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = (await client.get(f"/contracts/jobs/{job_id}")).json()
+        if job["status"] in statuses or time.monotonic() > deadline:
+            return job
+        await asyncio.sleep(0.05)
+
+async def search_latencies(client: httpx.AsyncClient, count: int = 0, until: asyncio.Event = None) -> List[float]:
+    """
+    Time sequential searches: `count` of them, or as many as fit until `until` is set
+    """
+    latencies = []
+    while len(latencies) < count or (until is not None and not until.is_set()):
+        start = time.perf_counter()
+        await client.post("/contracts/search", params={"query": f"Navy submarine contracts {len(latencies)}"})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+async def check_api(args) -> bool:
+    from app.main import app
+    from app.services import embeddings
+    from app.services.jobs import start_job_scheduler
+    from app.services.query_cache import get_query_embedding_cache
+
+    install_fakes(FakeGenaiClient(embed_latency=args.embed_latency), FakeIndex(latency=args.index_latency))
+    await embeddings.generate_embeddings(fixture_contracts())
+    # Every search should do the full embed, retrieve and generate work
+    embeddings.ANSWER_CACHE_ENABLED = False
+    get_query_embedding_cache().max_entries = 0
+
+    scheduler = await start_job_scheduler()
+    ok = True
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60) as client:
+        idle = await search_latencies(client, count=args.searches)
+
+        # Triggers return immediately; identical triggers share a job
+        start = time.perf_counter()
+        first = (await client.post("/contracts/jobs/ingest")).json()
+        trigger_ms = 1000 * (time.perf_counter() - start)
+        second = (await client.post("/contracts/jobs/ingest")).json()
+        legacy = (await client.get("/contracts/test/process-embeddings")).json()
+        ok &= check(trigger_ms < 200 and first["status"] == "queued", f"trigger returned a queued job in {trigger_ms:.0f} ms")
+        ok &= check(second["id"] == legacy["id"] == first["id"] and second["deduplicated"] and legacy["deduplicated"],
+                    "repeated triggers return the running job")
+
+        # Progress is reported while the job runs; searches run alongside it
+        progress = []
+        done = asyncio.Event()
+
+        async def poll():
+            while True:
+                job = (await client.get(f"/contracts/jobs/{first['id']}")).json()
+                progress.append(job["progress"].get("articles_fetched", 0))
+                if job["status"] not in ("queued", "running"):
+                    done.set()
+                    return job
+                await asyncio.sleep(0.05)
+
+        await wait_for(client, first["id"], ("running",))
+        finished, busy = await asyncio.gather(poll(), search_latencies(client, until=done))
+        distinct = sorted(set(progress))
+        ok &= check(finished["status"] == "succeeded" and finished["progress"]["vectors_upserted"] > 0,
+                    f"job {finished['status']}: {finished['progress']}")
+        ok &= check(len(distinct) > 2, f"progress advanced through {distinct} articles fetched")
+        ok &= check(finished["result"]["stats"]["successfully_processed"] == finished["progress"]["articles_fetched"],
+                    "job result matches its final progress")
+
+        idle_ms, busy_ms = 1000 * max(idle), 1000 * max(busy)
+        ok &= check(busy_ms < 2 * idle_ms, f"slowest search {idle_ms:.0f} ms idle, {busy_ms:.0f} ms during the ingest ({len(busy)} searches)")
+
+        # A full ingest is cancelled part way through
+        job = (await client.post("/contracts/jobs/ingest", params={"full": "true"})).json()
+        await wait_for(client, job["id"], ("running",))
+        await asyncio.sleep(args.fetch_latency * 1.5)
+        await client.post(f"/contracts/jobs/{job['id']}/cancel")
+        cancelled = await wait_for(client, job["id"], ("succeeded", "failed", "cancelled"), timeout=5)
+        ok &= check(cancelled["status"] == "cancelled", f"cancelled job is {cancelled['status']} after {cancelled['elapsed_seconds']:.1f}s")
+
+        listed = (await client.get("/contracts/jobs")).json()["jobs"]
+        ok &= check([entry["id"] for entry in listed[:2]] == [job["id"], first["id"]], "job list shows the newest jobs first")
+
+    await scheduler.stop()
+    return ok
+
+async def check_shared_store(state_dir: str) -> bool:
+    from app.services.jobs import Job, JobScheduler, JobStore
+
+    path = os.path.join(state_dir, "shared-jobs.sqlite3")
+    runs: List[str] = []
+
+    async def work(job, seconds: float = 0.3):
+        runs.append(job.id)
+        await asyncio.sleep(seconds)
+        return {"slept": seconds}
+
+    # Two API processes' schedulers sharing one store
+    schedulers = [JobScheduler(store=JobStore(path), lock_ttl=5) for _ in range(2)]
+    for scheduler in schedulers:
+        scheduler.register("work", work)
+        await scheduler.start()
+        scheduler.schedule("tick", "work", interval=0.5, params={"seconds": 0.1})
+
+    await asyncio.sleep(1.6)
+    for scheduler in schedulers:
+        await scheduler.stop()
+    ok = check(len(runs) == 4, f"two schedulers fired a 0.5s schedule {len(runs)} times in 1.6s")
+
+    # A job of the same kind is skipped while another process runs one
+    first = schedulers[0].submit("work", {"seconds": 1.0})
+    await asyncio.sleep(0.2)
+    second = schedulers[1].submit("work", {"seconds": 1.0})
+    await asyncio.sleep(0.2)
+    other = await schedulers[1].get(second["id"])
+    ok &= check(other["status"] == "skipped", f"second process's job {other['status']}: {other['error']}")
+    ok &= check((await schedulers[1].get(first["id"]))["status"] == "running", "other process's running job is visible in the store")
+
+    # A job left running by a process that died (so its lease is gone) is failed on the next start
+    orphan = Job(kind="other", params={}, status="running")
+    schedulers[0].store.save(orphan.snapshot())
+    restarted = JobScheduler(store=JobStore(path))
+    await restarted.start()
+    orphaned, live = await restarted.get(orphan.id), await restarted.get(first["id"])
+    ok &= check(orphaned["status"] == "failed" and "restart" in orphaned["error"], f"orphaned job marked {orphaned['status']} on restart")
+    ok &= check(live["status"] == "running", "job still holding its lease is left alone")
+
+    await schedulers[0].stop()
+    return ok
+
+async def main_async(args) -> int:
+    state_dir = tempfile.mkdtemp(prefix="job-harness-")
+    with serve_fixtures(latency=args.fetch_latency, listing_page_size=10) as server:
+        os.environ.update({
+            "DEFENSE_GOV_BASE_URL": server.base_url,
+            "JOB_STORE_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+            "INGEST_STATE_PATH": os.path.join(state_dir, "ingest.sqlite3"),
+            "HTML_ARCHIVE_PATH": os.path.join(state_dir, "archive"),
+            "FETCH_MIN_HOST_INTERVAL": "0",
+            # Articles arrive a few at a time, so progress can be seen advancing
+            "FETCH_MAX_WORKERS": "2",
+            # Few threads for searches: an ingest sharing them would slow every search down
+            "BLOCKING_EXECUTOR_WORKERS": "2",
+        })
+        ok = await check_api(args)
+    ok &= await check_shared_store(state_dir)
+    return 0 if ok else 1
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetch-latency", type=float, default=1.0, help="Fixture server latency per page in seconds")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--index-latency", type=float, default=0.02)
+    parser.add_argument("--searches", type=int, default=10, help="Sequential searches timed without an ingest")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
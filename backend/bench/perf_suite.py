@@ -0,0 +1,336 @@
+"""
+Offline performance suite for ingest and search
+
+Runs the real ingest and search paths against the local defense.gov stand-in
+and the fake Gemini and Pinecone clients (bench/fakes.py), whose latency,
+jitter and error rate are set on the command line, and measures:
+
+- ingest: process_contract_embeddings over several weeks of synthetic
+  listings, reported as articles and sections embedded per second
+- search: concurrent POST /contracts/search, reported as p50/p95/p99 latency
+  and requests per second
+- stream: concurrent GET /contracts/search/stream, reported as p50/p95/p99
+  time to the first answer token
+
+The query embedding and answer caches are off, so every search does the full
+embed, retrieve and generate work. Results can be saved as JSON and compared
+with a saved baseline: a metric more than --tolerance worse than the baseline
+fails the run, so CI can catch regressions. The fakes are seeded, but the
+numbers are wall-clock times, so compare results from the same machine.
+
+State files are written to a temporary directory.
+
+Usage (from the backend directory):
+    python -m bench.perf_suite [--output results.json] [--baseline baseline.json] [--tolerance 0.2]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+from bench.fixture_server import serve_fixtures
+
+QUERIES = [
+    "Navy submarine contracts",
+    "Army aviation maintenance awards",
+    "Lockheed Martin rocket production",
+    "medical supplies Defense Logistics Agency",
+    "Air Force sensor integration contracts",
+]
+
+# Whether a larger value of each metric is better, for the baseline comparison
+HIGHER_IS_BETTER = {
+    "ingest.articles_per_second": True,
+    "ingest.sections_per_second": True,
+    "search.requests_per_second": True,
+    "search.p50_ms": False,
+    "search.p95_ms": False,
+    "search.p99_ms": False,
+    "search.error_rate": False,
+    "stream.ttft_p50_ms": False,
+    "stream.ttft_p95_ms": False,
+    "stream.ttft_p99_ms": False,
+    "stream.error_rate": False,
+}
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Percentile with linear interpolation between the closest ranks
+
+    Args:
+        values: Samples
+        p: Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or 0.0 without samples
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+async def bench_ingest(args) -> Dict[str, float]:
+    """
+    Ingest --weeks weeks of synthetic articles and measure throughput
+    """
+    from app.routes.contracts import process_contract_embeddings
+
+    pipelines = []
+    last_week = date(2025, 6, 30)
+    started = time.perf_counter()
+    for week in range(args.weeks):
+        result = await process_contract_embeddings(full=True, on_pipeline=pipelines.append, end=last_week - timedelta(weeks=week))
+        if result.get("status") != "success":
+            raise RuntimeError(f"ingest failed: {result}")
+    elapsed = time.perf_counter() - started
+
+    articles = sum(pipeline.progress()["articles_fetched"] - pipeline.progress()["fetch_errors"] for pipeline in pipelines)
+    sections = sum(pipeline.progress()["sections_embedded"] for pipeline in pipelines)
+    return {
+        "articles": articles,
+        "sections": sections,
+        "elapsed_s": elapsed,
+        "articles_per_second": articles / elapsed,
+        "sections_per_second": sections / elapsed,
+    }
+
+@asynccontextmanager
+async def serve_app() -> AsyncIterator[str]:
+    """
+    Serve the FastAPI app over HTTP on a free localhost port, in this event loop
+
+    httpx's ASGI transport buffers whole responses, which would hide when the
+    first streamed token is sent; a real server does not.
+
+    Yields:
+        str: The server's base URL
+    """
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="critical", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+async def run_workers(worker, concurrency: int, requests: int) -> float:
+    """
+    Run `requests` calls of `worker(i)` from `concurrency` concurrent workers
+
+    Returns:
+        float: Elapsed seconds
+    """
+    counter = iter(range(requests))
+
+    async def loop():
+        for i in counter:
+            await worker(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+async def bench_search(client: httpx.AsyncClient, args) -> Dict[str, float]:
+    """
+    Concurrent POST /contracts/search latency
+    """
+    latencies: List[float] = []
+    failures = 0
+
+    async def search(i: int):
+        nonlocal failures
+        start = time.perf_counter()
+        response = await client.post("/contracts/search", params={"query": f"{QUERIES[i % len(QUERIES)]} {i}"})
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            failures += 1
+
+    elapsed = await run_workers(search, args.concurrency, args.requests)
+    return {
+        "requests": args.requests,
+        "requests_per_second": args.requests / elapsed,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+        "error_rate": failures / args.requests,
+    }
+
+async def bench_stream(client: httpx.AsyncClient, args) -> Dict[str, float]:
+    """
+    Concurrent GET /contracts/search/stream time to first token
+    """
+    ttfts: List[float] = []
+    failures = 0
+
+    async def stream(i: int):
+        nonlocal failures
+        start = time.perf_counter()
+        first_token = None
+        event = None
+        async with client.stream("GET", "/contracts/search/stream", params={"query": f"{QUERIES[i % len(QUERIES)]} {i}"}) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if event == "token" and first_token is None:
+                        first_token = time.perf_counter() - start
+        if first_token is not None and event == "done":
+            ttfts.append(first_token)
+        else:
+            failures += 1
+
+    await run_workers(stream, args.concurrency, args.requests)
+    return {
+        "requests": args.requests,
+        "ttft_p50_ms": 1000 * percentile(ttfts, 50),
+        "ttft_p95_ms": 1000 * percentile(ttfts, 95),
+        "ttft_p99_ms": 1000 * percentile(ttfts, 99),
+        "error_rate": failures / args.requests,
+    }
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> bool:
+    """
+    Print each metric against the baseline and report whether none regressed
+
+    Args:
+        metrics: This run's metrics
+        baseline: A previous run's metrics
+        tolerance: Allowed relative change in the worse direction, e.g. 0.2 for 20%
+
+    Returns:
+        bool: True if no metric is more than `tolerance` worse than its baseline
+    """
+    ok = True
+    for name, higher_is_better in HIGHER_IS_BETTER.items():
+        if name not in metrics or name not in baseline:
+            continue
+        current, previous = metrics[name], baseline[name]
+        change = (current - previous) / previous if previous else 0.0
+        if name.endswith("error_rate"):
+            # A zero baseline would make any error infinitely worse; allow at least one point in a hundred
+            worse = current - previous > tolerance * max(previous, 0.01)
+            delta = f"{100 * (current - previous):+.1f} points"
+        else:
+            worse = -change > tolerance if higher_is_better else change > tolerance
+            delta = f"{change:+.1%}"
+        ok &= not worse
+        print(f"[{'FAIL' if worse else 'PASS'}] {name}: {current:.3f} vs baseline {previous:.3f} ({delta})")
+    return ok
+
+async def main_async(args) -> int:
+    state_dir = tempfile.mkdtemp(prefix="perf-suite-")
+    genai_client = FakeGenaiClient(
+        embed_latency=args.embed_latency,
+        generate_latency=args.generate_latency,
+        tokens_per_second=args.tokens_per_second,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    index = FakeIndex(latency=args.index_latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+
+    with serve_fixtures(latency=args.fetch_latency, listing_page_size=10) as server:
+        os.environ.update({
+            "DEFENSE_GOV_BASE_URL": server.base_url,
+            "INGEST_STATE_PATH": os.path.join(state_dir, "ingest.sqlite3"),
+            "HTML_ARCHIVE_PATH": os.path.join(state_dir, "archive"),
+            "JOB_STORE_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+            "FETCH_MIN_HOST_INTERVAL": "0",
+        })
+        install_fakes(genai_client, index)
+        ingest = await bench_ingest(args)
+
+    from app.services import embeddings
+    from app.services.query_cache import get_query_embedding_cache
+
+    embeddings.ANSWER_CACHE_ENABLED = False
+    get_query_embedding_cache().max_entries = 0
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with serve_app() as base_url, httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        search = await bench_search(client, args)
+        stream = await bench_stream(client, args)
+
+    print(
+        f"ingest: {ingest['articles']} articles, {ingest['sections']} sections in {ingest['elapsed_s']:.2f}s "
+        f"({ingest['articles_per_second']:.1f} articles/s, {ingest['sections_per_second']:.1f} sections/s)"
+    )
+    print(
+        f"search: {search['requests']} requests at concurrency {args.concurrency}, {search['requests_per_second']:.1f} req/s, "
+        f"p50 {search['p50_ms']:.0f} ms, p95 {search['p95_ms']:.0f} ms, p99 {search['p99_ms']:.0f} ms, "
+        f"errors {search['error_rate']:.1%}"
+    )
+    print(
+        f"stream: time to first token p50 {stream['ttft_p50_ms']:.0f} ms, p95 {stream['ttft_p95_ms']:.0f} ms, "
+        f"p99 {stream['ttft_p99_ms']:.0f} ms, errors {stream['error_rate']:.1%}"
+    )
+
+    metrics = {
+        f"{group}.{name}": value
+        for group, results in (("ingest", ingest), ("search", search), ("stream", stream))
+        for name, value in results.items()
+        if f"{group}.{name}" in HIGHER_IS_BETTER
+    }
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {name: value for name, value in vars(args).items() if name not in ("output", "baseline", "tolerance")},
+        "metrics": metrics,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+    ok = True
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("warning: the baseline was recorded with different settings")
+        ok = compare(metrics, baseline["metrics"], args.tolerance)
+    return 0 if ok else 1
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, default=8, help="Weeks of synthetic listings ingested (7 articles each)")
+    parser.add_argument("--requests", type=int, default=100, help="Searches and streams issued")
+    parser.add_argument("--concurrency", type=int, default=8, help="Searches and streams in flight at once")
+    parser.add_argument("--fetch-latency", type=float, default=0.02, help="Fixture server latency per page in seconds")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Fake embedding request latency in seconds")
+    parser.add_argument("--index-latency", type=float, default=0.01, help="Fake index call latency in seconds")
+    parser.add_argument("--generate-latency", type=float, default=0.2, help="Fake time to the first generated token in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="Fake generation speed (0 = instant)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Uniform random extra latency per fake call in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability that a fake call fails with a 503")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fakes' jitter and failures")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with the results JSON of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative regression allowed against the baseline")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
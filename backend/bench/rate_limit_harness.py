@@ -0,0 +1,163 @@
+"""
+Harness for the Gemini rate limiter under server-side throttling
+
+Runs a background ingest (many batch embedding calls) and interactive
+searches (single query embeddings) at the same time against the fake
+Gemini client with a quota that answers 429 RESOURCE_EXHAUSTED once
+exceeded. Each scenario swaps in a differently configured limiter:
+
+- uncontrolled: no buckets, no AIMD and no retries, like the calls before the limiter
+- aimd: no quota configured, so only AIMD and retries with backoff protect the calls
+- buckets: request bucket set just under the quota, plus AIMD and retries
+
+The limited scenarios must lose no embeddings, and interactive calls must
+wait less than background calls for a slot.
+
+Usage (from the backend directory):
+    python -m bench.rate_limit_harness [--quota 30] [--batches 60]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+
+async def run_scenario(name: str, limiter, args) -> Dict[str, Any]:
+    """
+    Run one ingest-plus-search workload through the given limiter
+
+    Args:
+        name: Scenario name for the report
+        limiter: The AdaptiveRateLimiter to install
+        args: Parsed command-line arguments
+
+    Returns:
+        Dict[str, Any]: Failure counts, latencies and limiter stats
+    """
+    from app.services import embeddings, rate_limiter
+
+    genai_client = FakeGenaiClient(embed_latency=args.latency, quota_per_second=args.quota)
+    install_fakes(genai_client, FakeIndex())
+    rate_limiter._limiter = limiter
+
+    lowest_limit = limiter.limit
+    sampling = True
+
+    async def sample_limit():
+        nonlocal lowest_limit
+        while sampling:
+            lowest_limit = min(lowest_limit, limiter.limit)
+            await asyncio.sleep(0.01)
+
+    async def background():
+        texts = [f"background section {i}" for i in range(args.batch_size)]
+        return await embeddings.generate_gemini_embeddings_batch(texts)
+
+    interactive_latencies: List[float] = []
+    interactive_failures = 0
+
+    async def interactive(i: int):
+        nonlocal interactive_failures
+        # Searches arrive while the ingest backlog is queued
+        await asyncio.sleep(0.2 + i * args.search_interval)
+        start = time.perf_counter()
+        try:
+            await embeddings.generate_gemini_embedding(f"search query {i}")
+        except Exception:
+            interactive_failures += 1
+        interactive_latencies.append(time.perf_counter() - start)
+
+    sampler = asyncio.create_task(sample_limit())
+    start = time.perf_counter()
+    batches, _ = await asyncio.gather(
+        asyncio.gather(*(background() for _ in range(args.batches))),
+        asyncio.gather(*(interactive(i) for i in range(args.searches))),
+    )
+    elapsed = time.perf_counter() - start
+    sampling = False
+    await sampler
+
+    stats = limiter.stats()
+    return {
+        "scenario": name,
+        "elapsed_s": elapsed,
+        "failed_embeddings": sum(1 for batch in batches for embedding in batch if embedding is None),
+        "failed_searches": interactive_failures,
+        "search_p50_ms": 1000 * statistics.median(interactive_latencies),
+        "server_throttled": genai_client.quota.throttled,
+        "lowest_limit": int(lowest_limit),
+        "interactive_wait_ms": stats["lanes"]["interactive"]["mean_wait_ms"],
+        "background_wait_ms": stats["lanes"]["background"]["mean_wait_ms"],
+        "retries": stats["retries"],
+    }
+
+async def main_async(args) -> int:
+    from app.services.rate_limiter import AdaptiveRateLimiter
+
+    scenarios = {
+        "uncontrolled": AdaptiveRateLimiter(
+            requests_per_minute=0, tokens_per_minute=0,
+            max_concurrency=10000, min_concurrency=10000, max_retries=0,
+        ),
+        "aimd": AdaptiveRateLimiter(
+            requests_per_minute=0, tokens_per_minute=0,
+            max_concurrency=args.max_concurrency, backoff_seconds=args.backoff, max_retries=args.retries,
+        ),
+        "buckets": AdaptiveRateLimiter(
+            requests_per_minute=args.quota * 60 * 0.9, tokens_per_minute=0,
+            max_concurrency=args.max_concurrency, backoff_seconds=args.backoff, max_retries=args.retries,
+        ),
+    }
+
+    results = {}
+    for name, limiter in scenarios.items():
+        result = results[name] = await run_scenario(name, limiter, args)
+        print(
+            f"{name:>12}: {result['elapsed_s']:5.1f}s, failed embeddings {result['failed_embeddings']:>4}, "
+            f"failed searches {result['failed_searches']:>2}, 429s {result['server_throttled']:>4}, "
+            f"retries {result['retries']:>3}, lowest limit {result['lowest_limit']:>5}, "
+            f"slot wait interactive {result['interactive_wait_ms']:7.1f} ms / background {result['background_wait_ms']:7.1f} ms"
+        )
+
+    checks = [
+        ("the uncontrolled run is throttled and loses embeddings", results["uncontrolled"]["failed_embeddings"] > 0),
+        ("AIMD alone loses no embeddings or searches",
+            results["aimd"]["failed_embeddings"] == 0 and results["aimd"]["failed_searches"] == 0),
+        ("AIMD shrinks the concurrency limit after 429s", results["aimd"]["lowest_limit"] < args.max_concurrency),
+        ("buckets lose no embeddings or searches",
+            results["buckets"]["failed_embeddings"] == 0 and results["buckets"]["failed_searches"] == 0),
+        ("buckets draw fewer 429s than AIMD alone",
+            results["buckets"]["server_throttled"] < results["aimd"]["server_throttled"]),
+        ("interactive calls wait less than background calls", all(
+            results[name]["interactive_wait_ms"] < results[name]["background_wait_ms"] for name in ("aimd", "buckets")
+        )),
+    ]
+
+    failed = 0
+    for description, passed in checks:
+        print(f"[{'PASS' if passed else 'FAIL'}] {description}")
+        failed += not passed
+    return 1 if failed else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quota", type=float, default=30, help="Fake Gemini calls allowed per second")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake embedding latency in seconds")
+    parser.add_argument("--batches", type=int, default=60, help="Background batch embedding calls")
+    parser.add_argument("--batch-size", type=int, default=10, help="Texts per background batch")
+    parser.add_argument("--searches", type=int, default=10, help="Interactive query embeddings")
+    parser.add_argument("--search-interval", type=float, default=0.1, help="Seconds between searches")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--retries", type=int, default=8)
+    parser.add_argument("--backoff", type=float, default=0.25, help="Base retry backoff in seconds")
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
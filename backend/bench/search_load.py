@@ -0,0 +1,136 @@
+"""
+Load test for concurrent /contracts/search requests
+
+Runs the FastAPI app in-process against the fake Gemini and Pinecone clients
+and measures search throughput at increasing concurrency. With async client
+calls throughput should grow roughly linearly with concurrency; --blocking
+makes the fake Gemini calls block the event loop, reproducing the old
+behavior where concurrent searches were serialized.
+
+Usage (from the backend directory):
+    python -m bench.search_load [--levels 1 2 4 8 16] [--blocking]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+from bench.fixture_server import fixture_contracts
+
+QUERIES = [
+    "Navy submarine contracts",
+    "Army aviation maintenance awards",
+    "Lockheed Martin rocket production",
+    "medical supplies Defense Logistics Agency",
+]
+
+async def seed_index() -> None:
+    """
+    Store the fixture articles in the fake index through the normal ingest path
+    """
+    from app.services.embeddings import generate_embeddings
+
+    await generate_embeddings(fixture_contracts())
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, requests_per_worker: int) -> Dict[str, float]:
+    """
+    Issue searches from `concurrency` workers and measure throughput
+
+    Args:
+        client: HTTP client bound to the app
+        concurrency: Number of concurrent workers
+        requests_per_worker: Searches issued by each worker
+
+    Returns:
+        Dict[str, float]: Request count, elapsed time, throughput and mean latency
+    """
+    latencies: List[float] = []
+    failures = 0
+
+    async def worker(worker_id: int):
+        nonlocal failures
+        for i in range(requests_per_worker):
+            query = QUERIES[(worker_id + i) % len(QUERIES)]
+            start = time.perf_counter()
+            response = await client.post("/contracts/search", params={"query": query})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    total = concurrency * requests_per_worker
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "failures": failures,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed,
+        "mean_latency_ms": 1000 * sum(latencies) / len(latencies),
+    }
+
+async def main_async(args) -> int:
+    genai_client = FakeGenaiClient(
+        embed_latency=args.embed_latency,
+        generate_latency=args.generate_latency,
+        blocking=args.blocking,
+    )
+    install_fakes(genai_client, FakeIndex(latency=args.index_latency))
+    await seed_index()
+
+    if not args.cache:
+        # The load test repeats a few queries; measure the full pipeline, not cache hits
+        from app.services import embeddings
+        from app.services.query_cache import get_query_embedding_cache
+        embeddings.ANSWER_CACHE_ENABLED = False
+        get_query_embedding_cache().max_entries = 0
+
+    from app.main import app
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for concurrency in args.levels:
+            result = await run_level(client, concurrency, args.requests_per_worker)
+            results.append(result)
+            print(
+                f"concurrency {result['concurrency']:>3}: {result['throughput_rps']:7.1f} req/s, "
+                f"mean latency {result['mean_latency_ms']:7.1f} ms, failures {result['failures']}"
+            )
+
+    base, top = results[0], results[-1]
+    scaling = top["throughput_rps"] / base["throughput_rps"]
+    ideal = top["concurrency"] / base["concurrency"]
+    print(f"throughput scaled {scaling:.1f}x for {ideal:.0f}x concurrency")
+
+    if args.blocking:
+        return 0
+
+    # Allow for scheduling overhead, but a serialized server would stay near 1x
+    passed = scaling >= ideal * 0.5
+    print(f"[{'PASS' if passed else 'FAIL'}] search throughput scales with concurrency")
+    return 0 if passed else 1
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Concurrency levels to test")
+    parser.add_argument("--requests-per-worker", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Fake query-embedding latency in seconds")
+    parser.add_argument("--index-latency", type=float, default=0.02, help="Fake index query latency in seconds")
+    parser.add_argument("--generate-latency", type=float, default=0.2, help="Fake generation latency in seconds")
+    parser.add_argument("--blocking", action="store_true", help="Make fake Gemini calls block the event loop")
+    parser.add_argument("--cache", action="store_true", help="Keep the query embedding and answer caches enabled")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Harness for request tracing, stage metrics and queued logging
+
+Runs the FastAPI app in-process against the local defense.gov stand-in and
+the fake Gemini and Pinecone clients, and checks that:
+
+- every response carries a trace ID (the caller's, if it sent one), and the
+  log line summarizing the search, stream or ingest job carries the same ID
+- GET /metrics serves Prometheus text with a latency histogram for every
+  search, stream and ingest stage, token, cache, retry and failure counters,
+  and request latencies labelled by route template rather than raw path
+- a failing Gemini call is counted as a retry, a failure, a failed stage and
+  an errored search
+- logging through the queue keeps a slow log handler off the request path,
+  where writing to it directly slows every search down
+
+State files are written to a temporary directory.
+
+Usage (from the backend directory):
+    python -m bench.tracing_harness [--log-delay 0.02]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+from bench.fakes import FakeGenaiClient, FakeIndex, install_fakes
+from bench.fixture_server import fixture_contracts, serve_fixtures
+
+SAMPLE_PATTERN = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$")
+LABEL_PATTERN = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+SEARCH_STAGES = ["embed_query", "vector_query", "keyword_query", "retrieve", "prompt", "generate"]
+INGEST_STAGES = ["fetch", "embed", "upsert", "close"]
+
+def check(condition: bool, message: str) -> bool:
+    print(f"[{'PASS' if condition else 'FAIL'}] {message}")
+    return condition
+
+class CaptureHandler(logging.Handler):
+    """
+    Keeps every record it is given, optionally taking `delay` seconds per record like a slow disk
+    """
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        self.records.append(record)
+
+def parse_metrics(text: str) -> Tuple[List[Tuple[str, Dict[str, str], float]], List[str]]:
+    """
+    Parse Prometheus exposition text
+
+    Returns:
+        Tuple: (name, labels, value) per sample, and every line that didn't parse
+    """
+    samples, invalid = [], []
+    for line in text.splitlines():
+        if not line or line.startswith("# HELP ") or line.startswith("# TYPE "):
+            continue
+        match = SAMPLE_PATTERN.match(line)
+        if not match:
+            invalid.append(line)
+            continue
+        name, labels, value = match.groups()
+        samples.append((name, dict(LABEL_PATTERN.findall(labels or "")), float(value)))
+    return samples, invalid
+
+def value(samples, name: str, **labels: str) -> float:
+    """
+    Sum of the samples of `name` whose labels include `labels`
+    """
+    return sum(v for n, l, v in samples if n == name and all(l.get(key) == want for key, want in labels.items()))
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str, timeout: float = 30.0) -> Dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = (await client.get(f"/contracts/jobs/{job_id}")).json()
+        if job["status"] not in ("queued", "running") or time.monotonic() > deadline:
+            return job
+        await asyncio.sleep(0.05)
+
+def summary_record(capture: CaptureHandler, operation: str):
+    records = [record for record in capture.records if record.name == "app.services.tracing" and record.getMessage().startswith(f"{operation} ")]
+    return records[-1] if records else None
+
+async def search_latency(client: httpx.AsyncClient, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        await client.post("/contracts/search", params={"query": f"Navy submarine contracts {i}"})
+    return (time.perf_counter() - started) / count
+
+async def check_tracing(client: httpx.AsyncClient, capture: CaptureHandler) -> Tuple[bool, Dict]:
+    response = await client.post("/contracts/search", params={"query": "Navy submarine contracts"}, headers={"X-Trace-Id": "bench-trace-1"})
+    record = summary_record(capture, "search")
+    ok = check(response.status_code == 200 and response.headers.get("x-trace-id") == "bench-trace-1", "search response echoes the caller's trace ID")
+    ok &= check(record is not None and record.trace_id == "bench-trace-1" and all(name in record.getMessage() for name in SEARCH_STAGES),
+                f"search log line has the trace ID and every stage: {record.getMessage() if record else None}")
+
+    async with client.stream("GET", "/contracts/search/stream", params={"query": "Army aviation maintenance awards"}) as response:
+        body = await response.aread()
+    trace_id = response.headers.get("x-trace-id", "")
+    record = summary_record(capture, "stream")
+    ok &= check(re.fullmatch(r"[0-9a-f]{16}", trace_id) is not None and b"event: done" in body, f"stream response got a new trace ID {trace_id}")
+    ok &= check(record is not None and record.trace_id == trace_id and "first_token" in record.getMessage(),
+                f"stream log line has the trace ID and time to first token: {record.getMessage() if record else None}")
+
+    job = (await client.post("/contracts/jobs/ingest")).json()
+    finished = await wait_for_job(client, job["id"])
+    record = summary_record(capture, "ingest")
+    ok &= check(finished["status"] == "succeeded", f"ingest job {finished['status']}: {finished['progress']}")
+    ok &= check(record is not None and record.trace_id == job["id"] and all(name in record.getMessage() for name in INGEST_STAGES),
+                f"ingest log line carries the job ID: {record.getMessage() if record else None}")
+
+    # Blocking calls run in worker threads and should log with the caller's trace ID
+    from app.services.executor import run_blocking
+    from app.services.tracing import bind_trace_id
+
+    async def log_from_thread():
+        bind_trace_id("bench-thread")
+        await run_blocking(logging.getLogger("bench").info, "logged from a worker thread")
+
+    await asyncio.create_task(log_from_thread())
+    threaded = [record for record in capture.records if record.getMessage() == "logged from a worker thread"]
+    ok &= check(len(threaded) == 1 and threaded[0].trace_id == "bench-thread" and threaded[0].threadName != "MainThread",
+                "log lines from blocking calls in worker threads keep the caller's trace ID")
+    return ok, finished
+
+async def check_metrics(client: httpx.AsyncClient, articles: int) -> bool:
+    response = await client.get("/metrics")
+    samples, invalid = parse_metrics(response.text)
+    ok = check(response.status_code == 200 and response.headers["content-type"].startswith("text/plain") and not invalid,
+               f"/metrics serves {len(samples)} valid samples ({len(invalid)} invalid lines)")
+
+    missing = [
+        f"{operation}/{name}"
+        for operation, names in (("search", SEARCH_STAGES), ("stream", SEARCH_STAGES + ["first_token"]), ("ingest", INGEST_STAGES))
+        for name in names
+        if not value(samples, "govwatch_stage_duration_seconds_count", operation=operation, stage=name)
+    ]
+    ok &= check(not missing, f"latency histogram for every search, stream and ingest stage{f' (missing {missing})' if missing else ''}")
+
+    # Buckets are cumulative and end with the total count
+    count = value(samples, "govwatch_stage_duration_seconds_count", operation="search", stage="generate")
+    buckets = [v for n, l, v in samples if n == "govwatch_stage_duration_seconds_bucket" and l.get("operation") == "search" and l.get("stage") == "generate"]
+    ok &= check(buckets == sorted(buckets) and buckets[-1] == count, f"generate histogram buckets are cumulative up to its {count:.0f} observations")
+
+    tokens = {direction: value(samples, "govwatch_gemini_tokens_total", operation="search", direction=direction) for direction in ("prompt", "completion")}
+    ok &= check(all(tokens.values()) and value(samples, "govwatch_gemini_tokens_total", operation="embed", direction="prompt") > 0,
+                f"token counters: search {tokens}, embed {value(samples, 'govwatch_gemini_tokens_total', operation='embed'):.0f}")
+    ok &= check(value(samples, "govwatch_ingest_articles_total", result="processed") == articles > 0
+                and value(samples, "govwatch_ingest_sections_total", result="stored") > 0,
+                f"ingest counters: {value(samples, 'govwatch_ingest_articles_total', result='processed'):.0f} articles processed")
+    ok &= check(value(samples, "govwatch_cache_lookups_total", cache="query_embedding") > 0 and value(samples, "govwatch_gemini_calls_total", lane="interactive") > 0,
+                "cache lookup and Gemini call counters are exported")
+
+    paths = {l["path"] for n, l, v in samples if n == "govwatch_http_request_duration_seconds_count"}
+    ok &= check("/contracts/jobs/{job_id}" in paths and not any(re.search(r"[0-9a-f]{16,}", path) for path in paths),
+                f"request latency labelled by route template: {sorted(paths)}")
+    return ok
+
+async def check_failures(client: httpx.AsyncClient) -> bool:
+    before, _ = parse_metrics((await client.get("/metrics")).text)
+    install_fakes(FakeGenaiClient(error_rate=1.0, seed=1), FakeIndex())
+    response = await client.post("/contracts/search", params={"query": "failing search"})
+    after, _ = parse_metrics((await client.get("/metrics")).text)
+
+    def delta(name: str, **labels: str) -> float:
+        return value(after, name, **labels) - value(before, name, **labels)
+
+    ok = check(response.status_code == 500, f"search with Gemini failing returned {response.status_code}")
+    ok &= check(delta("govwatch_gemini_retries_total") >= 1 and delta("govwatch_gemini_failures_total") >= 1,
+                f"Gemini retries +{delta('govwatch_gemini_retries_total'):.0f}, failures +{delta('govwatch_gemini_failures_total'):.0f}")
+    ok &= check(delta("govwatch_stage_failures_total", operation="search", stage="embed_query") == 1
+                and delta("govwatch_operation_duration_seconds_count", operation="search", outcome="error") == 1,
+                "failed stage and errored search counted")
+    return ok
+
+async def check_logging(client: httpx.AsyncClient, args) -> bool:
+    from app import config
+
+    root = logging.getLogger()
+    queue_handlers = list(root.handlers)
+
+    # A slow handler written to directly, as before: each log line holds up the request
+    slow = CaptureHandler(delay=args.log_delay)
+    root.handlers = [slow]
+    direct = await search_latency(client, args.searches)
+    lines = len(slow.records) / args.searches
+
+    # The same handler behind the queue
+    root.handlers = queue_handlers
+    config._log_listener.handlers = (CaptureHandler(delay=args.log_delay),)
+    queued = await search_latency(client, args.searches)
+
+    print(f"{lines:.0f} log lines per search; mean search latency {1000 * direct:.0f} ms with a slow handler called directly, {1000 * queued:.0f} ms through the queue")
+    return check(queued < direct - 0.5 * lines * args.log_delay, "queued logging keeps the slow handler off the request path")
+
+async def main_async(args) -> int:
+    state_dir = tempfile.mkdtemp(prefix="tracing-harness-")
+    with serve_fixtures(listing_page_size=10) as server:
+        os.environ.update({
+            "DEFENSE_GOV_BASE_URL": server.base_url,
+            "JOB_STORE_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+            "INGEST_STATE_PATH": os.path.join(state_dir, "ingest.sqlite3"),
+            "HTML_ARCHIVE_PATH": os.path.join(state_dir, "archive"),
+            "FETCH_MIN_HOST_INTERVAL": "0",
+            # Fail fast when Gemini errors are injected
+            "GEMINI_MAX_RETRIES": "1",
+            "GEMINI_BACKOFF_SECONDS": "0.01",
+        })
+        from app import config
+        from app.main import app
+        from app.services import embeddings
+        from app.services.jobs import start_job_scheduler
+        from app.services.query_cache import get_query_embedding_cache
+
+        # Keep the harness's own log lines out of the console and logs/app.log
+        capture = CaptureHandler()
+        config._log_listener.handlers = (capture,)
+
+        install_fakes(FakeGenaiClient(embed_latency=0.01, generate_latency=0.02), FakeIndex())
+        seeded = fixture_contracts()
+        await embeddings.generate_embeddings(seeded)
+        embeddings.ANSWER_CACHE_ENABLED = False
+        get_query_embedding_cache().max_entries = 0
+        scheduler = await start_job_scheduler()
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60) as client:
+            ok, job = await check_tracing(client, capture)
+            ok &= await check_metrics(client, len(seeded) + job["progress"]["articles_fetched"])
+            ok &= await check_logging(client, args)
+            ok &= await check_failures(client)
+
+        await scheduler.stop()
+    return 0 if ok else 1
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log-delay", type=float, default=0.02, help="Seconds the slow log handler takes per record")
+    parser.add_argument("--searches", type=int, default=10, help="Sequential searches timed with each logging setup")
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,9 @@ interface Source {
   contract_url?: string;
   date?: string;
   section?: string;
+  company?: string;
+  amount?: number;
+  contract_number?: string;
 }
 
 // Define response type to fix linter error
@@ -14,56 +17,99 @@ interface SearchResponse {
   sources?: Source[];
 }
 
+// Format sources the way SearchResults expects them after the answer
+function formatSources(sources: Source[]): string {
+  if (sources.length === 0) return "";
+
+  let text = "\n\n--- Sources ---\n";
+  sources.forEach((source: Source, index: number) => {
+    text += `\n${index + 1}. ${source.contract_url || 'Unknown source'} (${source.date || 'Unknown date'})`;
+    if (source.section) {
+      text += ` - ${source.section}`;
+    }
+  });
+  return text;
+}
+
 // Function to search contracts with streaming response
+// Reads server-sent events from /contracts/search/stream: sources arrive first,
+// then answer tokens. The answer text is streamed through as it arrives and the
+// sources are appended once the answer is complete.
 export async function searchContractsStream(query: string): Promise<ReadableStream<Uint8Array> | null> {
-  console.log(`Sending request to ${API_BASE_URL}/contracts/search with query:`, query);
+  console.log(`Sending request to ${API_BASE_URL}/contracts/search/stream with query:`, query);
+  
+  const controller = new AbortController();
   
   try {
-    // Send query as a URL parameter instead of in the body
-    const response = await fetch(`${API_BASE_URL}/contracts/search?query=${encodeURIComponent(query)}`, {
-      method: 'POST',
+    const response = await fetch(`${API_BASE_URL}/contracts/search/stream?query=${encodeURIComponent(query)}`, {
+      method: 'GET',
       headers: {
-        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream',
       },
-      // No body needed as we're using URL parameters
-      // Don't specify mode: 'cors' to let the browser handle it
+      signal: controller.signal,
     });
 
     console.log('Search response status:', response.status);
     
-    if (!response.ok) {
+    if (!response.ok || !response.body) {
       const errorText = await response.text().catch(() => 'No error details available');
       console.error('API error response:', errorText);
       throw new Error(`API error: ${response.status} - ${errorText}`);
     }
 
-    // For non-streaming API, convert the response to a stream
-    const data = await response.json() as SearchResponse;
-    console.log('Search response data:', data);
-    
-    // Create a readable stream from the result
-    const { readable, writable } = new TransformStream();
-    const writer = writable.getWriter();
-    
-    // Write the answer to the stream
-    const answer = data.answer || "No answer provided";
-    
-    // Add sources information if available
-    let responseText = answer;
-    if (data.sources && data.sources.length > 0) {
-      responseText += "\n\n--- Sources ---\n";
-      data.sources.forEach((source: Source, index: number) => {
-        responseText += `\n${index + 1}. ${source.contract_url || 'Unknown source'} (${source.date || 'Unknown date'})`;
-        if (source.section) {
-          responseText += ` - ${source.section}`;
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const encoder = new TextEncoder();
+    let sources: Source[] = [];
+    let buffer = "";
+
+    return new ReadableStream<Uint8Array>({
+      async pull(output) {
+        while (true) {
+          // Emit every complete event in the buffer before reading more
+          const boundary = buffer.indexOf("\n\n");
+          if (boundary === -1) {
+            const { done, value } = await reader.read();
+            if (done) {
+              output.enqueue(encoder.encode(formatSources(sources)));
+              output.close();
+              return;
+            }
+            buffer += decoder.decode(value, { stream: true }).replace(/\r\n/g, "\n");
+            continue;
+          }
+
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let event = "message";
+          let data = "";
+          for (const line of rawEvent.split("\n")) {
+            if (line.startsWith("event:")) event = line.slice(6).trim();
+            else if (line.startsWith("data:")) data += line.slice(5).trim();
+          }
+          const payload = data ? JSON.parse(data) : {};
+
+          if (event === "sources") {
+            sources = payload.sources || [];
+          } else if (event === "token") {
+            output.enqueue(encoder.encode(payload.text || ""));
+            return;
+          } else if (event === "error") {
+            throw new Error(payload.message || "Search failed");
+          } else if (event === "done") {
+            output.enqueue(encoder.encode(formatSources(sources)));
+            output.close();
+            controller.abort();
+            return;
+          }
         }
-      });
-    }
-    
-    writer.write(new TextEncoder().encode(responseText));
-    writer.close();
-    
-    return readable;
+      },
+      cancel() {
+        // The results view unmounted or a new search started: stop the server-side generation
+        controller.abort();
+      },
+    });
   } catch (error) {
     console.error('Error searching contracts:', error);
     